@@ -0,0 +1,8 @@
+"""
+Performance benchmarks. Run from the backend directory, e.g.
+
+    python -m benchmarks.pagination --transactions 50000
+    python -m benchmarks.suite --json before.json
+    python -m benchmarks.compare before.json after.json
+    python -m benchmarks.concurrency --threads 1 8 32 --json sqlite.json
+"""
@@ -0,0 +1,64 @@
+"""
+Compare two benchmark suite JSON files and flag latency regressions
+
+    python -m benchmarks.compare before.json after.json [--threshold 0.10]
+
+Exits with status 1 when any case's p95 grew by more than the threshold.
+Cases without latencies in either file (every request failed) are listed
+as skipped.
+"""
+import argparse
+import json
+import sys
+
+
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+def compare(before, after, threshold=0.10):
+    """
+    Returns:
+        (list of per-case rows, list of regressed case names, list of skipped case names)
+    """
+    rows, regressed, skipped = [], [], []
+    for name in sorted(set(before['results']) & set(after['results'])):
+        old, new = before['results'][name], after['results'][name]
+        if any(run.get(metric) is None for run in (old, new) for metric in METRICS):
+            skipped.append(name)
+            continue
+        change = {metric: (new[metric] - old[metric]) / old[metric] if old[metric] else 0.0 for metric in METRICS}
+        rows.append((name, old, new, change))
+        if change['p95_ms'] > threshold:
+            regressed.append(name)
+    return rows, regressed, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Allowed relative p95 increase')
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    for label, run in (('before', before), ('after', after)):
+        env = run.get('environment', {})
+        print(f"{label:>6}: {env.get('commit')} on {env.get('database')}, {env.get('cpu_count')} CPUs")
+
+    rows, regressed, skipped = compare(before, after, args.threshold)
+    for name, old, new, change in rows:
+        cells = ' | '.join(
+            f"{metric[:3]} {old[metric]:8.3f} -> {new[metric]:8.3f} ms ({change[metric]:+6.1%})" for metric in METRICS
+        )
+        flag = '  REGRESSION' if name in regressed else ''
+        print(f"{name:>26}: {cells}{flag}")
+    for name in skipped:
+        print(f"{name:>26}: skipped, no successful samples in one of the runs")
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Concurrent transaction creation: many threads POSTing /api/transactions/ at once
+
+Each thread authenticates as its own user and creates --requests
+transactions through the full create view (validation, scoring, insert,
+rollups, alert), all threads starting together. Run it once per database
+profile (see DB_ENGINE in settings.py) and compare the two JSON files:
+
+    python -m benchmarks.concurrency --threads 1 8 32 --json sqlite.json
+    DB_ENGINE=postgres python -m benchmarks.concurrency --threads 1 8 32 --json postgres.json
+    python -m benchmarks.compare sqlite.json postgres.json
+
+SQLite runs use a file test database instead of the in-memory default, so
+locking behaves as it does in a deployment. Failed requests (e.g. "database
+is locked") are counted, not retried.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from .utils import benchmark_database, create_payload, environment, setup_django, summarise, write_json
+
+
+def create_transactions(user, requests, barrier, seed):
+    """
+    Thread body: create transactions as user once every thread is ready
+
+    Returns:
+        (list of latencies in ms of successful requests, list of error strings)
+    """
+    from django.db import connections
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(user)
+    rng = random.Random(seed)
+    latencies, errors = [], []
+    barrier.wait()
+    try:
+        for n in range(requests):
+            payload = create_payload(user.username, rng)
+            start = time.perf_counter()
+            try:
+                response = client.post('/api/transactions/', payload, format='json')
+                error = None if response.status_code == 201 else f'HTTP {response.status_code}'
+            except Exception as e:
+                error = f'{type(e).__name__}: {e}'
+            if error is None:
+                latencies.append((time.perf_counter() - start) * 1000.0)
+            else:
+                errors.append(error)
+    finally:
+        # Each thread has its own connections
+        connections.close_all()
+    return latencies, errors
+
+
+def run(thread_counts, requests, seed=0):
+    from django.contrib.auth.models import User
+    from ml_model.registry import get_detector
+
+    get_detector()
+    User.objects.bulk_create([User(username=f'bench-writer-{i}', password='!') for i in range(max(thread_counts))])
+    users = list(User.objects.filter(username__startswith='bench-writer-').order_by('id'))
+
+    results = {}
+    for threads in thread_counts:
+        barrier = threading.Barrier(threads + 1)
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            futures = [
+                pool.submit(create_transactions, users[i], requests, barrier, seed * 1000 + i)
+                for i in range(threads)
+            ]
+            barrier.wait()
+            start = time.perf_counter()
+            outcomes = [future.result() for future in futures]
+            seconds = time.perf_counter() - start
+
+        latencies = [latency for thread_latencies, _ in outcomes for latency in thread_latencies]
+        errors = Counter(error for _, thread_errors in outcomes for error in thread_errors)
+        timing = summarise(latencies)
+        timing.update({
+            'threads': threads,
+            'rows': len(latencies),
+            'rows_per_sec': round(len(latencies) / seconds, 1),
+            'errors': sum(errors.values()),
+            'error_types': dict(errors.most_common(5)),
+        })
+        results[f'create_{threads}_threads'] = timing
+        if latencies:
+            print(f"{threads:>4} threads: p50 {timing['p50_ms']:8.3f} ms | p95 {timing['p95_ms']:8.3f} ms | "
+                  f"p99 {timing['p99_ms']:8.3f} ms | {timing['rows_per_sec']:>8} rows/s | {timing['errors']} errors")
+        else:
+            print(f"{threads:>4} threads: every request failed")
+        for error, count in errors.most_common(3):
+            print(f"      {count} x {error}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=50, help='Transactions created per thread')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.db import connection
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tmpdir, 'concurrency.sqlite3')
+        with benchmark_database():
+            print(f"Creating {args.requests} transactions per thread on {connection.vendor}")
+            results = run(args.threads, args.requests, args.seed)
+            env = environment()
+
+    if args.json:
+        write_json({
+            'benchmark': 'concurrency',
+            'environment': env,
+            'config': {
+                'threads': args.threads, 'requests': args.requests, 'seed': args.seed,
+                'db_engine': settings.DB_ENGINE, 'conn_max_age': settings.DB_CONN_MAX_AGE,
+                'sqlite_wal': settings.SQLITE_WAL,
+            },
+            'results': results,
+        }, args.json)
+
+
+if __name__ == '__main__':
+    main()
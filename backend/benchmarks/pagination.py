@@ -0,0 +1,56 @@
+"""
+Page-number vs keyset pagination of /api/transactions/ at increasing depth
+
+    python -m benchmarks.pagination --transactions 50000 [--json results.json]
+"""
+import argparse
+from .utils import benchmark_database, measure, seed_transactions, setup_django, write_json
+
+
+def run(transactions, repeat):
+    from django.contrib.auth.models import User
+    from rest_framework.test import APIClient
+    from transactions.models import Transaction
+    from transactions.pagination import KeysetPagination
+
+    user = User.objects.create_user(username='heavy-user')
+    seed_transactions(user, transactions)
+    client = APIClient()
+    client.force_authenticate(user)
+
+    page_size = KeysetPagination.page_size
+    ordered = Transaction.objects.filter(user=user).order_by('-created_at', '-id')
+    last_page = transactions // page_size
+    depths = sorted({d for d in (1, 10, 100, 1000, last_page) if 1 <= d <= last_page})
+
+    results = []
+    for page in depths:
+        if page == 1:
+            cursor = ''
+        else:
+            cursor = KeysetPagination().encode_cursor(ordered[(page - 1) * page_size - 1])
+
+        page_number = measure(lambda: client.get(f'/api/transactions/?page={page}'), repeat=repeat)
+        keyset = measure(lambda: client.get(f'/api/transactions/?cursor={cursor}'), repeat=repeat)
+        results.append({'page': page, 'page_number': page_number, 'keyset': keyset})
+        print(f"page {page:>6}: page-number p50 {page_number['p50_ms']:8.2f} ms | "
+              f"keyset p50 {keyset['p50_ms']:8.2f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--transactions', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    setup_django()
+    with benchmark_database():
+        results = run(args.transactions, args.repeat)
+    if args.json:
+        write_json({'benchmark': 'pagination', 'transactions': args.transactions, 'results': results}, args.json)
+
+
+if __name__ == '__main__':
+    main()
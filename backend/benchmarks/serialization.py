@@ -0,0 +1,72 @@
+"""
+ModelSerializer + JSONRenderer vs the values() fast path for list responses
+
+Measures rows/sec for serializing one user's transactions (and alerts with
+the nested transaction) to JSON bytes, outside the request cycle.
+
+    python -m benchmarks.serialization --transactions 5000 [--json results.json]
+"""
+import argparse
+from .utils import benchmark_database, measure, seed_transactions, setup_django, write_json
+
+
+def run(transactions, repeat):
+    from django.contrib.auth.models import User
+    from rest_framework.renderers import JSONRenderer
+    from transactions.fastpath import JSONFragmentRenderer, ValuesSerializer
+    from transactions.models import Transaction, FraudAlert
+    from transactions.serializers import TransactionSerializer, FraudAlertExpandedSerializer
+
+    user = User.objects.create_user(username='heavy-user')
+    seed_transactions(user, transactions)
+    FraudAlert.objects.bulk_create([
+        FraudAlert(transaction_id=pk, alert_type='FRAUD_DETECTED', severity='HIGH', message='benchmark')
+        for pk in Transaction.objects.filter(user=user).values_list('pk', flat=True)
+    ])
+
+    cases = [
+        ('transactions', TransactionSerializer, Transaction.objects.filter(user=user)),
+        ('alerts_expanded', FraudAlertExpandedSerializer, FraudAlert.objects.filter(transaction__user=user)),
+    ]
+
+    results = []
+    for name, serializer_class, base in cases:
+        queryset = serializer_class.setup_eager_loading(base).order_by('-created_at', '-id')
+
+        def drf():
+            return JSONRenderer().render(serializer_class(queryset, many=True).data)
+
+        def fast():
+            values_serializer = ValuesSerializer(serializer_class)
+            rows = queryset.values(*values_serializer.lookups)
+            renderer = JSONFragmentRenderer()
+            return b''.join(renderer.stream_list(values_serializer.to_representation(row) for row in rows))
+
+        assert drf() == fast(), f"{name}: fast path output differs"
+        timings = {}
+        for label, fn in (('serializer', drf), ('fast_path', fast)):
+            timings[label] = measure(fn, repeat=repeat, warmup=1)
+            timings[label]['rows_per_sec'] = round(transactions / (timings[label]['p50_ms'] / 1000.0))
+        results.append({'case': name, **timings})
+        print(f"{name:>16}: serializer {timings['serializer']['rows_per_sec']:>9} rows/s | "
+              f"fast path {timings['fast_path']['rows_per_sec']:>9} rows/s | "
+              f"speedup {timings['serializer']['p50_ms'] / timings['fast_path']['p50_ms']:.1f}x")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--transactions', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    setup_django()
+    with benchmark_database():
+        results = run(args.transactions, args.repeat)
+    if args.json:
+        write_json({'benchmark': 'serialization', 'transactions': args.transactions, 'results': results}, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+End-to-end benchmark suite: API endpoints, inference and feature extraction
+
+Seeds a throwaway database with --users users and --transactions
+transactions (see utils.seed_dataset), then reports latency percentiles and
+throughput for each case against the most active user's data. Compare two
+runs with benchmarks.compare.
+
+    python -m benchmarks.suite --users 200 --transactions 50000 --json before.json
+    python -m benchmarks.suite --only inference_batch feature_extraction_batch
+"""
+import argparse
+import itertools
+import random
+from .utils import (
+    benchmark_database, create_payload, environment, measure, seed_dataset, setup_django, write_json
+)
+
+
+BATCH_INFERENCE_ROWS = 256
+BATCH_FEATURE_ROWS = 1000
+
+
+def build_cases(user, batch_rows, feature_rows):
+    """
+    Returns:
+        list of (name, rows per call, callable) benchmark cases
+    """
+    from rest_framework.test import APIClient
+    from ml_model.features import build_feature_matrix
+    from ml_model.registry import get_detector
+    from transactions.models import Transaction
+
+    client = APIClient()
+    client.force_authenticate(user)
+    detector = get_detector()
+    sample = list(Transaction.objects.filter(user=user).order_by('-created_at')[:max(batch_rows, feature_rows)])
+    rows = itertools.cycle(sample)
+    rng = random.Random(1)
+    batch = sample[:batch_rows]
+    features = sample[:feature_rows]
+
+    def create():
+        response = client.post('/api/transactions/', create_payload(user.username, rng), format='json')
+        assert response.status_code == 201, response.content
+
+    def get(url):
+        def fetch():
+            response = client.get(url)
+            assert response.status_code == 200, response.status_code
+            # Streamed list responses are only produced when consumed
+            b''.join(response) if response.streaming else response.content
+        return fetch
+
+    return [
+        ('transaction_create', 1, create),
+        ('transaction_list', 1, get('/api/transactions/')),
+        ('alert_list', 1, get('/api/transactions/alerts/')),
+        ('dashboard_stats', 1, get('/api/transactions/stats/')),
+        ('inference_single', 1, lambda: detector.predict(next(rows))),
+        ('inference_batch', len(batch), lambda: detector.predict_batch(batch)),
+        ('feature_extraction_single', 1, lambda: detector.extract_features(next(rows))),
+        ('feature_extraction_batch', len(features), lambda: build_feature_matrix(features)),
+    ]
+
+
+def run(users, transactions, repeat, only=None, seed=0):
+    from ml_model.registry import get_detector
+
+    people = seed_dataset(users, transactions, seed=seed)
+    heaviest = people[0]
+    print(f"Seeded {users} users and {transactions} transactions; "
+          f"benchmarking as {heaviest.username} ({heaviest.transactions.count()} transactions)")
+
+    results = {}
+    for name, rows, fn in build_cases(heaviest, BATCH_INFERENCE_ROWS, BATCH_FEATURE_ROWS):
+        if only and name not in only:
+            continue
+        timing = measure(fn, repeat=repeat, warmup=max(1, repeat // 10))
+        timing['rows'] = rows
+        timing['rows_per_sec'] = round(rows / (timing['mean_ms'] / 1000.0), 1)
+        results[name] = timing
+        print(f"{name:>26}: p50 {timing['p50_ms']:8.3f} ms | p95 {timing['p95_ms']:8.3f} ms | "
+              f"p99 {timing['p99_ms']:8.3f} ms | {timing['rows_per_sec']:>10} rows/s")
+    return results, get_detector().model_loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--transactions', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', nargs='+', help='Run only these cases')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    setup_django()
+    with benchmark_database():
+        results, model_loaded = run(args.users, args.transactions, args.repeat, args.only, args.seed)
+        env = environment()
+    env['model_loaded'] = model_loaded
+    if args.json:
+        write_json({
+            'benchmark': 'suite',
+            'environment': env,
+            'config': {'users': args.users, 'transactions': args.transactions, 'repeat': args.repeat, 'seed': args.seed},
+            'results': results,
+        }, args.json)
+
+
+if __name__ == '__main__':
+    main()
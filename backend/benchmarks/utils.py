@@ -0,0 +1,247 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'upi_fraud_detection.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    """
+    Run the benchmark against a throwaway test database
+    """
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+@contextmanager
+def manual_timestamps(model):
+    """
+    Let bulk_create keep explicit created_at/updated_at values while seeding
+    """
+    fields = [f for f in model._meta.fields if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def seed_transactions(user, count, days=365, fraud_rate=0.02, batch_size=5000, seed=0):
+    """
+    Bulk insert `count` transactions for one user spread over the last `days`
+    """
+    from django.utils import timezone
+    from transactions.models import Transaction
+
+    rng = random.Random(seed)
+    now = timezone.now()
+    with manual_timestamps(Transaction):
+        for start in range(0, count, batch_size):
+            batch = []
+            for _ in range(min(batch_size, count - start)):
+                created_at = now - timedelta(seconds=rng.uniform(0, days * 86400))
+                is_fraud = rng.random() < fraud_rate
+                batch.append(Transaction(
+                    user=user,
+                    sender_upi=f"{user.username}@upi",
+                    receiver_upi=f"merchant{rng.randint(1, 500)}@upi",
+                    amount=Decimal(str(round(rng.lognormvariate(6, 1.2), 2))).min(Decimal('99999.99')),
+                    transaction_type=rng.choice(['SEND', 'SEND', 'SEND', 'RECEIVE', 'REQUEST']),
+                    device_id=f"device-{rng.randint(1, 3)}",
+                    location=rng.choice(['Mumbai', 'Delhi', 'Bengaluru', None]),
+                    is_fraud=is_fraud,
+                    fraud_probability=rng.uniform(0.5, 1.0) if is_fraud else rng.uniform(0.0, 0.5),
+                    scoring_status=Transaction.SCORING_SCORED,
+                    created_at=created_at,
+                    updated_at=created_at,
+                ))
+            Transaction.objects.bulk_create(batch)
+
+
+# Relative share of transactions per hour of day (quiet nights, lunch and evening peaks)
+HOURLY_WEIGHTS = (
+    1, 1, 1, 1, 1, 2, 4, 7, 9, 10, 10, 11,
+    12, 11, 10, 10, 10, 11, 12, 13, 12, 9, 5, 2,
+)
+
+
+def seed_dataset(users, transactions, days=90, fraud_rate=0.02, batch_size=5000, seed=0):
+    """
+    Seed many users with transactions drawn from skewed, realistic distributions
+
+    Per-user activity is Pareto distributed (a few heavy users, a long tail),
+    amounts are log-normal, times follow HOURLY_WEIGHTS, and each user
+    mostly pays a small set of regular receivers from one device. Fraudulent
+    rows skew towards large amounts, night hours, new receivers and new
+    devices, and get a FraudAlert. Daily stats rollups are rebuilt at the end.
+
+    Returns:
+        list of the created users, most active first
+    """
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from transactions.models import Transaction, FraudAlert
+    from transactions.rollups import rebuild_daily_stats
+
+    rng = random.Random(seed)
+    User.objects.bulk_create([User(username=f'bench-user-{i}', password='!') for i in range(users)])
+    people = list(User.objects.filter(username__startswith='bench-user-').order_by('id'))
+    weights = [rng.paretovariate(1.2) for _ in people]
+    regulars = {user.pk: [f"merchant{rng.randint(1, 2000)}@upi" for _ in range(rng.randint(2, 8))] for user in people}
+    counts = dict.fromkeys((user.pk for user in people), 0)
+
+    now = timezone.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    hours = range(24)
+    night_hours = (0, 1, 2, 3, 4, 23)
+    with manual_timestamps(Transaction):
+        for start in range(0, transactions, batch_size):
+            batch = []
+            for user in rng.choices(people, weights=weights, k=min(batch_size, transactions - start)):
+                counts[user.pk] += 1
+                fraud = rng.random() < fraud_rate
+                hour = rng.choice(night_hours) if fraud and rng.random() < 0.5 else rng.choices(hours, HOURLY_WEIGHTS)[0]
+                created_at = today - timedelta(days=rng.randrange(days)) + timedelta(hours=hour, seconds=rng.randrange(3600))
+                created_at = min(created_at, now)
+                amount = rng.lognormvariate(9 if fraud else 6, 1.0 if fraud else 1.2)
+                new_receiver = rng.random() < (0.7 if fraud else 0.1)
+                batch.append(Transaction(
+                    user=user,
+                    sender_upi=f"{user.username}@upi",
+                    receiver_upi=f"payee{rng.randint(1, 10 ** 6)}@upi" if new_receiver else rng.choice(regulars[user.pk]),
+                    amount=Decimal(str(round(amount, 2))).min(Decimal('99999.99')),
+                    transaction_type=rng.choice(['SEND', 'SEND', 'SEND', 'RECEIVE', 'REQUEST']),
+                    device_id=f"device-{rng.randint(2, 9) if fraud and rng.random() < 0.5 else 1}",
+                    location=rng.choice(['Mumbai', 'Delhi', 'Bengaluru', 'Pune', 'Chennai', None]),
+                    is_fraud=fraud,
+                    fraud_probability=rng.uniform(0.5, 1.0) if fraud else rng.uniform(0.0, 0.5),
+                    scoring_status=Transaction.SCORING_SCORED,
+                    created_at=created_at,
+                    updated_at=created_at,
+                ))
+            Transaction.objects.bulk_create(batch)
+    with manual_timestamps(FraudAlert):
+        FraudAlert.objects.bulk_create(
+            [
+                FraudAlert(transaction_id=pk, alert_type='FRAUD_DETECTED', severity='HIGH',
+                           message='Seeded alert', created_at=created_at)
+                for pk, created_at in Transaction.objects.filter(is_fraud=True).values_list('pk', 'created_at')
+            ],
+            batch_size=batch_size,
+        )
+    rebuild_daily_stats()
+    return sorted(people, key=lambda user: counts[user.pk], reverse=True)
+
+
+# Just under the 100000 limit of the create endpoint
+MAX_CREATE_AMOUNT = 99999.0
+
+
+def create_payload(username, rng):
+    """
+    Body of a POST /api/transactions/ request with a log-normal amount
+
+    The amount is clamped as a number before formatting, so it stays a valid
+    two-decimal amount the endpoint accepts.
+    """
+    return {
+        'sender_upi': f'{username}@upi',
+        'receiver_upi': f'merchant{rng.randint(1, 500)}@upi',
+        'amount': f'{min(rng.lognormvariate(6, 1.2), MAX_CREATE_AMOUNT):.2f}',
+        'device_id': 'device-1',
+        'location': 'Mumbai',
+    }
+
+
+def environment():
+    """
+    Describe the machine, database and code version a benchmark ran on
+    """
+    import django
+    from django.conf import settings
+    from django.db import connection
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': sys.version.split()[0],
+        'django': django.get_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'database': connection.vendor,
+        'inference_backend': settings.ML_INFERENCE_BACKEND,
+    }
+
+
+def measure(fn, repeat=50, warmup=5):
+    """
+    Time fn() and summarise the latency distribution in milliseconds
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return summarise(samples)
+
+
+def summarise(samples):
+    """
+    Latency distribution of a list of millisecond samples
+
+    With no samples (e.g. every request failed) the statistics are None.
+    """
+    samples = sorted(samples)
+    if not samples:
+        return {'count': 0, **dict.fromkeys(('mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'min_ms', 'max_ms'))}
+
+    def percentile(p):
+        return samples[min(len(samples) - 1, int(round(p / 100.0 * (len(samples) - 1))))]
+
+    return {
+        'count': len(samples),
+        'mean_ms': sum(samples) / len(samples),
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'min_ms': samples[0],
+        'max_ms': samples[-1],
+    }
+
+
+def write_json(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
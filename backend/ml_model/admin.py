@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import SenderBehaviour
 
-# Register your models here.
+
+@admin.register(SenderBehaviour)
+class SenderBehaviourAdmin(admin.ModelAdmin):
+    list_display = ['sender_upi', 'last_seen', 'updated_at']
+    search_fields = ['sender_upi']
+    readonly_fields = ['state', 'last_seen', 'updated_at']
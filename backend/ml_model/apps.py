@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class MlModelConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ml_model'
+
+    def ready(self):
+        from .registry import DetectorRegistry
+
+        # Shared detector for this process; loaded lazily or by registry.warm_up()
+        self.registry = DetectorRegistry()
@@ -0,0 +1,167 @@
+"""
+Batch Scheduler - micro-batches concurrent inference requests
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from .metrics import histogram
+
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+WAIT_TIME_BUCKETS = (0.0005, 0.001, 0.002, 0.003, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+batch_size_histogram = histogram(
+    'ml_batch_size', BATCH_SIZE_BUCKETS, 'Rows per model forward pass')
+batch_wait_histogram = histogram(
+    'ml_batch_wait_seconds', WAIT_TIME_BUCKETS, 'Time a request waited in the batching queue')
+
+_STOP = object()
+
+
+class _Request:
+    __slots__ = ('features', 'future', 'enqueued_at')
+
+    def __init__(self, features):
+        self.features = features
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchScheduler:
+    """
+    Collects feature arrays submitted from many threads and scores them together.
+
+    A background thread waits for the first request, then keeps collecting until
+    either max_batch_size rows are queued or max_wait_ms has passed since that
+    first request. The batch is scored with a single predict_fn call and the
+    rows are handed back to each waiting caller.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=3.0):
+        """
+        Initialize the scheduler
+
+        Args:
+            predict_fn: Callable taking an (N, 8, 8, 1) array and returning (N, 1) probabilities
+            max_batch_size: Maximum rows per forward pass
+            max_wait_ms: Maximum time to hold the first request while filling a batch
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so start one lazily in each worker process
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='ml-batch-scheduler', daemon=True)
+            self._thread.start()
+
+    def submit(self, features):
+        """
+        Queue features for scoring
+
+        Args:
+            features: Array of shape (k, 8, 8, 1)
+
+        Returns:
+            Future resolving to an array of k probabilities with shape (k, 1)
+        """
+        request = _Request(features)
+        if self._closed:
+            # Scheduler was retired by a model reload; score directly
+            try:
+                request.future.set_result(self.predict_fn(features))
+            except Exception as e:
+                request.future.set_exception(e)
+            return request.future
+
+        self._ensure_worker()
+        self._queue.put(request)
+        return request.future
+
+    def predict(self, features, timeout=None):
+        return self.submit(features).result(timeout)
+
+    def close(self):
+        """
+        Stop the worker thread once the already queued requests are scored
+        """
+        self._closed = True
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+
+    def _collect(self, first):
+        batch = [first]
+        rows = len(first.features)
+        deadline = first.enqueued_at + self.max_wait
+        stop = False
+
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is _STOP:
+                stop = True
+                break
+            batch.append(request)
+            rows += len(request.features)
+
+        return batch, stop
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+
+            batch, stop = self._collect(first)
+            self._score(batch)
+            if stop:
+                break
+
+        # Drain anything submitted while stopping
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not _STOP:
+                self._score([request])
+
+    def _score(self, batch):
+        dispatched_at = time.perf_counter()
+        for request in batch:
+            batch_wait_histogram.observe(dispatched_at - request.enqueued_at)
+
+        try:
+            X = np.concatenate([request.features for request in batch], axis=0)
+            batch_size_histogram.observe(len(X))
+            probabilities = self.predict_fn(X)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        offset = 0
+        for request in batch:
+            count = len(request.features)
+            request.future.set_result(probabilities[offset:offset + count])
+            offset += count
@@ -0,0 +1,124 @@
+"""
+Cascade Scoring - screens transactions with the rule engine and only sends
+the ambiguous band to the CNN
+
+A rule score below FRAUD_CASCADE_CLEAR_BELOW clears the transaction, a score
+of at least FRAUD_CASCADE_FLAG_AT flags it, and anything in between is
+forwarded to the model.
+"""
+import numpy as np
+from django.conf import settings
+from .metrics import counter, histogram
+
+
+CLEARED = 'cleared'
+FLAGGED = 'flagged'
+FORWARDED = 'forwarded'
+
+TIER_LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+
+rules_tier_histogram = histogram(
+    'ml_tier_rules_seconds', TIER_LATENCY_BUCKETS, 'Time spent in the rule tier per scoring call')
+cnn_tier_histogram = histogram(
+    'ml_tier_cnn_seconds', TIER_LATENCY_BUCKETS, 'Time spent in the CNN tier per scoring call')
+
+decision_counters = {
+    decision: counter(f'ml_cascade_{decision}_total', f'Transactions {decision} by the cascade')
+    for decision in (CLEARED, FLAGGED, FORWARDED)
+}
+
+
+def thresholds():
+    """
+    Returns:
+        (clear_below, flag_at) from settings
+    """
+    return settings.FRAUD_CASCADE_CLEAR_BELOW, settings.FRAUD_CASCADE_FLAG_AT
+
+
+def decide(rule_probability, clear_below, flag_at):
+    """
+    Cascade decision for a rule-engine fraud probability
+    """
+    if rule_probability < clear_below:
+        return CLEARED
+    if rule_probability >= flag_at:
+        return FLAGGED
+    return FORWARDED
+
+
+def screen(rule_results, clear_below=None, flag_at=None):
+    """
+    Apply the cascade to rule-engine results
+
+    Rule results for cleared and flagged transactions are finalised in place
+    (is_fraud follows the decision); forwarded ones are left for the CNN.
+
+    Returns:
+        list of decisions, in input order
+    """
+    if clear_below is None or flag_at is None:
+        clear_below, flag_at = thresholds()
+    decisions = []
+    for result in rule_results:
+        decision = decide(result['fraud_probability'], clear_below, flag_at)
+        result['cascade'] = decision
+        if decision != FORWARDED:
+            result['is_fraud'] = decision == FLAGGED
+        decisions.append(decision)
+        decision_counters[decision].inc()
+    return decisions
+
+
+def _scores(labels, predicted):
+    true_positives = int((labels & predicted).sum())
+    positives = int(labels.sum())
+    flagged = int(predicted.sum())
+    return {
+        'recall': true_positives / positives if positives else None,
+        'precision': true_positives / flagged if flagged else None,
+        'flagged': flagged,
+    }
+
+
+def evaluate(labels, rule_probabilities, cnn_probabilities, clear_below, flag_at):
+    """
+    Offline quality of the cascade against the CNN alone on a labelled set
+
+    Args:
+        labels: Boolean array of true fraud labels
+        rule_probabilities: Rule-engine fraud probabilities
+        cnn_probabilities: CNN fraud probabilities for every row
+        clear_below: Cascade clear threshold
+        flag_at: Cascade flag threshold
+
+    Returns:
+        dict with the share of rows forwarded to the CNN and recall/precision
+        of the cascade and of the CNN alone
+    """
+    labels = np.asarray(labels, dtype=bool)
+    rule_probabilities = np.asarray(rule_probabilities, dtype=np.float64)
+    cnn_fraud = np.asarray(cnn_probabilities, dtype=np.float64) > 0.5
+
+    cleared = rule_probabilities < clear_below
+    flagged = ~cleared & (rule_probabilities >= flag_at)
+    forwarded = ~cleared & ~flagged
+    cascade = flagged | (forwarded & cnn_fraud)
+
+    cnn_only = _scores(labels, cnn_fraud)
+    result = {
+        'clear_below': clear_below,
+        'flag_at': flag_at,
+        'rows': int(len(labels)),
+        'cleared': int(cleared.sum()),
+        'flagged_by_rules': int(flagged.sum()),
+        'forwarded': int(forwarded.sum()),
+        'forwarded_share': float(forwarded.mean()) if len(labels) else 0.0,
+        'cascade': _scores(labels, cascade),
+        'cnn_only': cnn_only,
+        # Frauds the CNN alone catches but the cascade cleared
+        'missed_by_cascade': int((labels & cnn_fraud & cleared).sum()),
+    }
+    if result['cascade']['recall'] is not None and cnn_only['recall'] is not None:
+        result['recall_change'] = result['cascade']['recall'] - cnn_only['recall']
+    return result
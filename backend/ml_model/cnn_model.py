@@ -2,6 +2,7 @@
 CNN Model for UPI Fraud Detection
 This module contains the CNN architecture for detecting fraudulent transactions
 """
+import logging
 import numpy as np
 import tensorflow as tf
 from tensorflow import keras
@@ -11,6 +12,8 @@ from sklearn.preprocessing import StandardScaler
 import joblib
 
 
+logger = logging.getLogger(__name__)
+
 class FraudDetectionCNN:
     """
     Convolutional Neural Network for detecting fraudulent UPI transactions.
@@ -27,6 +30,10 @@ class FraudDetectionCNN:
         self.input_shape = input_shape
         self.model = None
         self.scaler = StandardScaler()
+    
+    @property
+    def is_loaded(self):
+        return self.model is not None
         
     def build_model(self):
         """
@@ -119,6 +126,47 @@ class FraudDetectionCNN:
         
         return history
     
+    def train_streaming(self, chunks, epochs=50, batch_size=256, validation_every=10,
+                        prefetch=None, checkpoint_path='best_model.h5', shuffle_buffer=50000, seed=None):
+        """
+        Train the CNN from a chunk source without loading the data into memory
+        
+        The scaler is fitted incrementally with partial_fit in one pass over
+        the training rows, then each epoch streams the data again through a
+        tf.data pipeline (see training.py).
+        
+        Args:
+            chunks: Callable returning a fresh iterator of (features, labels) chunks
+            epochs: Number of training epochs
+            batch_size: Batch size for training
+            validation_every: Every n-th row is held out for validation
+            prefetch: Batches prepared ahead of the training step
+            checkpoint_path: Where the best model so far is saved
+            shuffle_buffer: Training rows shuffled together each epoch (0 keeps stream order)
+            seed: Seed of the shuffle
+        """
+        from .training import fit_scaler, make_dataset, split_chunks
+        
+        if self.model is None:
+            self.build_model()
+        
+        train_chunks, val_chunks = split_chunks(chunks, validation_every)
+        self.scaler, rows = fit_scaler(train_chunks, StandardScaler())
+        logger.info("Scaler fitted on %d training rows", rows)
+        
+        callbacks = [
+            EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True),
+            ModelCheckpoint(checkpoint_path, monitor='val_loss', save_best_only=True)
+        ]
+        
+        return self.model.fit(
+            make_dataset(train_chunks, self.scaler, batch_size, prefetch, shuffle_buffer, seed),
+            validation_data=make_dataset(val_chunks, self.scaler, batch_size, prefetch),
+            epochs=epochs,
+            callbacks=callbacks,
+            verbose=1
+        )
+    
     def predict(self, X):
         """
         Make predictions on new data
@@ -129,9 +177,14 @@ class FraudDetectionCNN:
         Returns:
             Fraud probabilities
         """
-        X_scaled = self.scaler.transform(X.reshape(X.shape[0], -1))
-        X_scaled = X_scaled.reshape(X.shape)
-        return self.model.predict(X_scaled)
+        # Imported here so this file still runs as a standalone training script
+        from .numpy_runtime import forward_histogram, scaler_histogram
+        
+        with scaler_histogram.time():
+            X_scaled = self.scaler.transform(X.reshape(X.shape[0], -1))
+            X_scaled = X_scaled.reshape(X.shape)
+        with forward_histogram.time():
+            return self.model.predict(X_scaled)
     
     def save_model(self, model_path, scaler_path):
         """
@@ -143,8 +196,7 @@ class FraudDetectionCNN:
         """
         self.model.save(model_path)
         joblib.dump(self.scaler, scaler_path)
-        print(f"Model saved to {model_path}")
-        print(f"Scaler saved to {scaler_path}")
+        logger.info("Model saved to %s, scaler saved to %s", model_path, scaler_path)
     
     def load_model(self, model_path, scaler_path):
         """
@@ -156,8 +208,7 @@ class FraudDetectionCNN:
         """
         self.model = keras.models.load_model(model_path)
         self.scaler = joblib.load(scaler_path)
-        print(f"Model loaded from {model_path}")
-        print(f"Scaler loaded from {scaler_path}")
+        logger.info("Model loaded from %s, scaler loaded from %s", model_path, scaler_path)
 
 
 def create_synthetic_data(n_samples=10000):
@@ -192,6 +243,8 @@ def create_synthetic_data(n_samples=10000):
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    
     # Example usage
     print("Creating synthetic training data...")
     X, y = create_synthetic_data(10000)
@@ -218,3 +271,4 @@ if __name__ == "__main__":
     cnn.save_model('fraud_detection_cnn.h5', 'scaler.pkl')
     
     print("\nTraining complete!")
+    print("Run 'python manage.py export_numpy_model' to build the TensorFlow-free NumPy runtime model")
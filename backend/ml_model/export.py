@@ -0,0 +1,143 @@
+"""
+Model Export - converts a trained FraudDetectionCNN into the NumPy runtime format
+"""
+import json
+import logging
+import numpy as np
+from .numpy_runtime import FORMAT_VERSION
+
+
+logger = logging.getLogger(__name__)
+
+
+def _bn_affine(layer):
+    gamma, beta, moving_mean, moving_var = [w.astype(np.float64) for w in layer.get_weights()]
+    scale = gamma / np.sqrt(moving_var + layer.epsilon)
+    shift = beta - moving_mean * scale
+    return scale, shift
+
+
+def _fold_affine_into_dense(affine, dense, flatten_shape=None):
+    """
+    Fold y = x * scale + shift into the following Dense layer's kernel and bias
+    """
+    scale, shift = affine['scale'], affine['shift']
+    if flatten_shape is not None:
+        # Per-channel statistics repeat for every spatial position after Flatten
+        repeats = int(np.prod(flatten_shape[:-1]))
+        scale = np.tile(scale, repeats)
+        shift = np.tile(shift, repeats)
+    kernel = dense['kernel'].astype(np.float64)
+    dense['bias'] = dense['bias'] + shift @ kernel
+    dense['kernel'] = scale[:, None] * kernel
+
+
+def convert_layers(keras_model):
+    """
+    Translate Keras layers into runtime ops
+
+    Inference-only layers (Dropout) are dropped and BatchNormalization is turned
+    into an affine op, which is folded into the next Dense layer when one
+    follows (directly, or after Flatten).
+
+    Returns:
+        list of op dicts with NumPy arrays
+    """
+    ops = []
+    pending = None
+    flatten_shape = None
+
+    for layer in keras_model.layers:
+        kind = layer.__class__.__name__
+        config = layer.get_config()
+
+        if kind == 'Dropout':
+            continue
+
+        if kind == 'Dense':
+            kernel, bias = [w.astype(np.float64) for w in layer.get_weights()]
+            op = {'op': 'dense', 'kernel': kernel, 'bias': bias, 'activation': config['activation']}
+            if pending is not None:
+                _fold_affine_into_dense(pending, op, flatten_shape)
+                pending = None
+            flatten_shape = None
+            ops.append(op)
+            continue
+
+        if kind == 'Flatten':
+            if pending is not None:
+                flatten_shape = tuple(layer.input_shape[1:])
+            ops.append({'op': 'flatten'})
+            continue
+
+        # Any other layer stops an affine from being folded forward
+        if pending is not None:
+            if flatten_shape is not None:
+                raise ValueError('BatchNormalization before Flatten must be followed by a Dense layer')
+            ops.append(pending)
+            pending = None
+
+        if kind == 'BatchNormalization':
+            scale, shift = _bn_affine(layer)
+            pending = {'op': 'affine', 'scale': scale, 'shift': shift}
+        elif kind == 'Conv2D':
+            if tuple(config['strides']) != (1, 1) or tuple(config.get('dilation_rate', (1, 1))) != (1, 1):
+                raise ValueError('Only stride 1, undilated Conv2D layers can be exported')
+            kernel, bias = layer.get_weights()
+            ops.append({
+                'op': 'conv2d', 'kernel': kernel, 'bias': bias,
+                'padding': config['padding'], 'activation': config['activation'],
+            })
+        elif kind == 'MaxPooling2D':
+            if tuple(config['strides']) != tuple(config['pool_size']) or config['padding'] != 'valid':
+                raise ValueError('Only non-overlapping, valid MaxPooling2D layers can be exported')
+            ops.append({'op': 'maxpool', 'pool_size': list(config['pool_size'])})
+        else:
+            raise ValueError(f"Layer type {kind} is not supported by the NumPy runtime")
+
+    if pending is not None:
+        ops.append(pending)
+    return ops
+
+
+def save_artifact(ops, scaler_mean, scaler_scale, input_shape, path):
+    """
+    Write runtime ops and scaler statistics to a single .npz file
+    """
+    arrays = {
+        'scaler_mean': np.asarray(scaler_mean, dtype=np.float32),
+        'scaler_scale': np.asarray(scaler_scale, dtype=np.float32),
+    }
+    layers = []
+    for index, op in enumerate(ops):
+        layer = {}
+        names = []
+        for key, value in op.items():
+            if isinstance(value, np.ndarray):
+                arrays[f'layer{index}_{key}'] = value.astype(np.float32)
+                names.append(key)
+            else:
+                layer[key] = value
+        layer['arrays'] = names
+        layers.append(layer)
+
+    spec = {
+        'format_version': FORMAT_VERSION,
+        'input_shape': list(input_shape),
+        'layers': layers,
+    }
+    with open(path, 'wb') as f:
+        np.savez(f, spec=np.array(json.dumps(spec)), **arrays)
+
+
+def export_numpy_model(cnn, path):
+    """
+    Export a trained FraudDetectionCNN for the NumPy runtime
+
+    Args:
+        cnn: FraudDetectionCNN with a built/loaded model and fitted scaler
+        path: Destination .npz path
+    """
+    ops = convert_layers(cnn.model)
+    save_artifact(ops, cnn.scaler.mean_, cnn.scaler.scale_, cnn.input_shape, path)
+    logger.info("NumPy model exported to %s", path)
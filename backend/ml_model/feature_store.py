@@ -0,0 +1,332 @@
+"""
+Behavioural Feature Store - per-sender sliding-window aggregates
+
+Every sender UPI keeps bucketed 1h/24h/7d windows of transaction counts and
+amount sums, plus the receivers, devices and locations it has used. Recording
+a transaction touches one bucket per window, and reading a window sums a fixed
+number of buckets, so neither depends on the sender's history length.
+
+Profiles are cached in an in-process LRU and persisted in the SenderBehaviour
+table; a restart reloads them lazily instead of replaying transactions.
+"""
+import copy
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_timezone
+import numpy as np
+from django.conf import settings
+from django.db import transaction as db_transaction
+from .models import SenderBehaviour
+
+
+# (name, length in seconds, bucket width in seconds)
+WINDOWS = (
+    ('1h', 3600, 300),
+    ('24h', 24 * 3600, 3600),
+    ('7d', 7 * 24 * 3600, 6 * 3600),
+)
+
+WINDOW_FEATURES = ('count', 'amount_sum', 'amount_mean', 'amount_std', 'distinct_receivers')
+
+BEHAVIOUR_FEATURES = tuple(
+    f'{feature}_{name}' for name, _, _ in WINDOWS for feature in WINDOW_FEATURES
+) + ('new_device', 'new_location')
+
+BEHAVIOUR_FEATURE_COUNT = len(BEHAVIOUR_FEATURES)
+
+# Distinct receivers/devices/locations remembered per sender
+MAX_TRACKED_VALUES = 256
+
+
+def _empty_ring(length, width):
+    buckets = length // width
+    return {'epoch': [-1] * buckets, 'count': [0] * buckets, 'sum': [0.0] * buckets, 'sumsq': [0.0] * buckets}
+
+
+def _track(values, value, timestamp):
+    seen = values.get(value)
+    if seen is None:
+        values[value] = [timestamp, timestamp]
+        if len(values) > MAX_TRACKED_VALUES:
+            # Keep the most recently used half; amortised O(1) per insert
+            recent = sorted(values.items(), key=lambda item: item[1][1], reverse=True)
+            values.clear()
+            values.update(recent[:MAX_TRACKED_VALUES // 2])
+    else:
+        seen[0] = min(seen[0], timestamp)
+        seen[1] = max(seen[1], timestamp)
+
+
+class BehaviourProfile:
+    """
+    Sliding-window state of one sender.
+
+    Reads are exact to the bucket width of each window (5 minutes for 1h,
+    1 hour for 24h, 6 hours for 7d) and include every recorded transaction
+    up to the requested time, the current one included.
+    """
+
+    def __init__(self, state=None):
+        state = state or {}
+        windows = state.get('windows', {})
+        self.windows = {
+            name: windows.get(name) or _empty_ring(length, width)
+            for name, length, width in WINDOWS
+        }
+        # value -> [first seen, last seen] as Unix timestamps
+        self.receivers = state.get('receivers', {})
+        self.devices = state.get('devices', {})
+        self.locations = state.get('locations', {})
+        self.last_seen = state.get('last_seen', 0.0)
+
+    def to_state(self):
+        return {
+            'windows': self.windows,
+            'receivers': self.receivers,
+            'devices': self.devices,
+            'locations': self.locations,
+            'last_seen': self.last_seen,
+        }
+
+    def observe(self, timestamp, amount, receiver=None, device=None, location=None):
+        """
+        Add one transaction to the windows
+        """
+        amount = float(amount)
+        for name, _, width in WINDOWS:
+            ring = self.windows[name]
+            epoch = int(timestamp // width)
+            slot = epoch % len(ring['epoch'])
+            if ring['epoch'][slot] != epoch:
+                if ring['epoch'][slot] > epoch:
+                    # Older than anything this window still holds
+                    continue
+                ring['epoch'][slot] = epoch
+                ring['count'][slot] = 0
+                ring['sum'][slot] = 0.0
+                ring['sumsq'][slot] = 0.0
+            ring['count'][slot] += 1
+            ring['sum'][slot] += amount
+            ring['sumsq'][slot] += amount * amount
+
+        for values, value in ((self.receivers, receiver), (self.devices, device), (self.locations, location)):
+            if value:
+                _track(values, value, timestamp)
+        self.last_seen = max(self.last_seen, timestamp)
+
+    def window_stats(self, name, length, width, at):
+        """
+        Returns:
+            (count, amount sum, amount sum of squares) of the window ending at `at`
+        """
+        ring = self.windows[name]
+        newest = int(at // width)
+        oldest = newest - length // width + 1
+        count, total, squares = 0, 0.0, 0.0
+        for epoch, bucket_count, bucket_sum, bucket_squares in zip(
+            ring['epoch'], ring['count'], ring['sum'], ring['sumsq']
+        ):
+            if oldest <= epoch <= newest:
+                count += bucket_count
+                total += bucket_sum
+                squares += bucket_squares
+        return count, total, squares
+
+    def features(self, at, device=None, location=None):
+        """
+        Normalised behavioural features, in BEHAVIOUR_FEATURES order, at time `at`
+        """
+        row = []
+        for name, length, width in WINDOWS:
+            count, total, squares = self.window_stats(name, length, width, at)
+            mean = total / count if count else 0.0
+            std = math.sqrt(max(squares / count - mean * mean, 0.0)) if count else 0.0
+            receivers = sum(1 for first, last in self.receivers.values() if at - length < last <= at)
+            row.extend([count / 100.0, total / 100000.0, mean / 100000.0, std / 100000.0, receivers / 100.0])
+
+        # New means first used by this transaction (or not remembered any more)
+        for values, value in ((self.devices, device), (self.locations, location)):
+            seen = values.get(value) if value else None
+            row.append(1.0 if value and (seen is None or seen[0] >= at) else 0.0)
+        return row
+
+
+def _observe(profile, transaction):
+    profile.observe(
+        transaction.created_at.timestamp(), transaction.amount,
+        transaction.receiver_upi, transaction.device_id, transaction.location
+    )
+
+
+class FeatureStore:
+    """
+    LRU cache of BehaviourProfiles in front of the SenderBehaviour table.
+
+    Cached profiles are never mutated: record() builds fresh ones from the
+    locked database rows and swaps them in after commit, so concurrent readers
+    and other worker processes never see or persist a lost update. Entries
+    expire after BEHAVIOUR_CACHE_TTL seconds to pick up writes from other
+    processes.
+    """
+
+    def __init__(self, max_profiles=None, ttl=None):
+        self._max_profiles = max_profiles
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_profiles(self):
+        return self._max_profiles or settings.BEHAVIOUR_CACHE_SIZE
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else settings.BEHAVIOUR_CACHE_TTL
+
+    def _remember(self, profiles, now):
+        for key, profile in profiles.items():
+            self._cache[key] = (profile, now)
+            self._cache.move_to_end(key)
+        while len(self._cache) > self.max_profiles:
+            self._cache.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def get_many(self, senders):
+        """
+        Profiles for many senders, loading cache misses with one query
+
+        Returns:
+            dict mapping sender UPI to BehaviourProfile
+        """
+        now = time.monotonic()
+        profiles, missing = {}, []
+        with self._lock:
+            for key in set(senders):
+                entry = self._cache.get(key)
+                if entry is not None and now - entry[1] <= self.ttl:
+                    self._cache.move_to_end(key)
+                    profiles[key] = entry[0]
+                else:
+                    missing.append(key)
+            self.hits += len(profiles)
+            self.misses += len(missing)
+
+        if missing:
+            states = dict(SenderBehaviour.objects.filter(sender_upi__in=missing).values_list('sender_upi', 'state'))
+            loaded = {key: BehaviourProfile(states.get(key)) for key in missing}
+            with self._lock:
+                self._remember(loaded, now)
+            profiles.update(loaded)
+        return profiles
+
+    def features(self, transactions):
+        """
+        Behavioural features for a batch of transactions
+
+        Saved transactions are read as already recorded. Unsaved ones are
+        folded into private copies of their sender's profile in time order,
+        so later rows of the same batch see the earlier ones.
+
+        Args:
+            transactions: Sequence of Transaction model instances
+
+        Returns:
+            float64 array of shape (N, BEHAVIOUR_FEATURE_COUNT)
+        """
+        profiles = self.get_many(t.sender_upi for t in transactions)
+        working = {}
+        rows = np.zeros((len(transactions), BEHAVIOUR_FEATURE_COUNT), dtype=np.float64)
+
+        for index in sorted(range(len(transactions)), key=lambda i: transactions[i].created_at):
+            transaction = transactions[index]
+            key = transaction.sender_upi
+            profile = working.get(key) or profiles[key]
+            if transaction.pk is None:
+                if key not in working:
+                    profile = working[key] = copy.deepcopy(profile)
+                _observe(profile, transaction)
+            rows[index] = profile.features(
+                transaction.created_at.timestamp(), transaction.device_id, transaction.location
+            )
+        return rows
+
+    def record(self, transactions):
+        """
+        Add newly saved transactions to their senders' profiles
+
+        No-op unless BEHAVIOUR_FEATURES_ENABLED is set.
+        """
+        if not settings.BEHAVIOUR_FEATURES_ENABLED or not transactions:
+            return
+
+        senders = {t.sender_upi for t in transactions}
+        with db_transaction.atomic():
+            states = dict(
+                SenderBehaviour.objects.select_for_update()
+                .filter(sender_upi__in=senders).values_list('sender_upi', 'state')
+            )
+            profiles = {key: BehaviourProfile(states.get(key)) for key in senders}
+            for transaction in sorted(transactions, key=lambda t: t.created_at):
+                _observe(profiles[transaction.sender_upi], transaction)
+
+            save_profiles(profiles)
+            db_transaction.on_commit(lambda: self._store(profiles))
+
+    def _store(self, profiles):
+        with self._lock:
+            self._remember(profiles, time.monotonic())
+
+
+def save_profiles(profiles, batch_size=1000):
+    """
+    Upsert BehaviourProfiles keyed by sender UPI
+    """
+    SenderBehaviour.objects.bulk_create(
+        [
+            SenderBehaviour(
+                sender_upi=key, state=profile.to_state(),
+                last_seen=datetime.fromtimestamp(profile.last_seen, tz=dt_timezone.utc)
+            )
+            for key, profile in profiles.items()
+        ],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['sender_upi'],
+        update_fields=['state', 'last_seen', 'updated_at'],
+    )
+
+
+def rebuild_feature_store(chunk_size=5000):
+    """
+    Replay all transactions into fresh sender profiles
+
+    Returns:
+        Number of sender profiles written
+    """
+    from transactions.models import Transaction
+
+    profiles = {}
+    rows = Transaction.objects.order_by('created_at', 'id').values_list(
+        'sender_upi', 'created_at', 'amount', 'receiver_upi', 'device_id', 'location'
+    )
+    for sender, created_at, amount, receiver, device, location in rows.iterator(chunk_size=chunk_size):
+        profile = profiles.get(sender)
+        if profile is None:
+            profile = profiles[sender] = BehaviourProfile()
+        profile.observe(created_at.timestamp(), amount, receiver, device, location)
+
+    with db_transaction.atomic():
+        SenderBehaviour.objects.all().delete()
+        save_profiles(profiles)
+    feature_store.clear()
+    return len(profiles)
+
+
+feature_store = FeatureStore()
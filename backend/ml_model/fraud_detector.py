@@ -1,11 +1,41 @@
 """
 Fraud Detector - Main interface for fraud detection
 """
+import logging
 import numpy as np
 import os
+import time
 from datetime import datetime
 from django.conf import settings
-from .cnn_model import FraudDetectionCNN
+from .batching import BatchScheduler
+from .cascade import FORWARDED, cnn_tier_histogram, rules_tier_histogram, screen
+from .feature_store import feature_store
+from .features import BEHAVIOUR_OFFSET, GRAPH_OFFSET, build_feature_matrix
+from .graph import GRAPH_FEATURE_SCALE, get_graph
+from .metrics import LATENCY_BUCKETS, counter, histogram
+from .prediction_cache import feature_key, model_version, prediction_cache
+from .rules import get_rule_engine
+
+
+logger = logging.getLogger(__name__)
+
+feature_histogram = histogram(
+    'ml_feature_extraction_seconds', LATENCY_BUCKETS,
+    'Time spent building CNN inputs, per predict or predict_batch call'
+)
+
+prediction_counters = {
+    method: counter('ml_predictions_total', 'Transactions scored, by detection method', {'method': method})
+    for method in ('cnn_model', 'rule_based')
+}
+
+fallback_counters = {
+    reason: counter(
+        'ml_rule_fallbacks_total', 'Transactions scored by the rules because the CNN could not be used',
+        {'reason': reason}
+    )
+    for reason in ('model_unavailable', 'error')
+}
 
 
 class FraudDetector:
@@ -15,33 +45,102 @@ class FraudDetector:
     
     def __init__(self):
         self.model = None
+        self.model_version = None
+        self.batcher = None
         self.load_model()
     
     def load_model(self):
         """
-        Load the trained CNN model
+        Load the trained CNN model with the configured inference backend
         """
         try:
-            model_path = settings.ML_MODEL_PATH
-            scaler_path = settings.SCALER_PATH
+            if settings.ML_INFERENCE_BACKEND == 'numpy':
+                self.model = self._load_numpy_model()
+            else:
+                self.model = self._load_keras_model()
             
-            if os.path.exists(model_path) and os.path.exists(scaler_path):
-                self.model = FraudDetectionCNN()
-                self.model.load_model(str(model_path), str(scaler_path))
-                print("Fraud detection model loaded successfully")
+            if self.model is not None:
+                logger.info("Fraud detection model loaded successfully")
+                self.model_version = model_version(self.model_files())
+                
+                if settings.ML_BATCHING_ENABLED:
+                    self.batcher = BatchScheduler(
+                        self.model.predict,
+                        max_batch_size=settings.ML_BATCH_MAX_SIZE,
+                        max_wait_ms=settings.ML_BATCH_MAX_WAIT_MS
+                    )
             else:
-                print("Model files not found. Using rule-based detection.")
-                self.model = None
-        except Exception as e:
-            print(f"Error loading model: {str(e)}")
+                logger.warning("Model files not found. Using rule-based detection.")
+        except Exception:
+            logger.exception("Error loading model")
             self.model = None
     
-    def extract_features(self, transaction):
+    def model_files(self):
+        if settings.ML_INFERENCE_BACKEND == 'numpy':
+            return [settings.ML_NUMPY_MODEL_PATH]
+        return [settings.ML_MODEL_PATH, settings.SCALER_PATH]
+    
+    def _load_keras_model(self):
+        model_path, scaler_path = self.model_files()
+        
+        if not (os.path.exists(model_path) and os.path.exists(scaler_path)):
+            return None
+        
+        # Imported here so TensorFlow is only loaded when the Keras backend is used
+        from .cnn_model import FraudDetectionCNN
+        
+        model = FraudDetectionCNN()
+        model.load_model(str(model_path), str(scaler_path))
+        return model
+    
+    def _load_numpy_model(self):
+        model_path, = self.model_files()
+        
+        if not os.path.exists(model_path):
+            return None
+        
+        from .numpy_runtime import NumpyFraudModel
+        
+        return NumpyFraudModel.load(str(model_path))
+    
+    def close(self):
+        """
+        Release background resources held by this detector
+        """
+        if self.batcher is not None:
+            self.batcher.close()
+    
+    @property
+    def model_loaded(self):
+        """
+        True when a trained CNN is available for inference
+        """
+        return self.model is not None and self.model.is_loaded
+    
+    def behaviour_features(self, transactions):
+        """
+        Behavioural window features for transactions, or None when the feature store is disabled
+        """
+        if not settings.BEHAVIOUR_FEATURES_ENABLED:
+            return None
+        return feature_store.features(transactions)
+    
+    def graph_features(self, transactions):
+        """
+        Raw counterparty graph features for transactions, or None when the graph is disabled
+        """
+        if not settings.GRAPH_FEATURES_ENABLED:
+            return None
+        return get_graph().batch_features(transactions)
+    
+    def extract_features(self, transaction, behaviour=None, graph=None):
         """
         Extract features from a transaction object
         
         Args:
             transaction: Transaction model instance
+            behaviour: Optional behavioural feature row for the transaction's sender
+            graph: Optional raw counterparty graph feature row
             
         Returns:
             Feature array shaped for CNN input
@@ -85,92 +184,191 @@ class FraudDetector:
             else:
                 features.append(0.0)
         
+        # 7. Sender behaviour over sliding windows (feature store)
+        if behaviour is not None:
+            features[BEHAVIOUR_OFFSET:BEHAVIOUR_OFFSET + len(behaviour)] = list(behaviour)
+        
+        # 8. Sender/receiver velocity and fan-out (counterparty graph)
+        if graph is not None:
+            features[GRAPH_OFFSET:GRAPH_OFFSET + len(graph)] = list(graph / GRAPH_FEATURE_SCALE)
+        
         # Reshape to (8, 8, 1) for CNN
         features = np.array(features[:64]).reshape(1, 8, 8, 1).astype(np.float32)
         return features
     
-    def rule_based_detection(self, transaction):
+    def score(self, features):
         """
-        Simple rule-based fraud detection as fallback
+        Run the CNN on a feature array, reusing cached probabilities when
+        ML_PREDICTION_CACHE_ENABLED is set
+        
+        Args:
+            features: Array of shape (N, 8, 8, 1)
+            
+        Returns:
+            float array of N fraud probabilities
+        """
+        if not settings.ML_PREDICTION_CACHE_ENABLED:
+            return self._forward(features)
+        
+        keys = [feature_key(row, self.model_version) for row in features]
+        cached = prediction_cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        probabilities = np.array([cached.get(key, 0.0) for key in keys], dtype=np.float64)
+        if missing:
+            fresh = self._forward(features[missing])
+            probabilities[missing] = fresh
+            prediction_cache.set_many({keys[i]: float(p) for i, p in zip(missing, fresh)})
+        return probabilities
+    
+    def _forward(self, features):
+        # Single rows are micro-batched with concurrent requests when enabled
+        if self.batcher is not None and len(features) == 1:
+            return self.batcher.predict(features, timeout=5)[:, 0]
+        return self.model.predict(features)[:, 0]
+    
+    def rule_based_detection(self, transaction, graph=None):
+        """
+        Rule-based fraud detection as fallback (see rules.py and rulesets/default.json)
         
         Args:
             transaction: Transaction model instance
+            graph: Optional raw counterparty graph feature row; enables the graph rules
             
         Returns:
             dict with fraud detection results
         """
-        fraud_score = 0.0
-        reasons = []
-        
-        amount = float(transaction.amount)
+        return get_rule_engine().evaluate(transaction, graph)
+    
+    def cnn_result(self, probability, rule_result=None):
+        """
+        Build the detection result for a CNN fraud probability
         
-        # Rule 1: Very high amount
-        if amount > 50000:
-            fraud_score += 0.3
-            reasons.append("High transaction amount")
-        
-        # Rule 2: Unusual time (late night/early morning)
-        hour = transaction.created_at.hour
-        if hour < 6 or hour > 22:
-            fraud_score += 0.2
-            reasons.append("Unusual transaction time")
-        
-        # Rule 3: Round amounts (often suspicious)
-        if amount % 1000 == 0 and amount > 10000:
-            fraud_score += 0.15
-            reasons.append("Round amount transaction")
-        
-        # Rule 4: Missing device or location info
-        if not transaction.device_id or not transaction.location:
-            fraud_score += 0.25
-            reasons.append("Missing device/location information")
-        
-        # Rule 5: Same sender and receiver
-        if transaction.sender_upi == transaction.receiver_upi:
-            fraud_score += 0.5
-            reasons.append("Self-transfer detected")
-        
-        is_fraud = fraud_score > 0.5
-        
-        return {
-            'is_fraud': is_fraud,
-            'fraud_probability': min(fraud_score, 1.0),
-            'detection_method': 'rule_based',
-            'reasons': reasons,
+        Args:
+            probability: CNN fraud probability
+            rule_result: Rule tier result when the cascade forwarded the transaction
+        """
+        result = {
+            'is_fraud': probability > 0.5,
+            'fraud_probability': probability,
+            'detection_method': 'cnn_model',
+            'confidence': abs(probability - 0.5) * 2,  # 0 to 1 confidence
             'timestamp': datetime.now().isoformat()
         }
+        if rule_result is not None:
+            result['cascade'] = FORWARDED
+            result['rule_probability'] = rule_result['fraud_probability']
+        return result
     
     def predict(self, transaction):
         """
         Predict if a transaction is fraudulent
         
+        With FRAUD_CASCADE_ENABLED the rule engine scores the transaction first
+        and only the ambiguous band reaches the CNN (see cascade.py).
+        
         Args:
             transaction: Transaction model instance
             
         Returns:
             dict with fraud detection results
         """
+        graph = None
         try:
-            if self.model is not None and self.model.model is not None:
+            graph = self.graph_features([transaction])
+            graph = None if graph is None else graph[0]
+            
+            if self.model_loaded:
+                rule_result = None
+                if settings.FRAUD_CASCADE_ENABLED:
+                    start = time.perf_counter()
+                    rule_result = self.rule_based_detection(transaction, graph)
+                    rules_tier_histogram.observe(time.perf_counter() - start)
+                    if screen([rule_result])[0] != FORWARDED:
+                        prediction_counters['rule_based'].inc()
+                        return rule_result
+                
+                start = time.perf_counter()
+                
                 # Extract features
-                features = self.extract_features(transaction)
+                with feature_histogram.time():
+                    behaviour = self.behaviour_features([transaction])
+                    features = self.extract_features(transaction, None if behaviour is None else behaviour[0], graph)
                 
-                # Make prediction
-                probability = float(self.model.predict(features)[0][0])
-                is_fraud = probability > 0.5
+                # Make prediction (cached and micro-batched when enabled)
+                probability = float(self.score(features)[0])
                 
-                return {
-                    'is_fraud': is_fraud,
-                    'fraud_probability': probability,
-                    'detection_method': 'cnn_model',
-                    'confidence': abs(probability - 0.5) * 2,  # 0 to 1 confidence
-                    'timestamp': datetime.now().isoformat()
-                }
+                cnn_tier_histogram.observe(time.perf_counter() - start)
+                prediction_counters['cnn_model'].inc()
+                return self.cnn_result(probability, rule_result)
             else:
                 # Fallback to rule-based detection
-                return self.rule_based_detection(transaction)
+                self._count_fallback('model_unavailable')
+                return self.rule_based_detection(transaction, graph)
                 
-        except Exception as e:
-            print(f"Error in fraud detection: {str(e)}")
+        except Exception:
+            logger.exception("Error in fraud detection")
             # Fallback to rule-based detection
-            return self.rule_based_detection(transaction)
+            self._count_fallback('error')
+            return self.rule_based_detection(transaction, graph)
+    
+    def _count_fallback(self, reason, transactions=1):
+        fallback_counters[reason].inc(transactions)
+        prediction_counters['rule_based'].inc(transactions)
+    
+    def predict_batch(self, transactions, replay=None):
+        """
+        Predict fraud for many transactions with a single model call
+        
+        Args:
+            transactions: Sequence of Transaction model instances
+            replay: FeatureReplay supplying point-in-time behavioural and graph
+                features for stored history; by default they come from the
+                feature store and the process graph, as for new transactions
+            
+        Returns:
+            list of dicts with fraud detection results, in input order
+        """
+        if not transactions:
+            return []
+        
+        graph = behaviour = None
+        try:
+            if replay is not None:
+                behaviour, graph = replay.features(transactions)
+            else:
+                graph = self.graph_features(transactions)
+            
+            if self.model_loaded:
+                results = [None] * len(transactions)
+                forward = np.arange(len(transactions))
+                if settings.FRAUD_CASCADE_ENABLED:
+                    start = time.perf_counter()
+                    results = get_rule_engine().evaluate_batch(transactions, graph)
+                    rules_tier_histogram.observe(time.perf_counter() - start)
+                    decisions = screen(results)
+                    forward = np.array([i for i, decision in enumerate(decisions) if decision == FORWARDED], dtype=int)
+                
+                if len(forward):
+                    start = time.perf_counter()
+                    with feature_histogram.time():
+                        if replay is None:
+                            # Behavioural features see the whole batch, even rows the rules decided
+                            behaviour = self.behaviour_features(transactions)
+                        features = build_feature_matrix(
+                            [transactions[i] for i in forward],
+                            None if behaviour is None else behaviour[forward],
+                            None if graph is None else graph[forward] / GRAPH_FEATURE_SCALE,
+                        )
+                    probabilities = self.score(features)
+                    cnn_tier_histogram.observe(time.perf_counter() - start)
+                    for i, probability in zip(forward, probabilities):
+                        results[i] = self.cnn_result(float(probability), results[i])
+                prediction_counters['cnn_model'].inc(len(forward))
+                prediction_counters['rule_based'].inc(len(transactions) - len(forward))
+                return results
+            self._count_fallback('model_unavailable', len(transactions))
+        except Exception:
+            logger.exception("Error in batch fraud detection")
+            self._count_fallback('error', len(transactions))
+        
+        return get_rule_engine().evaluate_batch(transactions, graph)
@@ -0,0 +1,266 @@
+"""
+Counterparty Graph - in-memory sender→receiver index over recent transactions
+
+UPI IDs are interned to integer node IDs. Edges are appended to a
+time-ordered log of int32/float64 arrays and folded into per-node adjacency
+maps (neighbour ID -> first/last seen), which answer new-counterparty,
+degree and shared-counterparty questions without touching the database.
+Edges older than GRAPH_WINDOW_HOURS (relative to the newest transaction
+seen) are expired from the head of the log, and accounts left without any
+edge give their node ID back for reuse, so memory follows the window.
+
+Each process keeps its own graph: it is seeded from the last window of
+transactions on first use and then pulls newer rows by primary key at most
+every GRAPH_SYNC_INTERVAL seconds. Adding the same transaction twice is a
+no-op for every query, so scored transactions are added straight away and
+picked up again by the next sync.
+
+Only live scoring of new transactions writes to the process graph. Work on
+stored history replays it into a private graph instead (see replay.py), so
+it neither sees later transactions nor disturbs live scoring.
+"""
+import threading
+import time
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+
+GRAPH_FEATURES = ('new_counterparty', 'sender_out_degree', 'receiver_in_degree', 'shared_counterparties')
+
+GRAPH_FEATURE_COUNT = len(GRAPH_FEATURES)
+
+# Divisors that bring the raw counts to the scale of the other CNN inputs
+GRAPH_FEATURE_SCALE = np.array([1.0, 100.0, 100.0, 100.0])
+
+
+class CounterpartyGraph:
+    """
+    Directed multigraph of recent payments with sliding-window expiry.
+
+    All queries run under one lock and cost O(1), except shared_counterparties
+    which is O(smaller neighbourhood).
+    """
+
+    def __init__(self, window_hours=None, initial_capacity=1024):
+        """
+        Initialize the graph
+
+        Args:
+            window_hours: Hours of activity kept in the graph
+            initial_capacity: Starting size of the edge log arrays
+        """
+        self.window = (window_hours if window_hours is not None else settings.GRAPH_WINDOW_HOURS) * 3600.0
+        self._lock = threading.RLock()
+        self._ids = {}
+        self._names = []
+        self._free = []
+        self._out = []
+        self._in = []
+        self._src = np.empty(initial_capacity, dtype=np.int32)
+        self._dst = np.empty(initial_capacity, dtype=np.int32)
+        self._ts = np.empty(initial_capacity, dtype=np.float64)
+        self._head = 0
+        self._tail = 0
+        self.latest = 0.0
+        self.high_water = 0
+        self.seeded = False
+        self._synced_at = 0.0
+        self._syncing = False
+
+    def __len__(self):
+        return self._tail - self._head
+
+    def node_id(self, upi):
+        node = self._ids.get(upi)
+        if node is None:
+            if self._free:
+                node = self._free.pop()
+                self._names[node] = upi
+            else:
+                node = len(self._out)
+                self._names.append(upi)
+                self._out.append({})
+                self._in.append({})
+            self._ids[upi] = node
+        return node
+
+    def _release(self, node):
+        # Expired log entries may still name a released ID; they find no edge
+        if not self._out[node] and not self._in[node] and self._names[node] is not None:
+            del self._ids[self._names[node]]
+            self._names[node] = None
+            self._free.append(node)
+
+    def _append(self, src, dst, timestamp):
+        if self._tail == len(self._ts):
+            live = slice(self._head, self._tail)
+            # Compact the expired prefix away, growing only when the log is mostly live
+            capacity = len(self._ts) * (2 if self._head < len(self._ts) // 2 else 1)
+            for name in ('_src', '_dst', '_ts'):
+                old = getattr(self, name)
+                new = np.empty(capacity, dtype=old.dtype)
+                new[:self._tail - self._head] = old[live]
+                setattr(self, name, new)
+            self._tail -= self._head
+            self._head = 0
+        self._src[self._tail] = src
+        self._dst[self._tail] = dst
+        self._ts[self._tail] = timestamp
+        self._tail += 1
+
+    def add(self, sender, receiver, timestamp):
+        """
+        Record a payment from sender to receiver at a Unix timestamp
+        """
+        with self._lock:
+            if timestamp < self.latest - self.window:
+                return
+            src, dst = self.node_id(sender), self.node_id(receiver)
+            seen = self._out[src].get(dst)
+            if seen is None:
+                self._out[src][dst] = self._in[dst][src] = seen = [timestamp, timestamp]
+            elif seen[0] <= timestamp <= seen[1]:
+                # Already covered; re-adding a transaction changes nothing
+                return
+            else:
+                seen[0] = min(seen[0], timestamp)
+                seen[1] = max(seen[1], timestamp)
+            self._append(src, dst, timestamp)
+            if timestamp > self.latest:
+                self.latest = timestamp
+                self._expire()
+
+    def _expire(self):
+        cutoff = self.latest - self.window
+        head, tail = self._head, self._tail
+        while head < tail and self._ts[head] < cutoff:
+            src, dst = int(self._src[head]), int(self._dst[head])
+            seen = self._out[src].get(dst)
+            if seen is not None and seen[1] < cutoff:
+                del self._out[src][dst]
+                del self._in[dst][src]
+                self._release(src)
+                self._release(dst)
+            head += 1
+        self._head = head
+
+    def features(self, sender, receiver, timestamp):
+        """
+        Raw graph features, in GRAPH_FEATURES order, for a recorded payment
+
+        Returns:
+            [new counterparty (1.0/0.0), sender out-degree, receiver in-degree,
+             accounts that transacted with both sender and receiver]
+        """
+        with self._lock:
+            src, dst = self._ids.get(sender), self._ids.get(receiver)
+            if src is None or dst is None:
+                return [1.0, 0.0, 0.0, 0.0]
+            seen = self._out[src].get(dst)
+            new_counterparty = 1.0 if seen is None or seen[0] >= timestamp else 0.0
+            return [
+                new_counterparty,
+                float(len(self._out[src])),
+                float(len(self._in[dst])),
+                float(self.shared_counterparties(src, dst)),
+            ]
+
+    def shared_counterparties(self, src, dst):
+        """
+        Number of nodes other than src and dst adjacent to both (2-hop paths src-x-dst)
+        """
+        src_maps = (self._out[src], self._in[src])
+        dst_maps = (self._out[dst], self._in[dst])
+        if sum(map(len, src_maps)) > sum(map(len, dst_maps)):
+            src_maps, dst_maps = dst_maps, src_maps
+        neighbours = src_maps[0].keys() | src_maps[1].keys()
+        neighbours.discard(src)
+        neighbours.discard(dst)
+        return sum(1 for node in neighbours if node in dst_maps[0] or node in dst_maps[1])
+
+    def sync(self, force=False, chunk_size=5000):
+        """
+        Pull transactions saved since the last sync (or seed the last window)
+
+        Rows are fetched without holding the lock, one keyset chunk at a time,
+        and only applied under it, so scoring is not blocked on the database.
+        While one thread syncs, others skip the sync and read the graph as it is.
+        """
+        from transactions.models import Transaction
+
+        now = time.monotonic()
+        with self._lock:
+            if self._syncing or (not force and self.seeded and now - self._synced_at < settings.GRAPH_SYNC_INTERVAL):
+                return
+            self._syncing = True
+            self._synced_at = now
+            high_water, seeded = self.high_water, self.seeded
+
+        try:
+            rows = Transaction.objects.order_by('pk').values_list('pk', 'sender_upi', 'receiver_upi', 'created_at')
+            upper = None
+            if not seeded:
+                # Later syncs start after everything that existed at seed time,
+                # even when the window itself held no rows
+                upper = Transaction.objects.aggregate(upper=Max('pk'))['upper'] or 0
+                rows = rows.filter(pk__lte=upper, created_at__gte=timezone.now() - timedelta(seconds=self.window))
+            while True:
+                chunk = list(rows.filter(pk__gt=high_water)[:chunk_size])
+                if chunk:
+                    with self._lock:
+                        for _, sender, receiver, created_at in chunk:
+                            self.add(sender, receiver, created_at.timestamp())
+                        high_water = self.high_water = max(self.high_water, chunk[-1][0])
+                if len(chunk) < chunk_size:
+                    break
+            with self._lock:
+                if upper is not None:
+                    self.high_water = max(self.high_water, upper)
+                self.seeded = True
+        finally:
+            with self._lock:
+                self._syncing = False
+
+    def batch_features(self, transactions):
+        """
+        Add transactions to the graph and return their raw features
+
+        Rows are added and read in time order, so each row sees the earlier
+        rows of the batch and itself. This records the rows in the graph, so
+        it is for live scoring only; see replay.py for stored history.
+
+        Args:
+            transactions: Sequence of Transaction model instances
+
+        Returns:
+            float64 array of shape (N, GRAPH_FEATURE_COUNT)
+        """
+        self.sync()
+        rows = np.zeros((len(transactions), GRAPH_FEATURE_COUNT), dtype=np.float64)
+        with self._lock:
+            order = sorted(range(len(transactions)), key=lambda i: transactions[i].created_at)
+            for index in order:
+                transaction = transactions[index]
+                self.add(transaction.sender_upi, transaction.receiver_upi, transaction.created_at.timestamp())
+                rows[index] = self.features(
+                    transaction.sender_upi, transaction.receiver_upi, transaction.created_at.timestamp()
+                )
+        return rows
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_graph():
+    """
+    The process-wide CounterpartyGraph, created on first use
+    """
+    global _graph
+    with _graph_lock:
+        if _graph is None:
+            _graph = CounterpartyGraph()
+        return _graph
@@ -0,0 +1,145 @@
+import itertools
+import json
+import time
+from decimal import Decimal, InvalidOperation
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from ml_model.cascade import evaluate
+from ml_model.features import build_feature_matrix
+from ml_model.fraud_detector import FraudDetector
+from ml_model.graph import GRAPH_FEATURE_SCALE
+from ml_model.replay import FeatureReplay
+from ml_model.rules import get_rule_engine
+from transactions.bulk import FORMATS, detect_format, iter_rows
+from transactions.models import Transaction
+
+
+TRUE_LABELS = ('1', 'true', 'yes', 'y', 't', 'fraud')
+
+
+def _label(value):
+    return str(value).strip().lower() in TRUE_LABELS
+
+
+def _transaction(row):
+    created_at = parse_datetime(str(row['created_at'])) if row.get('created_at') else None
+    if created_at is not None and timezone.is_naive(created_at):
+        created_at = timezone.make_aware(created_at)
+    return Transaction(
+        sender_upi=row['sender_upi'],
+        receiver_upi=row['receiver_upi'],
+        amount=Decimal(str(row['amount'])),
+        transaction_type=row.get('transaction_type') or 'SEND',
+        device_id=row.get('device_id'),
+        location=row.get('location'),
+        created_at=created_at or timezone.now(),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare cascade scoring (rules first, CNN for the ambiguous band) with the CNN alone '
+        'on a labelled dataset'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?',
+                            help='Labelled JSON, JSON lines or CSV file (defaults to saved transactions, '
+                                 'labelled by their is_fraud flag)')
+        parser.add_argument('--format', choices=FORMATS, help='Input format (defaults to the file extension)')
+        parser.add_argument('--label-field', default='is_fraud', help='Column holding the fraud label')
+        parser.add_argument('--limit', type=int, default=100000, help='Most recent saved transactions to use')
+        parser.add_argument('--batch-size', type=int, default=4096, help='Rows scored per model call')
+        parser.add_argument('--clear-below', type=float, nargs='+', default=[settings.FRAUD_CASCADE_CLEAR_BELOW],
+                            help='Clear thresholds to try')
+        parser.add_argument('--flag-at', type=float, nargs='+', default=[settings.FRAUD_CASCADE_FLAG_AT],
+                            help='Flag thresholds to try')
+        parser.add_argument('--json', help='Also write the results to this file')
+
+    def load_rows(self, options):
+        if not options['path']:
+            # The latest --limit transactions, oldest first for the feature replay
+            latest = Transaction.objects.order_by('-id').values_list('pk', flat=True)
+            first = latest[options['limit'] - 1:options['limit']].first()
+            rows = Transaction.objects.filter(pk__gte=first or 0).order_by('pk')
+            return ((t, t.is_fraud) for t in rows.iterator(chunk_size=options['batch_size']))
+
+        fmt = options['format'] or detect_format(filename=options['path'])
+        if fmt is None:
+            raise CommandError('Could not detect the file format; pass --format')
+        label_field = options['label_field']
+
+        def rows():
+            with open(options['path'], encoding='utf-8', newline='') as f:
+                for number, row in iter_rows(f, fmt):
+                    try:
+                        yield _transaction(row), _label(row[label_field])
+                    except (KeyError, TypeError, InvalidOperation) as e:
+                        raise CommandError(f"Row {number}: missing or invalid field ({e})")
+        return rows()
+
+    def handle(self, *args, **options):
+        detector = FraudDetector()
+        if not detector.model_loaded:
+            raise CommandError('No trained model is loaded; the cascade needs the CNN tier')
+        engine = get_rule_engine()
+
+        labels, rule_probabilities, cnn_probabilities = [], [], []
+        rules_seconds = cnn_seconds = 0.0
+        rows = self.load_rows(options)
+        # Point-in-time features over the evaluated rows, leaving the live graph and feature store alone
+        replay = FeatureReplay()
+        while True:
+            batch = list(itertools.islice(rows, options['batch_size']))
+            if not batch:
+                break
+            transactions = [transaction for transaction, _ in batch]
+            labels.extend(label for _, label in batch)
+            behaviour, graph = replay.features(transactions)
+
+            start = time.perf_counter()
+            rule_probabilities.extend(r['fraud_probability'] for r in engine.evaluate_batch(transactions, graph))
+            rules_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            features = build_feature_matrix(
+                transactions, behaviour, None if graph is None else graph / GRAPH_FEATURE_SCALE
+            )
+            cnn_probabilities.extend(detector.model.predict(features)[:, 0].tolist())
+            cnn_seconds += time.perf_counter() - start
+
+        if not labels:
+            raise CommandError('No rows to evaluate')
+        detector.close()
+
+        rows_count = len(labels)
+        rules_us = rules_seconds / rows_count * 1e6
+        cnn_us = cnn_seconds / rows_count * 1e6
+        results = []
+        for clear_below, flag_at in itertools.product(options['clear_below'], options['flag_at']):
+            result = evaluate(labels, rule_probabilities, cnn_probabilities, clear_below, flag_at)
+            result['estimated_us_per_row'] = rules_us + result['forwarded_share'] * cnn_us
+            results.append(result)
+
+        self.stdout.write(
+            f"{rows_count} rows, {int(np.sum(labels))} labelled fraud | "
+            f"rules {rules_us:.1f} us/row, CNN {cnn_us:.1f} us/row"
+        )
+        show = lambda value: '   n/a' if value is None else f"{value:6.3f}"
+        for result in results:
+            self.stdout.write(
+                f"clear<{result['clear_below']:.2f} flag>={result['flag_at']:.2f}: "
+                f"forwarded {result['forwarded_share'] * 100:5.1f}% | "
+                f"recall {show(result['cascade']['recall'])} (CNN alone {show(result['cnn_only']['recall'])}) | "
+                f"precision {show(result['cascade']['precision'])} (CNN alone {show(result['cnn_only']['precision'])}) | "
+                f"~{result['estimated_us_per_row']:.1f} us/row"
+            )
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump({'rows': rows_count, 'rules_us_per_row': rules_us, 'cnn_us_per_row': cnn_us,
+                           'results': results}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['json']}"))
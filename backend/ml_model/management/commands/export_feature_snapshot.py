@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from ml_model.snapshot import SnapshotError, export_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Export (or append to) a memory-mapped feature snapshot of the transactions table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Snapshot directory; new transactions are appended if it exists')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows fetched per database round trip')
+        parser.add_argument('--segment-rows', type=int, default=1000000, help='Maximum rows per segment file')
+
+    def handle(self, *args, **options):
+        try:
+            appended = export_snapshot(
+                options['path'], chunk_size=options['chunk_size'], segment_rows=options['segment_rows']
+            )
+        except SnapshotError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Appended {appended} rows to {options['path']}"))
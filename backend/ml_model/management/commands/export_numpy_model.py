@@ -0,0 +1,25 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Export the trained Keras model and scaler for the TensorFlow-free NumPy runtime'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default=str(settings.ML_MODEL_PATH), help='Keras .h5 model path')
+        parser.add_argument('--scaler', default=str(settings.SCALER_PATH), help='Scaler .pkl path')
+        parser.add_argument('--output', default=str(settings.ML_NUMPY_MODEL_PATH), help='Destination .npz path')
+
+    def handle(self, *args, **options):
+        for path in (options['model'], options['scaler']):
+            if not os.path.exists(path):
+                raise CommandError(f"{path} does not exist; train the model first")
+
+        from ml_model.cnn_model import FraudDetectionCNN
+        from ml_model.export import export_numpy_model
+
+        cnn = FraudDetectionCNN()
+        cnn.load_model(options['model'], options['scaler'])
+        export_numpy_model(cnn, options['output'])
+        self.stdout.write(self.style.SUCCESS(f"Exported NumPy model to {options['output']}"))
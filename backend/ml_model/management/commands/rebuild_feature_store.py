@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from ml_model.feature_store import rebuild_feature_store
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-sender behavioural feature store from the transactions table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        count = rebuild_feature_store(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} sender profiles"))
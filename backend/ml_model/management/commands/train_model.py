@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from transactions.models import Transaction
+
+
+class Command(BaseCommand):
+    help = 'Train the CNN from a stream of transactions or feature shards with bounded memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', choices=('db', 'snapshot', 'npy', 'parquet', 'synthetic'), default='db',
+            help='db: labelled transactions table; snapshot: a feature snapshot directory (see '
+                 'export_feature_snapshot); npy/parquet: shards matching --shards; synthetic: generated data'
+        )
+        parser.add_argument('--snapshot', help='Feature snapshot directory for --source snapshot')
+        parser.add_argument('--shards', help="Glob of shard files, e.g. 'data/features-*.npy'")
+        parser.add_argument('--samples', type=int, default=10000, help='Rows generated for --source synthetic')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows read and featurised at a time')
+        parser.add_argument('--batch-size', type=int, default=256)
+        parser.add_argument('--epochs', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=1, help='Processes building feature matrices')
+        parser.add_argument('--prefetch', type=int, default=None, help='Batches prepared ahead (default: autotune)')
+        parser.add_argument(
+            '--shuffle-buffer', type=int, default=50000,
+            help='Training rows shuffled together each epoch (0 keeps stream order)'
+        )
+        parser.add_argument('--seed', type=int, default=None, help='Seed of the shuffle')
+        parser.add_argument('--validation-every', type=int, default=10, help='Hold out every n-th row for validation')
+        parser.add_argument('--model', default=str(settings.ML_MODEL_PATH), help='Destination .h5 model path')
+        parser.add_argument('--scaler', default=str(settings.SCALER_PATH), help='Destination .pkl scaler path')
+
+    def handle(self, *args, **options):
+        from ml_model import training
+        from ml_model.snapshot import FeatureSnapshot, SnapshotError
+
+        source = options['source']
+        chunk_size = options['chunk_size']
+        if source in ('npy', 'parquet') and not options['shards']:
+            raise CommandError(f"--source {source} needs --shards")
+        if source == 'snapshot' and not options['snapshot']:
+            raise CommandError('--source snapshot needs --snapshot')
+
+        try:
+            if source == 'db':
+                chunks = training.queryset_chunks(
+                    Transaction.objects.all(), chunk_size, options['workers'], options['prefetch'] or 2
+                )
+            elif source == 'snapshot':
+                snapshot = FeatureSnapshot(options['snapshot'])
+                served = {'behaviour': settings.BEHAVIOUR_FEATURES_ENABLED, 'graph': settings.GRAPH_FEATURES_ENABLED}
+                if snapshot.feature_groups != served:
+                    # The model would be served inputs it was never trained on
+                    raise CommandError(
+                        f"Snapshot features {snapshot.feature_groups} do not match the served features {served}"
+                    )
+                chunks = snapshot.chunks(chunk_size)
+            elif source == 'npy':
+                chunks = training.npy_shard_chunks(options['shards'], chunk_size)
+            elif source == 'parquet':
+                chunks = training.parquet_shard_chunks(
+                    options['shards'], chunk_size, options['workers'], options['prefetch'] or 2
+                )
+            else:
+                chunks = training.synthetic_chunks(options['samples'], chunk_size)
+        except (FileNotFoundError, SnapshotError) as e:
+            raise CommandError(str(e))
+
+        from ml_model.cnn_model import FraudDetectionCNN
+
+        cnn = FraudDetectionCNN()
+        try:
+            cnn.train_streaming(
+                chunks,
+                epochs=options['epochs'],
+                batch_size=options['batch_size'],
+                validation_every=options['validation_every'],
+                prefetch=options['prefetch'],
+                shuffle_buffer=options['shuffle_buffer'],
+                seed=options['seed'],
+            )
+        except (ImportError, ValueError) as e:
+            raise CommandError(str(e))
+        cnn.save_model(options['model'], options['scaler'])
+        self.stdout.write(self.style.SUCCESS(
+            "Training complete. Run 'python manage.py export_numpy_model' to refresh the NumPy runtime model"
+        ))
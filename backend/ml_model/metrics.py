@@ -0,0 +1,198 @@
+"""
+Metrics - lightweight in-process histograms and counters for tuning inference
+
+Everything registered here is exposed at /metrics in the Prometheus text
+format (see render_prometheus). Metrics are per process; with several
+workers, scrape each one or aggregate in the collector.
+"""
+import bisect
+import threading
+import time
+
+
+# Default buckets for timing spans, in seconds
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+
+class _Span:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with cumulative counts, safe to share between threads
+    """
+
+    def __init__(self, name, buckets, description=''):
+        """
+        Initialize the histogram
+
+        Args:
+            name: Metric name
+            buckets: Sorted upper bounds of the buckets (an implicit +Inf bucket is added)
+            description: Human readable description
+        """
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._sum = 0.0
+            self._count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def time(self):
+        """
+        Context manager that observes the seconds spent in its block
+        """
+        return _Span(self)
+
+    def snapshot(self):
+        """
+        Returns:
+            dict with cumulative bucket counts, sum and count
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+            count = self._count
+
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            running += bucket_count
+            cumulative.append(('+Inf' if bound == float('inf') else bound, running))
+        return {
+            'buckets': cumulative,
+            'sum': total,
+            'count': count,
+        }
+
+
+class Counter:
+    """
+    Monotonic counter, safe to share between threads
+    """
+
+    def __init__(self, name, description='', labels=None):
+        self.name = name
+        self.description = description
+        self.labels = dict(labels or {})
+        self._lock = threading.Lock()
+        self.reset()
+
+    @property
+    def series(self):
+        """
+        Name with labels, e.g. ml_predictions_total{method="cnn_model"}
+        """
+        if not self.labels:
+            return self.name
+        return self.name + '{' + ','.join(f'{key}="{value}"' for key, value in sorted(self.labels.items())) + '}'
+
+    def reset(self):
+        with self._lock:
+            self._value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+
+_histograms = {}
+_registry_lock = threading.Lock()
+_counters = {}
+
+
+def histogram(name, buckets, description=''):
+    """
+    Get or create a process-wide histogram by name
+    """
+    with _registry_lock:
+        if name not in _histograms:
+            _histograms[name] = Histogram(name, buckets, description)
+        return _histograms[name]
+
+
+def snapshot_histograms(prefix=''):
+    with _registry_lock:
+        items = [(name, h) for name, h in _histograms.items() if name.startswith(prefix)]
+    return {name: h.snapshot() for name, h in items}
+
+
+def counter(name, description='', labels=None):
+    """
+    Get or create a process-wide counter by name and labels
+    """
+    key = (name, tuple(sorted((labels or {}).items())))
+    with _registry_lock:
+        if key not in _counters:
+            _counters[key] = Counter(name, description, labels)
+        return _counters[key]
+
+
+def snapshot_counters(prefix=''):
+    with _registry_lock:
+        items = [c for (name, _), c in _counters.items() if name.startswith(prefix)]
+    return {c.series: c.value for c in items}
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    """
+    All registered metrics in the Prometheus text exposition format (version 0.0.4)
+    """
+    with _registry_lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items(), key=lambda item: (item[0][0], item[0][1]))
+
+    lines = []
+    for name, h in histograms:
+        snapshot = h.snapshot()
+        lines.append(f'# HELP {name} {h.description}')
+        lines.append(f'# TYPE {name} histogram')
+        for bound, count in snapshot['buckets']:
+            le = bound if bound == '+Inf' else _format_value(float(bound))
+            lines.append(f'{name}_bucket{{le="{le}"}} {count}')
+        lines.append(f'{name}_sum {_format_value(snapshot["sum"])}')
+        lines.append(f'{name}_count {snapshot["count"]}')
+
+    described = set()
+    for (name, _), c in counters:
+        if name not in described:
+            described.add(name)
+            lines.append(f'# HELP {name} {c.description}')
+            lines.append(f'# TYPE {name} counter')
+        lines.append(f'{c.series} {c.value}')
+    return '\n'.join(lines) + '\n'
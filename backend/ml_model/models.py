@@ -1,3 +1,17 @@
 from django.db import models
 
-# Create your models here.
+
+class SenderBehaviour(models.Model):
+    """
+    Persisted sliding-window state of one sender for the behavioural feature store
+    """
+    sender_upi = models.CharField(max_length=100, unique=True)
+    state = models.JSONField(default=dict)
+    last_seen = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Sender behaviour'
+
+    def __str__(self):
+        return f"{self.sender_upi} (last seen {self.last_seen})"
@@ -0,0 +1,135 @@
+"""
+NumPy Runtime - runs an exported FraudDetectionCNN without TensorFlow
+
+The artifact is a single .npz file written by ml_model.export. It holds the
+StandardScaler statistics and the network as a list of simple ops (conv2d,
+affine, maxpool, flatten, dense) with BatchNormalization already folded into
+per-channel affine ops or into the following Dense layer.
+"""
+import json
+import logging
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from .metrics import LATENCY_BUCKETS, histogram
+
+
+logger = logging.getLogger(__name__)
+
+scaler_histogram = histogram(
+    'ml_scaler_transform_seconds', LATENCY_BUCKETS, 'Time to standardise a feature batch before the forward pass')
+forward_histogram = histogram(
+    'ml_model_forward_seconds', LATENCY_BUCKETS, 'Time of one model forward pass')
+
+
+FORMAT_VERSION = 1
+
+
+def _activate(x, activation):
+    if activation == 'relu':
+        return np.maximum(x, 0.0, out=x)
+    if activation == 'sigmoid':
+        return 1.0 / (1.0 + np.exp(-x))
+    if activation in ('linear', None):
+        return x
+    raise ValueError(f"Unsupported activation: {activation}")
+
+
+def _conv2d(x, kernel, bias, padding):
+    kh, kw = kernel.shape[:2]
+    if padding == 'same':
+        top, left = (kh - 1) // 2, (kw - 1) // 2
+        x = np.pad(x, ((0, 0), (top, kh - 1 - top), (left, kw - 1 - left), (0, 0)))
+    # windows: (N, H, W, C, kh, kw); kernel: (kh, kw, C, out)
+    windows = sliding_window_view(x, (kh, kw), axis=(1, 2))
+    return np.tensordot(windows, kernel, axes=([3, 4, 5], [2, 0, 1])) + bias
+
+
+def _maxpool(x, pool_size):
+    ph, pw = pool_size
+    n, h, w, c = x.shape
+    h, w = h // ph, w // pw
+    x = x[:, :h * ph, :w * pw, :].reshape(n, h, ph, w, pw, c)
+    return x.max(axis=(2, 4))
+
+
+class NumpyFraudModel:
+    """
+    Forward-pass engine for an exported FraudDetectionCNN.
+
+    Exposes the same predict(X) contract as FraudDetectionCNN.
+    """
+
+    def __init__(self, scaler_mean, scaler_scale, layers, input_shape=(8, 8, 1)):
+        """
+        Initialize the engine
+
+        Args:
+            scaler_mean: StandardScaler mean_ for the flattened features
+            scaler_scale: StandardScaler scale_ for the flattened features
+            layers: List of op dicts as produced by ml_model.export
+            input_shape: Shape of a single input (height, width, channels)
+        """
+        self.scaler_mean = np.asarray(scaler_mean, dtype=np.float32)
+        self.scaler_scale = np.asarray(scaler_scale, dtype=np.float32)
+        self.layers = layers
+        self.input_shape = tuple(input_shape)
+
+    @property
+    def is_loaded(self):
+        return True
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an artifact written by ml_model.export.save_artifact
+        """
+        with np.load(path, allow_pickle=False) as data:
+            spec = json.loads(str(data['spec']))
+            if spec.get('format_version') != FORMAT_VERSION:
+                raise ValueError(f"Unsupported model artifact version: {spec.get('format_version')}")
+
+            layers = []
+            for index, layer in enumerate(spec['layers']):
+                layer = dict(layer)
+                for name in layer.pop('arrays', []):
+                    layer[name] = data[f'layer{index}_{name}'].astype(np.float32)
+                layers.append(layer)
+
+            model = cls(
+                data['scaler_mean'], data['scaler_scale'], layers,
+                input_shape=spec['input_shape']
+            )
+        logger.info("NumPy model loaded from %s", path)
+        return model
+
+    def predict(self, X):
+        """
+        Make predictions on new data
+
+        Args:
+            X: Input features of shape (N, 8, 8, 1)
+
+        Returns:
+            Fraud probabilities of shape (N, 1)
+        """
+        n = X.shape[0]
+        with scaler_histogram.time():
+            x = (X.reshape(n, -1).astype(np.float32) - self.scaler_mean) / self.scaler_scale
+            x = x.reshape((n,) + self.input_shape)
+
+        with forward_histogram.time():
+            for layer in self.layers:
+                op = layer['op']
+                if op == 'conv2d':
+                    x = _activate(_conv2d(x, layer['kernel'], layer['bias'], layer['padding']), layer['activation'])
+                elif op == 'affine':
+                    x = x * layer['scale'] + layer['shift']
+                elif op == 'maxpool':
+                    x = _maxpool(x, layer['pool_size'])
+                elif op == 'flatten':
+                    x = x.reshape(n, -1)
+                elif op == 'dense':
+                    x = _activate(x @ layer['kernel'] + layer['bias'], layer['activation'])
+                else:
+                    raise ValueError(f"Unsupported op: {op}")
+        return x
@@ -0,0 +1,169 @@
+"""
+Prediction Cache - reuse CNN probabilities for feature vectors already scored
+
+Keys are a BLAKE2 digest of the model version and the exact float32 bytes of
+the feature tensor handed to the model. The model applies its own scaler, and
+the scaler ships with the model files, so the version plus the input bytes
+identify the scaled vector the network sees.
+
+Entries live in an in-process LRU with a TTL. Setting
+ML_PREDICTION_CACHE_BACKEND to an alias from CACHES stores them in Django's
+cache framework instead, so workers share hits (e.g. a file-based or Redis
+cache); the model version in the key keeps workers on different model files
+apart.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from .metrics import counter
+
+
+KEY_PREFIX = 'ml-prediction:'
+
+cache_hits = counter('ml_prediction_cache_hits_total', 'Predictions served from the cache')
+cache_misses = counter('ml_prediction_cache_misses_total', 'Predictions that had to run the model')
+cache_evictions = counter('ml_prediction_cache_evictions_total', 'In-process entries dropped to stay within the size limit')
+cache_invalidations = counter('ml_prediction_cache_invalidations_total', 'Times the cache was emptied for a model reload')
+
+
+def model_version(paths):
+    """
+    Short digest of model files by path, mtime and size
+
+    Args:
+        paths: Paths of the files that make up the model (weights and scaler)
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            digest.update(f'{path}:{stat.st_mtime_ns}:{stat.st_size};'.encode())
+        except OSError:
+            digest.update(f'{path}:missing;'.encode())
+    return digest.hexdigest()
+
+
+def feature_key(features, version):
+    """
+    Cache key for one (8, 8, 1) feature tensor under a model version
+    """
+    digest = hashlib.blake2b(version.encode(), digest_size=16)
+    digest.update(features.astype('float32', copy=False).tobytes())
+    return KEY_PREFIX + digest.hexdigest()
+
+
+class PredictionCache:
+    """
+    Bounded LRU/TTL map of feature key -> fraud probability.
+
+    Lookups and stores take whole batches so the Django cache backend costs
+    one round trip per predict_batch call.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, backend=None):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: In-process entry limit (defaults to ML_PREDICTION_CACHE_SIZE)
+            ttl: Seconds an entry stays valid (defaults to ML_PREDICTION_CACHE_TTL)
+            backend: CACHES alias to use instead of the in-process map
+        """
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._backend = backend
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @property
+    def max_entries(self):
+        return self._max_entries or settings.ML_PREDICTION_CACHE_SIZE
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else settings.ML_PREDICTION_CACHE_TTL
+
+    @property
+    def backend(self):
+        alias = self._backend if self._backend is not None else settings.ML_PREDICTION_CACHE_BACKEND
+        return caches[alias] if alias else None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, keys):
+        """
+        Cached probabilities for keys
+
+        Returns:
+            dict mapping the keys that were found to their probability
+        """
+        backend = self.backend
+        if backend is not None:
+            found = backend.get_many(keys)
+        else:
+            found = {}
+            now = time.monotonic()
+            with self._lock:
+                for key in keys:
+                    entry = self._entries.get(key)
+                    if entry is None:
+                        continue
+                    if now - entry[1] > self.ttl:
+                        del self._entries[key]
+                        continue
+                    self._entries.move_to_end(key)
+                    found[key] = entry[0]
+        cache_hits.inc(len(found))
+        cache_misses.inc(len(keys) - len(found))
+        return found
+
+    def set_many(self, probabilities):
+        """
+        Store probabilities keyed by feature key
+        """
+        if not probabilities:
+            return
+        backend = self.backend
+        if backend is not None:
+            backend.set_many(probabilities, timeout=self.ttl)
+            return
+
+        now = time.monotonic()
+        evicted = 0
+        with self._lock:
+            for key, probability in probabilities.items():
+                self._entries[key] = (probability, now)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            cache_evictions.inc(evicted)
+
+    def invalidate(self):
+        """
+        Drop every in-process entry; shared backends are isolated by the model version in the key
+        """
+        with self._lock:
+            self._entries.clear()
+        cache_invalidations.inc()
+
+    def status(self):
+        return {
+            'backend': self._backend if self._backend is not None else settings.ML_PREDICTION_CACHE_BACKEND or 'local',
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hits': cache_hits.value,
+            'misses': cache_misses.value,
+            'evictions': cache_evictions.value,
+            'invalidations': cache_invalidations.value,
+        }
+
+
+prediction_cache = PredictionCache()
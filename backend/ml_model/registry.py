@@ -0,0 +1,154 @@
+"""
+Detector Registry - process-wide FraudDetector shared by all requests
+"""
+import os
+import threading
+import time
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+from .metrics import snapshot_counters, snapshot_histograms
+from .prediction_cache import prediction_cache
+from .rules import get_rule_engine
+
+
+class DetectorRegistry:
+    """
+    Holds one FraudDetector per process.
+
+    The detector is loaded on first use (or at worker boot via warm_up) and is
+    only rebuilt when the model or scaler file on disk changes.
+    """
+
+    def __init__(self, check_interval=None):
+        """
+        Initialize the registry
+
+        Args:
+            check_interval: Seconds between checks of the model files for changes
+        """
+        if check_interval is None:
+            check_interval = settings.ML_MODEL_RELOAD_INTERVAL
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._detector = None
+        self._fingerprint = None
+        self._loaded_at = None
+        self._last_check = 0.0
+        self.load_count = 0
+
+    def model_files(self):
+        if settings.ML_INFERENCE_BACKEND == 'numpy':
+            return [settings.ML_NUMPY_MODEL_PATH]
+        return [settings.ML_MODEL_PATH, settings.SCALER_PATH]
+
+    def fingerprint(self):
+        """
+        Identify the current version of the model files by path, mtime and size
+        """
+        fingerprint = []
+        for path in self.model_files():
+            try:
+                stat = os.stat(path)
+                fingerprint.append((str(path), stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                fingerprint.append((str(path), None, None))
+        return tuple(fingerprint)
+
+    def get(self):
+        """
+        Return the shared detector, reloading it if the model files changed
+
+        Returns:
+            FraudDetector instance
+        """
+        detector = self._detector
+        if detector is not None and time.monotonic() - self._last_check < self.check_interval:
+            return detector
+
+        with self._lock:
+            now = time.monotonic()
+            if self._detector is not None and now - self._last_check < self.check_interval:
+                return self._detector
+
+            fingerprint = self.fingerprint()
+            self._last_check = now
+            if self._detector is None or fingerprint != self._fingerprint:
+                self._load(fingerprint)
+            return self._detector
+
+    def reload(self):
+        """
+        Force the detector to be rebuilt from disk
+        """
+        with self._lock:
+            self._last_check = time.monotonic()
+            self._load(self.fingerprint())
+            return self._detector
+
+    def _load(self, fingerprint):
+        from .fraud_detector import FraudDetector
+
+        previous = self._detector
+        self._detector = FraudDetector()
+        if previous is not None:
+            previous.close()
+            # Probabilities from the old model must not be served for the new one
+            prediction_cache.invalidate()
+        self._fingerprint = fingerprint
+        self._loaded_at = timezone.now()
+        self.load_count += 1
+
+    def status(self):
+        """
+        Describe the loaded detector without touching the model files
+        """
+        detector = self._detector
+        model_loaded = detector is not None and detector.model_loaded
+        status = {
+            'model_loaded': model_loaded,
+            'detection_method': 'cnn_model' if model_loaded else 'rule_based',
+            'inference_backend': settings.ML_INFERENCE_BACKEND,
+            'warm': detector is not None,
+            'loaded_at': self._loaded_at.isoformat() if self._loaded_at else None,
+            'load_count': self.load_count,
+            'rules': get_rule_engine().status(),
+        }
+        if detector is not None and detector.batcher is not None:
+            status['batching'] = {
+                'max_batch_size': detector.batcher.max_batch_size,
+                'max_wait_ms': detector.batcher.max_wait * 1000.0,
+                'histograms': snapshot_histograms(prefix='ml_batch_'),
+            }
+        if settings.ML_PREDICTION_CACHE_ENABLED:
+            status['prediction_cache'] = prediction_cache.status()
+        if settings.FRAUD_CASCADE_ENABLED:
+            status['cascade'] = {
+                'clear_below': settings.FRAUD_CASCADE_CLEAR_BELOW,
+                'flag_at': settings.FRAUD_CASCADE_FLAG_AT,
+                'decisions': snapshot_counters(prefix='ml_cascade_'),
+                'histograms': snapshot_histograms(prefix='ml_tier_'),
+            }
+        return status
+
+
+def get_registry():
+    return apps.get_app_config('ml_model').registry
+
+
+def get_detector():
+    """
+    Shortcut for the process-wide FraudDetector
+    """
+    return get_registry().get()
+
+
+def warm_up():
+    """
+    Load the detector at worker boot so the first request does not pay for it.
+
+    Called from wsgi.py/asgi.py; with gunicorn --preload this runs once in the
+    master process before workers are forked.
+    """
+    if settings.ML_MODEL_WARM_START:
+        get_registry().get()
@@ -0,0 +1,120 @@
+"""
+Feature Replay - behavioural and graph features as of each transaction's own time
+
+Live scoring reads sender profiles from the feature store and the process
+graph, which hold everything recorded so far. Work on stored history
+(training, snapshot export, rescoring, cascade evaluation) must only see
+what preceded each transaction, or the model learns from, and is judged on,
+the future. FeatureReplay folds transactions into its own BehaviourProfiles
+and CounterpartyGraph and reads each row's features right after folding it
+in, exactly as live scoring does for a new transaction. The feature store
+and the process graph are never read or written.
+
+Rows are folded in time order within a call, and calls must follow each
+other in time (stored transactions are read in primary-key order). Memory
+grows with the number of distinct senders, as in rebuild_feature_store.
+"""
+import numpy as np
+from django.conf import settings
+from .feature_store import BEHAVIOUR_FEATURE_COUNT, BehaviourProfile
+from .features import to_columns
+from .graph import GRAPH_FEATURE_COUNT, GRAPH_FEATURE_SCALE, CounterpartyGraph
+
+
+class FeatureReplay:
+    """
+    Private sender profiles and counterparty graph advanced through history
+    """
+
+    def __init__(self, behaviour=None, graph=None):
+        """
+        Initialize an empty replay
+
+        Args:
+            behaviour: Build behavioural features (default BEHAVIOUR_FEATURES_ENABLED)
+            graph: Build graph features (default GRAPH_FEATURES_ENABLED)
+        """
+        if behaviour is None:
+            behaviour = settings.BEHAVIOUR_FEATURES_ENABLED
+        if graph is None:
+            graph = settings.GRAPH_FEATURES_ENABLED
+        self.profiles = {} if behaviour else None
+        self.graph = CounterpartyGraph() if graph else None
+
+    @property
+    def enabled(self):
+        """
+        True when there are behavioural or graph features to build
+        """
+        return self.profiles is not None or self.graph is not None
+
+    def _fold(self, columns, index):
+        sender, receiver = columns['sender_upi'][index], columns['receiver_upi'][index]
+        timestamp = columns['created_at'][index].timestamp()
+        if self.profiles is not None:
+            profile = self.profiles.get(sender)
+            if profile is None:
+                profile = self.profiles[sender] = BehaviourProfile()
+            profile.observe(
+                timestamp, columns['amount'][index], receiver,
+                columns['device_id'][index], columns['location'][index]
+            )
+        if self.graph is not None:
+            self.graph.add(sender, receiver, timestamp)
+        return sender, receiver, timestamp
+
+    @staticmethod
+    def _time_order(columns):
+        created_at = columns['created_at']
+        return sorted(range(len(created_at)), key=created_at.__getitem__)
+
+    def observe(self, transactions):
+        """
+        Fold transactions in without reading their features, e.g. to warm up on earlier history
+
+        Args:
+            transactions: Anything build_feature_matrix accepts with created_at timestamps
+        """
+        if not self.enabled:
+            return
+        columns = to_columns(transactions)
+        for index in self._time_order(columns):
+            self._fold(columns, index)
+
+    def features(self, transactions):
+        """
+        Fold transactions in and read each one's features as of its own time
+
+        Each row sees the earlier history, the earlier rows of the batch and
+        itself, never a later row.
+
+        Args:
+            transactions: Anything build_feature_matrix accepts with created_at timestamps
+
+        Returns:
+            (behaviour float64 (N, BEHAVIOUR_FEATURE_COUNT) or None,
+             raw graph float64 (N, GRAPH_FEATURE_COUNT) or None)
+        """
+        columns = to_columns(transactions)
+        n = len(columns['created_at'])
+        behaviour = np.zeros((n, BEHAVIOUR_FEATURE_COUNT)) if self.profiles is not None else None
+        graph = np.zeros((n, GRAPH_FEATURE_COUNT)) if self.graph is not None else None
+        if not self.enabled:
+            return behaviour, graph
+
+        for index in self._time_order(columns):
+            sender, receiver, timestamp = self._fold(columns, index)
+            if behaviour is not None:
+                behaviour[index] = self.profiles[sender].features(
+                    timestamp, columns['device_id'][index], columns['location'][index]
+                )
+            if graph is not None:
+                graph[index] = self.graph.features(sender, receiver, timestamp)
+        return behaviour, graph
+
+    def inputs(self, transactions):
+        """
+        features() as the behaviour and graph arguments of build_feature_matrix
+        """
+        behaviour, graph = self.features(transactions)
+        return behaviour, None if graph is None else graph / GRAPH_FEATURE_SCALE
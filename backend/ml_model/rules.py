@@ -0,0 +1,428 @@
+"""
+Rule Engine - data-driven rule-based fraud detection
+
+Rules are declared in a JSON rule set (ml_model/rulesets/default.json by
+default) and compiled once into plain Python closures for single
+transactions and NumPy mask functions for batches. Each rule adds its weight
+to the fraud score when its condition holds:
+
+    {"name": "high_amount", "reason": "High transaction amount", "weight": 0.3,
+     "when": {"field": "amount", "op": ">", "value": 50000}}
+
+Conditions nest with "all", "any" and "not", short-circuiting both per
+transaction and, for batches, by only evaluating the rows still undecided.
+A rule with "stop": true ends evaluation of later rules when it matches.
+Rules that read counterparty graph fields are skipped when no graph
+features are available. The file is re-read when it changes on disk.
+"""
+import json
+import logging
+import operator
+import os
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from django.conf import settings
+from .graph import GRAPH_FEATURES
+from .metrics import LATENCY_BUCKETS, histogram
+
+
+logger = logging.getLogger(__name__)
+
+evaluation_histogram = histogram(
+    'ml_rule_evaluation_seconds', LATENCY_BUCKETS, 'Time to evaluate the rule set for one transaction or batch')
+
+
+class RuleSetError(ValueError):
+    pass
+
+
+TRANSACTION_FIELDS = (
+    'amount', 'hour', 'weekday', 'transaction_type',
+    'sender_upi', 'receiver_upi', 'device_id', 'location',
+)
+
+FIELDS = TRANSACTION_FIELDS + GRAPH_FEATURES
+
+BINARY_OPS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+    'multiple_of': lambda a, b: a % b == 0,
+}
+
+UNARY_OPS = ('missing', 'present')
+
+
+def _truthy(values):
+    if values.dtype == object:
+        return np.fromiter((bool(value) for value in values), dtype=bool, count=len(values))
+    return values.astype(bool)
+
+
+def _chain(first, second, want):
+    if want:
+        return lambda row: first(row) and second(row)
+    return lambda row: first(row) or second(row)
+
+
+def _compile_condition(spec, fields, path):
+    """
+    Returns:
+        (scalar function of a row dict, vector function of (columns, row index or None))
+    """
+    if not isinstance(spec, dict):
+        raise RuleSetError(f"{path}: condition must be an object")
+
+    for combinator in ('all', 'any'):
+        if combinator in spec:
+            parts = [
+                _compile_condition(part, fields, f"{path}.{combinator}[{i}]")
+                for i, part in enumerate(spec[combinator])
+            ]
+            if not parts:
+                raise RuleSetError(f"{path}: '{combinator}' needs at least one condition")
+            scalars = [scalar for scalar, _ in parts]
+            vectors = [vector for _, vector in parts]
+            want = combinator == 'all'
+
+            scalar = scalars[0]
+            for part in scalars[1:]:
+                scalar = _chain(scalar, part, want)
+
+            def vector(columns, index, vectors=vectors, want=want):
+                # Evaluate each part only on rows whose outcome is still open
+                result = vectors[0](columns, index)
+                for fn in vectors[1:]:
+                    open_rows = np.flatnonzero(result == want)
+                    if not len(open_rows):
+                        break
+                    rows = open_rows if index is None else index[open_rows]
+                    result[open_rows] = fn(columns, rows)
+                return result
+            return scalar, vector
+
+    if 'not' in spec:
+        inner_scalar, inner_vector = _compile_condition(spec['not'], fields, f"{path}.not")
+        return (lambda row: not inner_scalar(row)), (lambda columns, index: ~inner_vector(columns, index))
+
+    field, op = spec.get('field'), spec.get('op')
+    if field not in FIELDS:
+        raise RuleSetError(f"{path}: unknown field {field!r}")
+    fields.add(field)
+
+    def column(columns, index, name=field):
+        values = columns[name]
+        return values if index is None else values[index]
+
+    if op in UNARY_OPS:
+        present = op == 'present'
+        return (
+            (lambda row: bool(row[field]) == present),
+            (lambda columns, index: _truthy(column(columns, index)) == present),
+        )
+
+    if op not in BINARY_OPS:
+        raise RuleSetError(f"{path}: unknown op {op!r}")
+    compare = BINARY_OPS[op]
+
+    if 'other' in spec:
+        other = spec['other']
+        if other not in FIELDS:
+            raise RuleSetError(f"{path}: unknown field {other!r}")
+        fields.add(other)
+        return (
+            (lambda row: compare(row[field], row[other])),
+            (lambda columns, index: np.asarray(compare(column(columns, index), column(columns, index, other)), dtype=bool)),
+        )
+
+    if 'value' not in spec:
+        raise RuleSetError(f"{path}: '{op}' needs a value or other field")
+    value = spec['value']
+    return (
+        (lambda row: compare(row[field], value)),
+        (lambda columns, index: np.asarray(compare(column(columns, index), value), dtype=bool)),
+    )
+
+
+class Rule:
+    def __init__(self, spec, position):
+        path = f"rules[{position}]"
+        try:
+            self.name = spec['name']
+            self.reason = spec['reason']
+            self.weight = float(spec['weight'])
+        except (KeyError, TypeError, ValueError):
+            raise RuleSetError(f"{path}: name, reason and a numeric weight are required")
+        self.stop = bool(spec.get('stop', False))
+        fields = set()
+        self.matches, self.matches_batch = _compile_condition(spec.get('when'), fields, f"{path}.when")
+        self.needs_graph = bool(fields & set(GRAPH_FEATURES))
+        # hits, evaluations, seconds spent evaluating
+        self.counters = [0, 0, 0.0]
+
+
+class RuleSet:
+    """
+    A compiled rule set
+    """
+
+    def __init__(self, spec, source=None):
+        if not isinstance(spec, dict) or not isinstance(spec.get('rules'), list):
+            raise RuleSetError('A rule set needs a "rules" list')
+        self.source = source
+        self.version = spec.get('version')
+        self.fraud_threshold = float(spec.get('fraud_threshold', 0.5))
+        self.max_probability = float(spec.get('max_probability', 1.0))
+        self.rules = [Rule(rule, position) for position, rule in enumerate(spec['rules'])]
+        names = [rule.name for rule in self.rules]
+        if len(set(names)) != len(names):
+            raise RuleSetError('Rule names must be unique')
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path) as f:
+                spec = json.load(f)
+        except (OSError, ValueError) as e:
+            raise RuleSetError(f"Cannot read rule set {path}: {e}")
+        return cls(spec, source=str(path))
+
+
+def transaction_row(transaction, graph=None):
+    """
+    Rule inputs for one transaction, with optional raw graph features
+    """
+    row = {
+        'amount': float(transaction.amount),
+        'hour': transaction.created_at.hour,
+        'weekday': transaction.created_at.weekday(),
+        'transaction_type': transaction.transaction_type,
+        'sender_upi': transaction.sender_upi,
+        'receiver_upi': transaction.receiver_upi,
+        'device_id': transaction.device_id,
+        'location': transaction.location,
+    }
+    if graph is not None:
+        row.update(zip(GRAPH_FEATURES, graph))
+    return row
+
+
+def transaction_columns(transactions, graph=None):
+    """
+    Rule inputs for a batch as NumPy columns, with an optional (N, K) graph feature array
+    """
+    n = len(transactions)
+    columns = {
+        'amount': np.fromiter((float(t.amount) for t in transactions), dtype=np.float64, count=n),
+        'hour': np.fromiter((t.created_at.hour for t in transactions), dtype=np.int64, count=n),
+        'weekday': np.fromiter((t.created_at.weekday() for t in transactions), dtype=np.int64, count=n),
+    }
+    for field in ('transaction_type', 'sender_upi', 'receiver_upi', 'device_id', 'location'):
+        values = np.empty(n, dtype=object)
+        values[:] = [getattr(t, field) for t in transactions]
+        columns[field] = values
+    if graph is not None:
+        for position, field in enumerate(GRAPH_FEATURES):
+            columns[field] = np.asarray(graph)[:, position]
+    return columns
+
+
+class RuleEngine:
+    """
+    Evaluates the configured rule set and keeps per-rule hit counts and timings.
+
+    The rule file is checked for changes at most every check_interval
+    seconds; a file that fails to compile is reported and the previous rule
+    set stays active.
+    """
+
+    def __init__(self, path=None, check_interval=None):
+        self.path = path or settings.FRAUD_RULES_PATH
+        self.check_interval = settings.FRAUD_RULES_RELOAD_INTERVAL if check_interval is None else check_interval
+        self._lock = threading.Lock()
+        self._ruleset = None
+        self._fingerprint = None
+        self._last_check = 0.0
+        self.load_count = 0
+
+    def _file_fingerprint(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    @property
+    def ruleset(self):
+        ruleset = self._ruleset
+        if ruleset is not None and time.monotonic() - self._last_check < self.check_interval:
+            return ruleset
+
+        with self._lock:
+            self._last_check = time.monotonic()
+            fingerprint = self._file_fingerprint()
+            if self._ruleset is None or fingerprint != self._fingerprint:
+                try:
+                    ruleset = RuleSet.load(self.path)
+                    # Rules that survive a reload keep their counters
+                    previous = {rule.name: rule for rule in self._ruleset.rules} if self._ruleset else {}
+                    for rule in ruleset.rules:
+                        if rule.name in previous:
+                            rule.counters = previous[rule.name].counters
+                    self._ruleset = ruleset
+                    self.load_count += 1
+                except RuleSetError as e:
+                    if self._ruleset is None:
+                        raise
+                    logger.error("Error reloading fraud rules, keeping the previous rule set: %s", e)
+                self._fingerprint = fingerprint
+            return self._ruleset
+
+    def _record(self, observed):
+        """
+        Add (rule, hits, evaluations, seconds) observations to the rule counters
+        """
+        with self._lock:
+            for rule, hits, evaluations, seconds in observed:
+                counters = rule.counters
+                counters[0] += hits
+                counters[1] += evaluations
+                counters[2] += seconds
+
+    def _result(self, ruleset, score, reasons, timestamp=None):
+        return {
+            'is_fraud': score > ruleset.fraud_threshold,
+            'fraud_probability': min(score, ruleset.max_probability),
+            'detection_method': 'rule_based',
+            'reasons': reasons,
+            'timestamp': timestamp or datetime.now().isoformat()
+        }
+
+    def evaluate(self, transaction, graph=None):
+        """
+        Score one transaction
+
+        Args:
+            transaction: Transaction model instance
+            graph: Optional raw counterparty graph feature row
+
+        Returns:
+            dict with fraud detection results
+        """
+        clock = time.perf_counter
+        started = clock()
+        ruleset = self.ruleset
+        row = transaction_row(transaction, graph)
+        observed = []
+        fraud_score = 0.0
+        reasons = []
+
+        for rule in ruleset.rules:
+            if rule.needs_graph and graph is None:
+                continue
+            start = clock()
+            matched = rule.matches(row)
+            observed.append((rule, 1 if matched else 0, 1, clock() - start))
+            if matched:
+                fraud_score += rule.weight
+                reasons.append(rule.reason)
+                if rule.stop:
+                    break
+
+        self._record(observed)
+        result = self._result(ruleset, fraud_score, reasons)
+        evaluation_histogram.observe(clock() - started)
+        return result
+
+    def evaluate_batch(self, transactions, graph=None):
+        """
+        Score many transactions with vectorized rule conditions
+
+        Args:
+            transactions: Sequence of Transaction model instances
+            graph: Optional (N, K) array of raw counterparty graph features
+
+        Returns:
+            list of dicts with fraud detection results, in input order
+        """
+        started = time.perf_counter()
+        ruleset = self.ruleset
+        rules = ruleset.rules
+        n = len(transactions)
+        columns = transaction_columns(transactions, graph)
+        scores = np.zeros(n, dtype=np.float64)
+        matched = np.zeros((len(rules), n), dtype=bool)
+        active = np.ones(n, dtype=bool)
+        observed = []
+
+        for position, rule in enumerate(rules):
+            if rule.needs_graph and graph is None:
+                continue
+            index = None if active.all() else np.flatnonzero(active)
+            if index is not None and not len(index):
+                break
+            start = time.perf_counter()
+            result = rule.matches_batch(columns, index)
+            elapsed = time.perf_counter() - start
+            if index is not None:
+                expanded = np.zeros(n, dtype=bool)
+                expanded[index] = result
+                result = expanded
+            observed.append((rule, int(result.sum()), n if index is None else len(index), elapsed))
+            matched[position] = result
+            # Adding 0.0 leaves a score unchanged, so totals match the scalar path exactly
+            scores += np.where(result, rule.weight, 0.0)
+            if rule.stop:
+                active &= ~result
+
+        self._record(observed)
+        reasons = [rule.reason for rule in rules]
+        timestamp = datetime.now().isoformat()
+        results = [
+            self._result(ruleset, score, [reason for reason, hit in zip(reasons, row) if hit], timestamp)
+            for score, row in zip(scores.tolist(), matched.T.tolist())
+        ]
+        evaluation_histogram.observe(time.perf_counter() - started)
+        return results
+
+    def status(self):
+        """
+        Rule set version and per-rule counters
+        """
+        ruleset = self._ruleset
+        with self._lock:
+            rules = {
+                rule.name: {
+                    'hits': hits,
+                    'evaluations': evaluations,
+                    'mean_us': seconds / evaluations * 1e6 if evaluations else 0.0,
+                }
+                for rule in (ruleset.rules if ruleset else [])
+                for hits, evaluations, seconds in [rule.counters]
+            }
+        return {
+            'source': ruleset.source if ruleset else str(self.path),
+            'version': ruleset.version if ruleset else None,
+            'load_count': self.load_count,
+            'rules': rules,
+        }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_rule_engine():
+    """
+    The process-wide RuleEngine, created on first use
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RuleEngine()
+        return _engine
@@ -0,0 +1,250 @@
+"""
+Feature Snapshot - on-disk, memory-mapped copy of the CNN feature matrix
+
+A snapshot is a directory of segments plus a JSON manifest:
+
+    manifest.json
+    features-00000.npy   float32 (n, 64) feature rows
+    labels-00000.npy     uint8 (n,) is_fraud labels
+    ids-00000.npy        int64 (n,) transaction primary keys
+    features-00001.npy   ...
+
+Each export appends one or more segments holding the transactions created
+since the previous export (pk greater than the manifest's last_id), so
+snapshots grow without rewriting earlier rows. Segments are opened with
+mmap_mode='r' and sliced without copying, for training (see training.py)
+and batch scoring.
+
+Behavioural and graph slots are filled point-in-time (see replay.py) when
+BEHAVIOUR_FEATURES_ENABLED / GRAPH_FEATURES_ENABLED are set; the manifest
+records which were, and appending with different settings is refused.
+
+The manifest is replaced atomically after the segment files are written,
+so an interrupted export leaves the previous snapshot intact.
+"""
+import json
+import os
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+from django.db.models import Max
+from .features import FEATURE_COUNT, INPUT_SHAPE, build_feature_matrix
+
+
+FORMAT_VERSION = 1
+
+MANIFEST_NAME = 'manifest.json'
+
+
+class SnapshotError(Exception):
+    """
+    Raised when a snapshot directory is missing or incompatible
+    """
+
+
+def _segment_paths(path, index):
+    return {
+        name: Path(path) / f'{name}-{index:05d}.npy'
+        for name in ('features', 'labels', 'ids')
+    }
+
+
+class FeatureSnapshot:
+    """
+    Read access to a snapshot directory
+    """
+
+    def __init__(self, path):
+        """
+        Open a snapshot
+
+        Args:
+            path: Snapshot directory containing manifest.json
+        """
+        self.path = Path(path)
+        try:
+            with open(self.path / MANIFEST_NAME) as manifest:
+                self.manifest = json.load(manifest)
+        except FileNotFoundError:
+            raise SnapshotError(f"No snapshot manifest in {self.path}")
+        if self.manifest.get('format_version') != FORMAT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot format {self.manifest.get('format_version')}")
+        if self.manifest.get('feature_count') != FEATURE_COUNT:
+            raise SnapshotError(f"Snapshot has {self.manifest.get('feature_count')} features, expected {FEATURE_COUNT}")
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    @property
+    def last_id(self):
+        return self.manifest['last_id']
+
+    @property
+    def feature_groups(self):
+        """
+        Behavioural and graph slots filled by the export, as {'behaviour': bool, 'graph': bool}
+        """
+        return {group: self.manifest.get(group, False) for group in ('behaviour', 'graph')}
+
+    def segments(self):
+        """
+        Yields:
+            (features, labels, ids) memory-mapped arrays per segment
+        """
+        for segment in self.manifest['segments']:
+            paths = _segment_paths(self.path, segment['index'])
+            yield tuple(np.load(paths[name], mmap_mode='r') for name in ('features', 'labels', 'ids'))
+
+    def iter_chunks(self, chunk_size=10000):
+        """
+        Walk the snapshot in slices of at most chunk_size rows
+
+        Yields:
+            (features (n, 8, 8, 1) float32, labels (n,) uint8, ids (n,) int64);
+            all three are views of the memory-mapped segments
+        """
+        for features, labels, ids in self.segments():
+            for start in range(0, len(ids), chunk_size):
+                stop = start + chunk_size
+                yield features[start:stop].reshape((-1,) + INPUT_SHAPE), labels[start:stop], ids[start:stop]
+
+    def chunks(self, chunk_size=10000):
+        """
+        Chunk source for FraudDetectionCNN.train_streaming
+        """
+        def chunks():
+            for features, labels, _ in self.iter_chunks(chunk_size):
+                yield features, labels.astype(np.float32)
+        return chunks
+
+    def score(self, detector, chunk_size=10000):
+        """
+        Score every row with the detector's CNN
+
+        Args:
+            detector: FraudDetector with a loaded model
+            chunk_size: Rows per model call
+
+        Yields:
+            (ids, fraud probabilities) per chunk
+        """
+        if not detector.model_loaded:
+            raise SnapshotError('Scoring a snapshot needs a trained model')
+        for features, _, ids in self.iter_chunks(chunk_size):
+            yield ids, detector.score(features)
+
+
+def _write_manifest(path, manifest):
+    temporary = Path(path) / f'{MANIFEST_NAME}.tmp'
+    with open(temporary, 'w') as handle:
+        json.dump(manifest, handle, indent=2)
+    os.replace(temporary, Path(path) / MANIFEST_NAME)
+
+
+def export_snapshot(path, queryset=None, chunk_size=10000, segment_rows=1000000):
+    """
+    Create a snapshot or append the transactions added since the last export
+
+    Rows are read in pk order by keyset queries and written straight into
+    preallocated memory-mapped segments, so memory stays at one chunk (plus
+    the replay state when behavioural or graph features are enabled; an
+    append first replays the rows already exported, without featurising them).
+
+    Args:
+        path: Snapshot directory (created if missing)
+        queryset: Transaction queryset to export (all transactions by default)
+        chunk_size: Rows per database query
+        segment_rows: Maximum rows per segment file
+
+    Returns:
+        Number of rows appended
+    """
+    from transactions.models import Transaction
+    from .replay import FeatureReplay
+    from .training import LABEL_FIELD, queryset_columns_by_pk, with_history
+
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    try:
+        manifest = FeatureSnapshot(path).manifest
+    except SnapshotError:
+        if (path / MANIFEST_NAME).exists():
+            raise
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'feature_count': FEATURE_COUNT,
+            'rows': 0,
+            'last_id': 0,
+            'segments': [],
+            'behaviour': settings.BEHAVIOUR_FEATURES_ENABLED,
+            'graph': settings.GRAPH_FEATURES_ENABLED,
+        }
+    groups = {'behaviour': settings.BEHAVIOUR_FEATURES_ENABLED, 'graph': settings.GRAPH_FEATURES_ENABLED}
+    if any(manifest.get(group, False) != enabled for group, enabled in groups.items()):
+        raise SnapshotError(
+            f"Snapshot was exported with behaviour={manifest.get('behaviour', False)}, "
+            f"graph={manifest.get('graph', False)}; export the current settings to a new snapshot"
+        )
+
+    queryset = queryset if queryset is not None else Transaction.objects.all()
+    # Fix the upper bound so rows inserted during the export wait for the next one
+    upper = queryset.aggregate(upper=Max('pk'))['upper'] or 0
+    pending = queryset.filter(pk__gt=manifest['last_id'], pk__lte=upper)
+    remaining = pending.count()
+    if not remaining:
+        return 0
+
+    replay = FeatureReplay()
+    if replay.enabled:
+        for chunk in queryset_columns_by_pk(queryset.filter(pk__lte=manifest['last_id']), chunk_size):
+            replay.observe(chunk)
+    columns = with_history(queryset_columns_by_pk(pending, chunk_size, include_pk=True), replay)
+    carry = None
+    appended = 0
+    index = max((segment['index'] for segment in manifest['segments']), default=-1) + 1
+    while remaining:
+        rows = min(remaining, segment_rows)
+        paths = _segment_paths(path, index)
+        features = np.lib.format.open_memmap(paths['features'], mode='w+', dtype=np.float32, shape=(rows, FEATURE_COUNT))
+        labels = np.lib.format.open_memmap(paths['labels'], mode='w+', dtype=np.uint8, shape=(rows,))
+        ids = np.lib.format.open_memmap(paths['ids'], mode='w+', dtype=np.int64, shape=(rows,))
+
+        filled = 0
+        while filled < rows:
+            if carry is None:
+                chunk = next(columns, None)
+                if chunk is None:
+                    raise SnapshotError('Transactions were deleted during the export; run it again')
+                chunk_ids = chunk.pop('pk')
+                chunk_labels = chunk.pop(LABEL_FIELD)
+                chunk_features = build_feature_matrix(chunk, chunk.pop('behaviour', None), chunk.pop('graph', None))
+                carry = (chunk_features.reshape(-1, FEATURE_COUNT), chunk_labels, chunk_ids)
+            chunk_features, chunk_labels, chunk_ids = carry
+            take = min(rows - filled, len(chunk_ids))
+            features[filled:filled + take] = chunk_features[:take]
+            labels[filled:filled + take] = chunk_labels[:take]
+            ids[filled:filled + take] = chunk_ids[:take]
+            filled += take
+            carry = None if take == len(chunk_ids) else (
+                chunk_features[take:], chunk_labels[take:], chunk_ids[take:]
+            )
+
+        for array in (features, labels, ids):
+            array.flush()
+        manifest['segments'].append({
+            'index': index,
+            'rows': rows,
+            'first_id': int(ids[0]),
+            'last_id': int(ids[-1]),
+            'created_at': datetime.now(dt_timezone.utc).isoformat(),
+        })
+        manifest['rows'] += rows
+        manifest['last_id'] = int(ids[-1])
+        del features, labels, ids
+        _write_manifest(path, manifest)
+
+        appended += rows
+        remaining -= rows
+        index += 1
+    return appended
@@ -0,0 +1,1080 @@
+import importlib.util
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from transactions.models import Transaction
+from .batching import BatchScheduler, batch_size_histogram
+from .cascade import CLEARED, FLAGGED, FORWARDED, decision_counters, evaluate as evaluate_cascade
+from .export import export_numpy_model, save_artifact
+from .feature_store import BEHAVIOUR_FEATURE_COUNT, BehaviourProfile, FeatureStore, rebuild_feature_store
+from .features import BEHAVIOUR_OFFSET, GRAPH_OFFSET, build_feature_matrix, queryset_columns
+from .graph import GRAPH_FEATURE_COUNT, GRAPH_FEATURE_SCALE, CounterpartyGraph
+from .metrics import counter, histogram, render_prometheus
+from .models import SenderBehaviour
+from .fraud_detector import FraudDetector, fallback_counters, feature_histogram, prediction_counters
+from .numpy_runtime import NumpyFraudModel
+from .prediction_cache import PredictionCache, cache_evictions, feature_key, prediction_cache
+from .registry import DetectorRegistry
+from .replay import FeatureReplay
+from .rules import RuleEngine, RuleSet, RuleSetError, get_rule_engine
+from .snapshot import FeatureSnapshot, SnapshotError, export_snapshot
+from . import training
+
+
+class DetectorRegistryTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.model_path = Path(self.tmpdir.name) / 'fraud_detection_cnn.h5'
+        self.scaler_path = Path(self.tmpdir.name) / 'scaler.pkl'
+        overrides = override_settings(ML_MODEL_PATH=self.model_path, SCALER_PATH=self.scaler_path)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_detector_is_shared(self):
+        registry = DetectorRegistry(check_interval=0)
+        self.assertIs(registry.get(), registry.get())
+        self.assertEqual(registry.load_count, 1)
+
+    def test_reloads_when_model_files_change(self):
+        registry = DetectorRegistry(check_interval=0)
+        first = registry.get()
+
+        self.model_path.write_bytes(b'model')
+        self.scaler_path.write_bytes(b'scaler')
+        second = registry.get()
+
+        self.assertIsNot(first, second)
+        self.assertEqual(registry.load_count, 2)
+        self.assertIs(registry.get(), second)
+
+    def test_check_interval_skips_stat(self):
+        registry = DetectorRegistry(check_interval=3600)
+        first = registry.get()
+        self.model_path.write_bytes(b'model')
+        self.assertIs(registry.get(), first)
+
+    def test_status_does_not_load(self):
+        registry = DetectorRegistry(check_interval=0)
+        status = registry.status()
+        self.assertFalse(status['warm'])
+        self.assertFalse(status['model_loaded'])
+        self.assertEqual(registry.load_count, 0)
+
+        registry.get()
+        status = registry.status()
+        self.assertTrue(status['warm'])
+        self.assertEqual(status['detection_method'], 'rule_based')
+
+
+class BatchSchedulerTests(SimpleTestCase):
+    def test_concurrent_requests_share_forward_pass(self):
+        calls = []
+
+        def predict_fn(X):
+            calls.append(len(X))
+            return X.reshape(len(X), -1)[:, :1] * 2
+
+        scheduler = BatchScheduler(predict_fn, max_batch_size=8, max_wait_ms=200)
+        self.addCleanup(scheduler.close)
+        batch_size_histogram.reset()
+
+        results = {}
+        start = threading.Barrier(8)
+
+        def score(i):
+            start.wait()
+            features = np.full((1, 8, 8, 1), i, dtype=np.float32)
+            results[i] = float(scheduler.predict(features, timeout=5)[0][0])
+
+        threads = [threading.Thread(target=score, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {i: i * 2.0 for i in range(8)})
+        self.assertLess(len(calls), 8)
+        self.assertEqual(sum(calls), 8)
+        self.assertEqual(batch_size_histogram.snapshot()['count'], len(calls))
+
+    def test_errors_reach_every_caller(self):
+        def predict_fn(X):
+            raise ValueError('boom')
+
+        scheduler = BatchScheduler(predict_fn, max_batch_size=4, max_wait_ms=1)
+        self.addCleanup(scheduler.close)
+        with self.assertRaises(ValueError):
+            scheduler.predict(np.zeros((1, 8, 8, 1), dtype=np.float32), timeout=5)
+
+    def test_closed_scheduler_scores_directly(self):
+        scheduler = BatchScheduler(lambda X: np.ones((len(X), 1)), max_wait_ms=1)
+        scheduler.close()
+        result = scheduler.predict(np.zeros((2, 8, 8, 1), dtype=np.float32), timeout=1)
+        self.assertEqual(result.shape, (2, 1))
+
+
+def random_transactions(count, seed=0, user=None):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+    transactions = []
+    for _ in range(count):
+        transactions.append(Transaction(
+            user=user,
+            sender_upi=f"user{rng.randint(0, 99999)}@upi",
+            receiver_upi=rng.choice(['a@upi', 'merchant.store@okbank', 'x' * rng.randint(1, 99)]),
+            amount=Decimal(rng.randint(1, 10000000)) / 100,
+            transaction_type=rng.choice(['SEND', 'RECEIVE', 'REQUEST', 'OTHER']),
+            location=rng.choice([None, '', 'Mumbai']),
+            device_id=rng.choice([None, '', 'device-1']),
+            created_at=start + timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+        ))
+    return transactions
+
+
+class FeatureMatrixTests(TestCase):
+    def setUp(self):
+        self.detector = FraudDetector.__new__(FraudDetector)
+
+    def reference(self, transactions):
+        return np.concatenate([self.detector.extract_features(t) for t in transactions])
+
+    def test_matches_single_row_extraction(self):
+        transactions = random_transactions(500)
+        batch = build_feature_matrix(transactions)
+
+        self.assertEqual(batch.shape, (500, 8, 8, 1))
+        self.assertEqual(batch.dtype, np.float32)
+        self.assertEqual(batch.tobytes(), self.reference(transactions).tobytes())
+
+    def test_values_rows_and_columns(self):
+        user = User.objects.create_user(username='features')
+        transactions = random_transactions(50, seed=1, user=user)
+        Transaction.objects.bulk_create(transactions)
+        saved = list(Transaction.objects.order_by('id'))
+        expected = self.reference(saved).tobytes()
+
+        values = Transaction.objects.order_by('id').values()
+        self.assertEqual(build_feature_matrix(values).tobytes(), expected)
+        columns = queryset_columns(Transaction.objects.order_by('id'))
+        self.assertEqual(build_feature_matrix(columns).tobytes(), expected)
+
+    def test_empty_batch(self):
+        self.assertEqual(build_feature_matrix([]).shape, (0, 8, 8, 1))
+
+    def test_behaviour_slots_match_single_row_extraction(self):
+        transactions = random_transactions(100, seed=2)
+        behaviour = np.random.default_rng(0).random((100, BEHAVIOUR_FEATURE_COUNT))
+        batch = build_feature_matrix(transactions, behaviour)
+        reference = np.concatenate([
+            self.detector.extract_features(t, row) for t, row in zip(transactions, behaviour)
+        ])
+
+        self.assertEqual(batch.tobytes(), reference.tobytes())
+        flat = batch.reshape(100, -1)
+        np.testing.assert_array_equal(
+            flat[:, BEHAVIOUR_OFFSET:BEHAVIOUR_OFFSET + BEHAVIOUR_FEATURE_COUNT], behaviour.astype(np.float32)
+        )
+
+
+@override_settings(BEHAVIOUR_FEATURES_ENABLED=True)
+class FeatureStoreTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='behaviour')
+        self.start = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+
+    def transaction(self, minutes, amount, receiver='shop@upi', device='device-1', location='Pune', sender='sam@upi'):
+        return Transaction(
+            user=self.user, sender_upi=sender, receiver_upi=receiver, amount=Decimal(amount),
+            device_id=device, location=location, created_at=self.start + timedelta(minutes=minutes),
+        )
+
+    def test_windows(self):
+        profile = BehaviourProfile()
+        for minutes, amount, receiver in ((0, 100, 'a'), (30, 300, 'b'), (60 * 20, 200, 'a')):
+            t = self.transaction(minutes, amount, receiver)
+            profile.observe(t.created_at.timestamp(), t.amount, t.receiver_upi, t.device_id, t.location)
+
+        at = (self.start + timedelta(hours=20, minutes=1)).timestamp()
+        row = dict(zip(('count', 'sum', 'mean', 'std', 'receivers'), profile.features(at)[:5]))
+        self.assertEqual(row['count'], 1 / 100.0)
+        self.assertEqual(row['sum'], 200 / 100000.0)
+        # 24h: 100, 300 and 200
+        day = profile.features(at)[5:10]
+        self.assertEqual(day[0], 3 / 100.0)
+        self.assertAlmostEqual(day[2], 200 / 100000.0)
+        self.assertAlmostEqual(day[3], np.std([100, 300, 200]) / 100000.0)
+        self.assertEqual(day[4], 2 / 100.0)
+
+        week_later = (self.start + timedelta(days=8)).timestamp()
+        self.assertEqual(profile.features(week_later)[:15], [0.0] * 15)
+
+    def test_new_device_and_location(self):
+        profile = BehaviourProfile()
+        first = self.transaction(0, 100)
+        profile.observe(first.created_at.timestamp(), 100, 'a', 'device-1', 'Pune')
+        at = first.created_at.timestamp()
+        self.assertEqual(profile.features(at, 'device-1', 'Pune')[-2:], [1.0, 1.0])
+        self.assertEqual(profile.features(at + 60, 'device-1', 'Delhi')[-2:], [0.0, 1.0])
+        self.assertEqual(profile.features(at + 60, None, None)[-2:], [0.0, 0.0])
+
+    def test_record_persists_and_reloads(self):
+        store = FeatureStore(max_profiles=10, ttl=60)
+        transactions = [self.transaction(i * 10, 100 + i) for i in range(5)]
+        Transaction.objects.bulk_create(transactions)
+        with self.captureOnCommitCallbacks(execute=True):
+            store.record(transactions)
+        self.assertEqual(SenderBehaviour.objects.get().state['last_seen'], transactions[-1].created_at.timestamp())
+
+        with self.assertNumQueries(0):
+            cached = store.features(transactions)
+        restarted = FeatureStore(max_profiles=10, ttl=60)
+        with self.assertNumQueries(1):
+            reloaded = restarted.features(transactions)
+        np.testing.assert_array_equal(cached, reloaded)
+        self.assertEqual(cached[-1, 0], 5 / 100.0)
+
+    def test_unsaved_batch_rows_see_earlier_rows(self):
+        store = FeatureStore(max_profiles=10, ttl=60)
+        batch = [self.transaction(i, 100, receiver=f'r{i}') for i in range(3)]
+        rows = store.features(batch)
+
+        self.assertEqual(list(rows[:, 0]), [0.01, 0.02, 0.03])
+        self.assertEqual(list(rows[:, 4]), [0.01, 0.02, 0.03])
+        # The cached profile itself is untouched
+        self.assertEqual(store.features([self.transaction(5, 100)])[0, 0], 0.01)
+
+    def test_rebuild_matches_incremental(self):
+        transactions = [self.transaction(i * 45, 10 * i, receiver=f'r{i % 3}', sender=f's{i % 2}') for i in range(20)]
+        Transaction.objects.bulk_create(transactions)
+        store = FeatureStore(max_profiles=10, ttl=60)
+        with self.captureOnCommitCallbacks(execute=True):
+            store.record(transactions)
+        incremental = dict(SenderBehaviour.objects.values_list('sender_upi', 'state'))
+
+        self.assertEqual(rebuild_feature_store(), 2)
+        self.assertEqual(dict(SenderBehaviour.objects.values_list('sender_upi', 'state')), incremental)
+
+    def test_detector_fills_behaviour_slots(self):
+        detector = FraudDetector.__new__(FraudDetector)
+        transactions = [self.transaction(i, 500) for i in range(3)]
+        behaviour = detector.behaviour_features(transactions)
+        self.assertEqual(behaviour.shape, (3, BEHAVIOUR_FEATURE_COUNT))
+        with override_settings(BEHAVIOUR_FEATURES_ENABLED=False):
+            self.assertIsNone(detector.behaviour_features(transactions))
+
+
+@override_settings(GRAPH_FEATURES_ENABLED=True, GRAPH_SYNC_INTERVAL=60)
+class CounterpartyGraphTests(TestCase):
+    def setUp(self):
+        self.graph = CounterpartyGraph(window_hours=24, initial_capacity=4)
+        self.t0 = datetime(2024, 5, 1, tzinfo=dt_timezone.utc).timestamp()
+
+    def test_degrees_and_new_counterparty(self):
+        for i in range(5):
+            self.graph.add('mule@upi', f'r{i}@upi', self.t0 + i)
+        self.graph.add('other@upi', 'r0@upi', self.t0 + 10)
+
+        self.assertEqual(self.graph.features('mule@upi', 'r0@upi', self.t0 + 20), [0.0, 5.0, 2.0, 0.0])
+        self.assertEqual(self.graph.features('other@upi', 'r0@upi', self.t0 + 10), [1.0, 1.0, 2.0, 0.0])
+        self.assertEqual(self.graph.features('unknown@upi', 'r0@upi', self.t0), [1.0, 0.0, 0.0, 0.0])
+
+    def test_shared_counterparties(self):
+        # a and b both paid x and y, then a pays b
+        for sender in ('a', 'b'):
+            for receiver in ('x', 'y'):
+                self.graph.add(sender, receiver, self.t0)
+        self.graph.add('a', 'b', self.t0 + 1)
+        self.assertEqual(self.graph.features('a', 'b', self.t0 + 1)[3], 2.0)
+        self.assertEqual(self.graph.shared_counterparties(self.graph.node_id('x'), self.graph.node_id('y')), 2)
+
+    def test_old_edges_expire(self):
+        self.graph.add('a', 'x', self.t0)
+        self.graph.add('a', 'y', self.t0 + 3600)
+        for i in range(10):
+            self.graph.add(f's{i}', 'z', self.t0 + 24.5 * 3600 + i)
+
+        self.assertEqual(self.graph.features('a', 'y', self.t0 + 3600)[1], 1.0)
+        self.assertEqual(len(self.graph), 11)
+        self.graph.add('a', 'x', self.t0 + 26 * 3600)
+        self.assertEqual(self.graph.features('a', 'x', self.t0 + 26 * 3600)[:2], [1.0, 1.0])
+
+    def test_expired_accounts_release_their_nodes(self):
+        # 20 payments between new accounts every other day, with a 24 hour window
+        for day in range(30):
+            for i in range(20):
+                self.graph.add(f'day{day}-s{i}', f'day{day}-r{i}', self.t0 + day * 2 * 86400 + i)
+        # Only the last batch's 40 accounts are still held, in the slots of earlier ones
+        self.assertEqual(len(self.graph._ids), 40)
+        self.assertLessEqual(len(self.graph._out), 80)
+        self.assertNotIn('day0-s0', self.graph._ids)
+        self.assertEqual(self.graph.features('day29-s3', 'day29-r3', self.t0 + 58 * 86400 + 60), [0.0, 1.0, 1.0, 0.0])
+        self.assertEqual(self.graph.features('day0-s3', 'day0-r3', self.t0 + 58 * 86400), [1.0, 0.0, 0.0, 0.0])
+
+    def test_re_adding_is_a_no_op(self):
+        self.graph.add('a', 'x', self.t0)
+        self.graph.add('a', 'x', self.t0 + 5)
+        before = (len(self.graph), self.graph.features('a', 'x', self.t0 + 5))
+        self.graph.add('a', 'x', self.t0)
+        self.graph.add('a', 'x', self.t0 + 5)
+        self.assertEqual((len(self.graph), self.graph.features('a', 'x', self.t0 + 5)), before)
+
+    def test_sync_seeds_then_pulls_new_rows(self):
+        user = User.objects.create_user(username='graph')
+        now = datetime.now(dt_timezone.utc)
+        Transaction.objects.bulk_create([
+            Transaction(user=user, sender_upi='a', receiver_upi='old', amount=1),
+            Transaction(user=user, sender_upi='a', receiver_upi='x', amount=1),
+        ])
+        Transaction.objects.filter(receiver_upi='old').update(created_at=now - timedelta(days=3))
+        graph = CounterpartyGraph(window_hours=24)
+        with self.assertNumQueries(2):
+            graph.sync()
+        self.assertNotIn('old', graph._ids)
+
+        Transaction.objects.create(user=user, sender_upi='a', receiver_upi='y', amount=1)
+        with self.assertNumQueries(0):
+            graph.sync()
+        graph.sync(force=True)
+        self.assertEqual(graph.features('a', 'y', now.timestamp())[1], 2.0)
+
+    def test_seeding_an_empty_window_skips_older_rows(self):
+        user = User.objects.create_user(username='graph')
+        Transaction.objects.bulk_create([
+            Transaction(user=user, sender_upi='a', receiver_upi=f'old{i}', amount=1) for i in range(3)
+        ])
+        Transaction.objects.update(created_at=datetime.now(dt_timezone.utc) - timedelta(days=3))
+        graph = CounterpartyGraph(window_hours=24)
+        graph.sync()
+        self.assertEqual(len(graph), 0)
+        self.assertEqual(graph.high_water, Transaction.objects.order_by('pk').last().pk)
+
+        Transaction.objects.create(user=user, sender_upi='a', receiver_upi='new', amount=1)
+        with self.assertNumQueries(1):
+            graph.sync(force=True)
+        self.assertEqual(set(graph._ids), {'a', 'new'})
+
+    def test_sync_fetches_rows_outside_the_lock(self):
+        user = User.objects.create_user(username='graph')
+        Transaction.objects.bulk_create([
+            Transaction(user=user, sender_upi='a', receiver_upi=f'r{i}', amount=1) for i in range(5)
+        ])
+        graph = CounterpartyGraph(window_hours=24)
+        held = []
+
+        def record_lock(execute, sql, params, many, context):
+            held.append(graph._lock._is_owned())
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record_lock):
+            graph.sync(chunk_size=2)
+        # The window seed (max pk, then chunks of 2, 2 and 1 rows)
+        self.assertEqual(held, [False, False, False, False])
+        self.assertEqual(graph.features('a', 'r4', time.time())[1], 5.0)
+
+        # A sync already in progress is not started again by another caller
+        graph._syncing = True
+        with self.assertNumQueries(0):
+            graph.sync(force=True)
+
+    def test_replay_leaves_the_process_graph_alone(self):
+        detector = FraudDetector.__new__(FraudDetector)
+        detector.model = None
+        batch = [
+            Transaction(sender_upi='a', receiver_upi=f'r{i}', amount=1,
+                        created_at=datetime(2024, 5, 1, tzinfo=dt_timezone.utc) + timedelta(minutes=i))
+            for i in range(12)
+        ]
+        with mock.patch.object(CounterpartyGraph, 'batch_features', side_effect=AssertionError('live graph')):
+            results = detector.predict_batch(batch, replay=FeatureReplay())
+        expected = get_rule_engine().evaluate_batch(batch, FeatureReplay().features(batch)[1])
+        self.assertEqual([r['reasons'] for r in results], [r['reasons'] for r in expected])
+        self.assertEqual([r['fraud_probability'] for r in results], [r['fraud_probability'] for r in expected])
+
+    def test_batch_rows_see_earlier_rows(self):
+        start = datetime(2024, 5, 1, tzinfo=dt_timezone.utc)
+        graph = CounterpartyGraph(window_hours=24)
+        graph.seeded = True
+        graph._synced_at = float('inf')
+        batch = [
+            Transaction(sender_upi='a', receiver_upi=f'r{i % 2}', amount=1, created_at=start + timedelta(minutes=i))
+            for i in range(4)
+        ]
+        rows = graph.batch_features(batch)
+        self.assertEqual(rows.shape, (4, GRAPH_FEATURE_COUNT))
+        self.assertEqual(list(rows[:, 0]), [1.0, 1.0, 0.0, 0.0])
+        self.assertEqual(list(rows[:, 1]), [1.0, 2.0, 2.0, 2.0])
+
+    def test_rules_and_feature_slots(self):
+        detector = FraudDetector.__new__(FraudDetector)
+        transaction = random_transactions(1, seed=3)[0]
+        transaction.amount = Decimal('20000.50')
+        transaction.device_id = transaction.location = 'set'
+        transaction.created_at = transaction.created_at.replace(hour=12)
+        quiet = detector.rule_based_detection(transaction, np.array([0.0, 1.0, 1.0, 0.0]))
+        ring = detector.rule_based_detection(transaction, np.array([1.0, 12.0, 25.0, 3.0]))
+
+        self.assertEqual(quiet['reasons'], detector.rule_based_detection(transaction)['reasons'])
+        self.assertFalse(quiet['is_fraud'])
+        self.assertTrue(ring['is_fraud'])
+        self.assertEqual(len(ring['reasons']), 4)
+
+        graph = np.array([[1.0, 12.0, 25.0, 3.0]])
+        batch = build_feature_matrix([transaction], graph=graph / GRAPH_FEATURE_SCALE)
+        self.assertEqual(batch.tobytes(), detector.extract_features(transaction, graph=graph[0]).tobytes())
+        self.assertEqual(batch.reshape(-1)[GRAPH_OFFSET + 1], np.float32(0.12))
+
+
+def legacy_rule_based_detection(transaction, graph=None):
+    """
+    The hard-coded rules the default rule set replaces, kept as a reference
+    """
+    fraud_score = 0.0
+    reasons = []
+    amount = float(transaction.amount)
+    if amount > 50000:
+        fraud_score += 0.3
+        reasons.append("High transaction amount")
+    hour = transaction.created_at.hour
+    if hour < 6 or hour > 22:
+        fraud_score += 0.2
+        reasons.append("Unusual transaction time")
+    if amount % 1000 == 0 and amount > 10000:
+        fraud_score += 0.15
+        reasons.append("Round amount transaction")
+    if not transaction.device_id or not transaction.location:
+        fraud_score += 0.25
+        reasons.append("Missing device/location information")
+    if transaction.sender_upi == transaction.receiver_upi:
+        fraud_score += 0.5
+        reasons.append("Self-transfer detected")
+    if graph is not None:
+        new_counterparty, out_degree, in_degree, shared = graph
+        if out_degree >= 10:
+            fraud_score += 0.2
+            reasons.append("Sender paying many different accounts")
+        if new_counterparty and in_degree >= 20:
+            fraud_score += 0.2
+            reasons.append("Receiver collecting from many senders")
+        if new_counterparty and amount > 10000:
+            fraud_score += 0.15
+            reasons.append("Large amount to new counterparty")
+        if shared >= 3:
+            fraud_score += 0.25
+            reasons.append("Sender and receiver share counterparties")
+    return {'is_fraud': fraud_score > 0.5, 'fraud_probability': min(fraud_score, 1.0), 'reasons': reasons}
+
+
+class RuleEngineTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.engine = RuleEngine(check_interval=0)
+
+    def write_rules(self, rules, name='rules.json'):
+        path = Path(self.tmpdir.name) / name
+        path.write_text(json.dumps({'version': 2, 'rules': rules}))
+        return path
+
+    def strip(self, result):
+        return {key: result[key] for key in ('is_fraud', 'fraud_probability', 'reasons')}
+
+    def test_default_rule_set_matches_legacy_rules(self):
+        rng = np.random.default_rng(4)
+        transactions = random_transactions(3000, seed=4)
+        for index, transaction in enumerate(transactions):
+            if index % 5 == 0:
+                transaction.amount = Decimal(int(rng.integers(1, 80)) * 1000)
+            if index % 7 == 0:
+                transaction.receiver_upi = transaction.sender_upi
+        graph = np.column_stack([
+            rng.integers(0, 2, 3000), rng.integers(0, 15, 3000), rng.integers(0, 30, 3000), rng.integers(0, 5, 3000),
+        ]).astype(np.float64)
+
+        for rows in (None, graph):
+            expected = [
+                legacy_rule_based_detection(t, None if rows is None else rows[i]) for i, t in enumerate(transactions)
+            ]
+            single = [
+                self.strip(self.engine.evaluate(t, None if rows is None else rows[i])) for i, t in enumerate(transactions)
+            ]
+            batch = [self.strip(result) for result in self.engine.evaluate_batch(transactions, rows)]
+            self.assertEqual(single, expected)
+            self.assertEqual(batch, expected)
+
+    def test_counters(self):
+        transactions = random_transactions(100, seed=5)
+        self.engine.evaluate_batch(transactions)
+        for transaction in transactions:
+            self.engine.evaluate(transaction)
+        stats = self.engine.status()['rules']
+        expected_hits = sum('High transaction amount' in legacy_rule_based_detection(t)['reasons'] for t in transactions)
+        self.assertEqual(stats['high_amount']['hits'], 2 * expected_hits)
+        self.assertEqual(stats['high_amount']['evaluations'], 200)
+        self.assertEqual(stats['sender_fan_out']['evaluations'], 0)
+
+    def test_stop_and_short_circuit(self):
+        path = self.write_rules([
+            {'name': 'self', 'reason': 'Self', 'weight': 0.9, 'stop': True,
+             'when': {'field': 'sender_upi', 'op': '==', 'other': 'receiver_upi'}},
+            {'name': 'big', 'reason': 'Big', 'weight': 0.1,
+             'when': {'all': [{'field': 'amount', 'op': '>', 'value': 100}, {'not': {'field': 'location', 'op': 'missing'}}]}},
+        ])
+        engine = RuleEngine(path=path, check_interval=0)
+        transactions = random_transactions(50, seed=6)
+        for transaction in transactions[::2]:
+            transaction.receiver_upi = transaction.sender_upi
+        batch = engine.evaluate_batch(transactions)
+        single = [engine.evaluate(t) for t in transactions]
+        self.assertEqual([self.strip(r) for r in batch], [self.strip(r) for r in single])
+        self.assertTrue(all(r['reasons'] == ['Self'] for r in batch[::2]))
+        self.assertEqual(engine.status()['rules']['big']['evaluations'], 2 * 25)
+
+    def test_hot_reload_keeps_last_good_rule_set(self):
+        rule = {'name': 'any_amount', 'reason': 'Amount', 'weight': 0.6, 'when': {'field': 'amount', 'op': '>', 'value': 0}}
+        path = self.write_rules([rule])
+        engine = RuleEngine(path=path, check_interval=0)
+        transaction = random_transactions(1, seed=7)[0]
+        self.assertTrue(engine.evaluate(transaction)['is_fraud'])
+
+        rule['weight'] = 0.2
+        path.write_text(json.dumps({'version': 3, 'rules': [rule], 'padding': ' ' * 10}))
+        self.assertFalse(engine.evaluate(transaction)['is_fraud'])
+        self.assertEqual(engine.status()['version'], 3)
+
+        path.write_text('{"rules": [{"name": "broken"}]}')
+        self.assertFalse(engine.evaluate(transaction)['is_fraud'])
+        self.assertEqual(engine.load_count, 2)
+
+    def test_invalid_rule_sets(self):
+        for spec in (
+            {},
+            {'rules': [{'name': 'a', 'reason': 'A', 'weight': 1, 'when': {'field': 'nope', 'op': '>', 'value': 1}}]},
+            {'rules': [{'name': 'a', 'reason': 'A', 'weight': 1, 'when': {'field': 'amount', 'op': '~', 'value': 1}}]},
+            {'rules': [{'name': 'a', 'reason': 'A', 'weight': 1, 'when': {'any': []}}]},
+            {'rules': [{'name': 'a', 'reason': 'A', 'weight': 'x', 'when': {'field': 'amount', 'op': 'present'}}]},
+        ):
+            with self.subTest(spec=spec), self.assertRaises(RuleSetError):
+                RuleSet(spec)
+
+
+class CountingModel:
+    """
+    Stand-in CNN that records how many rows it scored
+    """
+    is_loaded = True
+
+    def __init__(self, probability=0.9):
+        self.probability = probability
+        self.calls = []
+
+    def predict(self, X):
+        self.calls.append(len(X))
+        return np.full((len(X), 1), self.probability, dtype=np.float32)
+
+
+def save_linear_model(path):
+    """
+    Write a NumPy runtime artifact whose probability rises with the amount
+    """
+    kernel = np.zeros((64, 1))
+    kernel[0, 0] = 10.0
+    ops = [{'op': 'flatten'}, {'op': 'dense', 'kernel': kernel, 'bias': np.array([-2.0]), 'activation': 'sigmoid'}]
+    save_artifact(ops, np.zeros(64), np.ones(64), (8, 8, 1), path)
+
+
+@override_settings(FRAUD_CASCADE_ENABLED=True, FRAUD_CASCADE_CLEAR_BELOW=0.2, FRAUD_CASCADE_FLAG_AT=0.75)
+class CascadeTests(TestCase):
+    def setUp(self):
+        self.detector = FraudDetector.__new__(FraudDetector)
+        self.detector.model = CountingModel()
+        self.detector.batcher = None
+        noon = datetime(2024, 6, 3, 12, tzinfo=dt_timezone.utc)
+        self.clear = Transaction(sender_upi='a@upi', receiver_upi='b@upi', amount=Decimal('250.00'),
+                                 device_id='d1', location='Pune', created_at=noon)
+        self.flag = Transaction(sender_upi='a@upi', receiver_upi='a@upi', amount=Decimal('250.00'),
+                                device_id=None, location='Pune', created_at=noon)
+        self.ambiguous = Transaction(sender_upi='a@upi', receiver_upi='c@upi', amount=Decimal('250.00'),
+                                     device_id='d1', location=None, created_at=noon)
+
+    def test_predict_only_forwards_ambiguous_band(self):
+        forwarded_before = decision_counters[FORWARDED].value
+        cleared = self.detector.predict(self.clear)
+        flagged = self.detector.predict(self.flag)
+        self.assertEqual(self.detector.model.calls, [])
+        self.assertEqual((cleared['cascade'], cleared['is_fraud'], cleared['detection_method']), (CLEARED, False, 'rule_based'))
+        self.assertEqual((flagged['cascade'], flagged['is_fraud']), (FLAGGED, True))
+
+        forwarded = self.detector.predict(self.ambiguous)
+        self.assertEqual(self.detector.model.calls, [1])
+        self.assertEqual(forwarded['detection_method'], 'cnn_model')
+        self.assertEqual((forwarded['cascade'], forwarded['rule_probability']), (FORWARDED, 0.25))
+        self.assertEqual(decision_counters[FORWARDED].value, forwarded_before + 1)
+
+    def test_batch_scores_forwarded_rows_in_one_call(self):
+        batch = [self.clear, self.ambiguous, self.flag, self.ambiguous]
+        results = self.detector.predict_batch(batch)
+        self.assertEqual(self.detector.model.calls, [2])
+        self.assertEqual([r['detection_method'] for r in results], ['rule_based', 'cnn_model', 'rule_based', 'cnn_model'])
+        self.assertEqual([r['is_fraud'] for r in results], [False, True, True, True])
+
+    def test_disabled_cascade_scores_everything(self):
+        with override_settings(FRAUD_CASCADE_ENABLED=False):
+            results = self.detector.predict_batch([self.clear, self.flag])
+        self.assertEqual(self.detector.model.calls, [2])
+        self.assertNotIn('cascade', results[0])
+
+    def test_evaluate(self):
+        labels = [True, True, False, False, True]
+        rules = [0.0, 0.8, 0.0, 0.5, 0.5]
+        cnn = [0.9, 0.2, 0.1, 0.7, 0.9]
+        result = evaluate_cascade(labels, rules, cnn, clear_below=0.2, flag_at=0.75)
+        self.assertEqual((result['cleared'], result['flagged_by_rules'], result['forwarded']), (2, 1, 2))
+        self.assertEqual(result['cnn_only']['recall'], 2 / 3)
+        self.assertEqual(result['cascade']['recall'], 2 / 3)
+        self.assertEqual(result['cascade']['precision'], 2 / 3)
+        self.assertEqual(result['missed_by_cascade'], 1)
+
+    def test_evaluate_command(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        model_path = Path(tmpdir.name) / 'model.npz'
+        save_linear_model(model_path)
+        dataset = Path(tmpdir.name) / 'labelled.csv'
+        lines = ['sender_upi,receiver_upi,amount,device_id,location,created_at,is_fraud']
+        for i in range(40):
+            lines.append(f"s{i}@upi,r{i}@upi,{1000 * (i + 1)},{'d' if i % 3 else ''},Pune,2024-06-03T{i % 24:02d}:00:00Z,{int(i > 25)}")
+        dataset.write_text('\n'.join(lines))
+        output = Path(tmpdir.name) / 'results.json'
+
+        with override_settings(ML_INFERENCE_BACKEND='numpy', ML_NUMPY_MODEL_PATH=model_path):
+            call_command('evaluate_cascade', str(dataset), '--clear-below', '0.1', '0.3',
+                         '--json', str(output), stdout=io.StringIO())
+        report = json.loads(output.read_text())
+        self.assertEqual(report['rows'], 40)
+        self.assertEqual([r['clear_below'] for r in report['results']], [0.1, 0.3])
+        for result in report['results']:
+            self.assertEqual(result['cleared'] + result['flagged_by_rules'] + result['forwarded'], 40)
+            self.assertEqual(result['cnn_only']['recall'], 1.0)
+
+
+class BrokenModel:
+    is_loaded = True
+
+    def predict(self, X):
+        raise RuntimeError('model failure')
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.detector = FraudDetector.__new__(FraudDetector)
+        self.detector.model = None
+        self.detector.batcher = None
+        self.transactions = random_transactions(3, seed=5)
+
+    def test_render_prometheus(self):
+        h = histogram('test_render_seconds', (0.1, 1.0), 'Test span')
+        h.reset()
+        h.observe(0.05)
+        with h.time():
+            pass
+        h.observe(2.0)
+        c = counter('test_render_total', 'Test counter', {'kind': 'a'})
+        c.reset()
+        c.inc(3)
+
+        text = render_prometheus()
+        self.assertIn('# TYPE test_render_seconds histogram\n', text)
+        self.assertIn('test_render_seconds_bucket{le="0.1"} 2\n', text)
+        self.assertIn('test_render_seconds_bucket{le="1.0"} 2\n', text)
+        self.assertIn('test_render_seconds_bucket{le="+Inf"} 3\n', text)
+        self.assertIn('test_render_seconds_count 3\n', text)
+        self.assertIn('# TYPE test_render_total counter\n', text)
+        self.assertIn('test_render_total{kind="a"} 3\n', text)
+
+    def test_counters_are_shared_by_name_and_labels(self):
+        self.assertIs(counter('test_shared_total', labels={'a': '1'}), counter('test_shared_total', labels={'a': '1'}))
+        self.assertIsNot(counter('test_shared_total', labels={'a': '1'}), counter('test_shared_total', labels={'a': '2'}))
+
+    def test_rule_fallbacks_are_counted(self):
+        unavailable = fallback_counters['model_unavailable'].value
+        errors = fallback_counters['error'].value
+        rule_based = prediction_counters['rule_based'].value
+
+        self.detector.predict(self.transactions[0])
+        self.detector.predict_batch(self.transactions)
+        self.assertEqual(fallback_counters['model_unavailable'].value, unavailable + 4)
+
+        self.detector.model = BrokenModel()
+        with self.assertLogs('ml_model.fraud_detector', 'ERROR'):
+            result = self.detector.predict(self.transactions[0])
+        self.assertEqual(result['detection_method'], 'rule_based')
+        self.assertEqual(fallback_counters['error'].value, errors + 1)
+        self.assertEqual(prediction_counters['rule_based'].value, rule_based + 5)
+
+    def test_cnn_predictions_time_feature_extraction(self):
+        self.detector.model = CountingModel()
+        self.detector.model_version = 'v1'
+        count = feature_histogram.snapshot()['count']
+        cnn = prediction_counters['cnn_model'].value
+        self.detector.predict(self.transactions[0])
+        self.detector.predict_batch(self.transactions)
+        self.assertEqual(feature_histogram.snapshot()['count'], count + 2)
+        self.assertEqual(prediction_counters['cnn_model'].value, cnn + 4)
+
+    def test_metrics_endpoint(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE ml_predictions_total counter', response.content.decode())
+        self.assertIn('ml_feature_extraction_seconds_bucket', response.content.decode())
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+
+class StreamingTrainingTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def collect(self, chunks):
+        parts = list(chunks())
+        return np.concatenate([X for X, _ in parts]), np.concatenate([y for _, y in parts])
+
+    def test_queryset_chunks_match_full_matrix(self):
+        user = User.objects.create_user(username='training')
+        transactions = random_transactions(95, seed=4, user=user)
+        for i, transaction in enumerate(transactions):
+            transaction.is_fraud = i % 7 == 0
+        Transaction.objects.bulk_create(transactions)
+        saved = Transaction.objects.order_by('pk')
+
+        for workers in (1, 2):
+            chunks = training.queryset_chunks(Transaction.objects.all(), chunk_size=20, workers=workers)
+            self.assertEqual([len(y) for _, y in chunks()], [20, 20, 20, 20, 15])
+            X, y = self.collect(chunks)
+            self.assertEqual(X.tobytes(), build_feature_matrix(saved).tobytes())
+            self.assertEqual(y.tolist(), [float(t.is_fraud) for t in saved])
+
+    def test_npy_shards(self):
+        X, y = self.collect(training.synthetic_chunks(250, chunk_size=100))
+        for shard, start in enumerate((0, 120)):
+            np.save(Path(self.tmpdir.name) / f'features-{shard:05d}.npy', X[start:start + 120].reshape(-1, 64))
+            np.save(Path(self.tmpdir.name) / f'labels-{shard:05d}.npy', y[start:start + 120])
+
+        chunks = training.npy_shard_chunks(str(Path(self.tmpdir.name) / 'features-*.npy'), chunk_size=50)
+        shard_X, shard_y = self.collect(chunks)
+        self.assertEqual(shard_X.shape, (240, 8, 8, 1))
+        self.assertEqual(shard_X.tobytes(), X[:240].tobytes())
+        self.assertEqual(shard_y.tolist(), y[:240].tolist())
+
+        with self.assertRaises(FileNotFoundError):
+            training.npy_shard_chunks(str(Path(self.tmpdir.name) / 'missing-*.npy'))
+
+    def test_incremental_scaler_matches_full_fit(self):
+        chunks = training.synthetic_chunks(1000, chunk_size=128)
+        X, _ = self.collect(chunks)
+        scaler, rows = training.fit_scaler(chunks)
+        reference = StandardScaler().fit(X.reshape(len(X), -1))
+        self.assertEqual(rows, 1000)
+        np.testing.assert_allclose(scaler.mean_, reference.mean_, rtol=1e-6, atol=1e-6)
+        np.testing.assert_allclose(scaler.scale_, reference.scale_, rtol=1e-5)
+
+    def test_split_and_rebatch(self):
+        chunks = training.synthetic_chunks(1000, chunk_size=128)
+        train, validation = training.split_chunks(chunks, validation_every=10)
+        self.assertEqual(sum(len(y) for _, y in train()), 900)
+        self.assertEqual(sum(len(y) for _, y in validation()), 100)
+
+        scaler, _ = training.fit_scaler(train)
+        batches = list(training.scaled_batches(train, scaler, batch_size=64))
+        self.assertEqual([len(y) for _, y in batches], [64] * 14 + [4])
+        X = np.concatenate([X for X, _ in batches]).reshape(900, -1)
+        np.testing.assert_allclose(X.mean(axis=0), 0, atol=1e-5)
+
+    def test_shuffle_buffer(self):
+        chunks = training.synthetic_chunks(1000, chunk_size=128)
+        scaler, _ = training.fit_scaler(chunks)
+
+        def rows(**shuffle):
+            batches = list(training.scaled_batches(chunks, scaler, 64, **shuffle))
+            X = np.concatenate([X for X, _ in batches]).reshape(-1, 64)
+            return [len(y) for _, y in batches], np.column_stack([X, np.concatenate([y for _, y in batches])])
+
+        sizes, plain = rows()
+        shuffled_sizes, shuffled = rows(shuffle_buffer=300, seed=1)
+        self.assertEqual(shuffled_sizes, sizes)
+        self.assertEqual(shuffled.tobytes(), rows(shuffle_buffer=300, seed=1)[1].tobytes())
+        self.assertNotEqual(shuffled.tobytes(), rows(shuffle_buffer=300, seed=2)[1].tobytes())
+        self.assertNotEqual(shuffled.tobytes(), plain.tobytes())
+        # Rows keep their labels and only move within their block of three chunks
+        for start, stop in ((0, 384), (384, 768), (768, 1000)):
+            block, reference = shuffled[start:stop], plain[start:stop]
+            np.testing.assert_array_equal(block[np.argsort(block[:, 0])], reference[np.argsort(reference[:, 0])])
+
+    @override_settings(BEHAVIOUR_FEATURES_ENABLED=True, GRAPH_FEATURES_ENABLED=True)
+    def test_queryset_chunks_replay_history_point_in_time(self):
+        user = User.objects.create_user(username='training')
+        start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=user, sender_upi=f's{i % 3}@upi', receiver_upi=f'r{i % 5}@upi', amount=Decimal(100 + i),
+                device_id='device-1', location='Pune', created_at=start + timedelta(minutes=10 * i),
+                is_fraud=i % 4 == 0,
+            )
+            for i in range(45)
+        ])
+        saved = list(Transaction.objects.order_by('pk'))
+        expected = build_feature_matrix(saved, *FeatureReplay().inputs(saved))
+
+        for workers in (1, 2):
+            chunks = training.queryset_chunks(Transaction.objects.all(), chunk_size=10, workers=workers)
+            X, _ = self.collect(chunks)
+            self.assertEqual(X.tobytes(), expected.tobytes())
+
+        flat = X.reshape(45, -1)
+        # s0 paid at minutes 0 and 30: each row sees only itself and its past
+        self.assertAlmostEqual(float(flat[0, BEHAVIOUR_OFFSET]), 1 / 100.0, places=6)
+        self.assertAlmostEqual(float(flat[3, BEHAVIOUR_OFFSET]), 2 / 100.0, places=6)
+        self.assertEqual(flat[0, GRAPH_OFFSET], 1.0)
+        self.assertEqual(flat[15, GRAPH_OFFSET], 0.0)
+        # Neither the feature store nor the process graph is touched
+        self.assertFalse(SenderBehaviour.objects.exists())
+
+    @unittest.skipUnless(importlib.util.find_spec('tensorflow'), 'TensorFlow is not installed')
+    def test_train_streaming(self):
+        from .cnn_model import FraudDetectionCNN
+
+        cnn = FraudDetectionCNN()
+        history = cnn.train_streaming(
+            training.synthetic_chunks(300, chunk_size=100), epochs=1, batch_size=64,
+            checkpoint_path=str(Path(self.tmpdir.name) / 'best.h5'),
+        )
+        self.assertEqual(len(history.history['loss']), 1)
+        self.assertEqual(cnn.scaler.n_samples_seen_, 270)
+        self.assertEqual(cnn.predict(np.zeros((2, 8, 8, 1), dtype=np.float32)).shape, (2, 1))
+
+
+@override_settings(ML_PREDICTION_CACHE_ENABLED=True)
+class PredictionCacheTests(TestCase):
+    def setUp(self):
+        prediction_cache.invalidate()
+        self.addCleanup(prediction_cache.invalidate)
+        self.detector = FraudDetector.__new__(FraudDetector)
+        self.detector.model = CountingModel()
+        self.detector.model_version = 'v1'
+        self.detector.batcher = None
+        self.transactions = random_transactions(6, seed=3)
+
+    def test_repeat_predictions_skip_the_model(self):
+        first = self.detector.predict(self.transactions[0])
+        second = self.detector.predict(self.transactions[0])
+        self.assertEqual(self.detector.model.calls, [1])
+        self.assertEqual(first['fraud_probability'], second['fraud_probability'])
+
+    def test_batch_scores_only_misses(self):
+        self.detector.predict_batch(self.transactions[:4])
+        results = self.detector.predict_batch(self.transactions)
+        self.assertEqual(self.detector.model.calls, [4, 2])
+        self.assertEqual(len(results), 6)
+
+    def test_key_depends_on_features_and_version(self):
+        features = self.detector.extract_features(self.transactions[0])[0]
+        other = self.detector.extract_features(self.transactions[1])[0]
+        self.assertEqual(feature_key(features, 'v1'), feature_key(features.copy(), 'v1'))
+        self.assertNotEqual(feature_key(features, 'v1'), feature_key(features, 'v2'))
+        self.assertNotEqual(feature_key(features, 'v1'), feature_key(other, 'v1'))
+
+    def test_lru_eviction_and_ttl(self):
+        cache = PredictionCache(max_entries=2, ttl=60, backend='')
+        evictions = cache_evictions.value
+        cache.set_many({'a': 0.1, 'b': 0.2})
+        cache.get_many(['a'])
+        cache.set_many({'c': 0.3})
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': 0.1, 'c': 0.3})
+        self.assertEqual(cache_evictions.value, evictions + 1)
+
+        expired = PredictionCache(max_entries=2, ttl=0, backend='')
+        expired.set_many({'a': 0.1})
+        time.sleep(0.01)
+        self.assertEqual(expired.get_many(['a']), {})
+
+    def test_registry_reload_invalidates(self):
+        prediction_cache.set_many({'key': 0.5})
+        registry = DetectorRegistry(check_interval=0)
+        registry.get()
+        self.assertEqual(len(prediction_cache), 1)
+        registry.reload()
+        self.assertEqual(len(prediction_cache), 0)
+
+    def test_shared_django_cache_backend(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tmpdir.name}
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                                       'predictions': backend},
+                               ML_PREDICTION_CACHE_BACKEND='predictions'):
+            self.detector.predict_batch(self.transactions)
+            # A second worker with its own detector reuses the first one's results
+            other = FraudDetector.__new__(FraudDetector)
+            other.model = CountingModel()
+            other.model_version = 'v1'
+            other.batcher = None
+            other.predict_batch(self.transactions)
+        self.assertEqual(self.detector.model.calls, [6])
+        self.assertEqual(other.model.calls, [])
+        self.assertEqual(len(prediction_cache), 0)
+
+
+class FeatureSnapshotTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name) / 'snapshot'
+        self.user = User.objects.create_user(username='snapshot')
+
+    def save(self, count, seed):
+        transactions = random_transactions(count, seed=seed, user=self.user)
+        for i, transaction in enumerate(transactions):
+            transaction.is_fraud = i % 5 == 0
+        Transaction.objects.bulk_create(transactions)
+
+    def test_export_and_append(self):
+        self.save(70, seed=5)
+        self.assertEqual(export_snapshot(self.path, chunk_size=16, segment_rows=30), 70)
+        self.assertEqual(export_snapshot(self.path, chunk_size=16), 0)
+        self.save(12, seed=6)
+        self.assertEqual(export_snapshot(self.path, chunk_size=16, segment_rows=30), 12)
+
+        snapshot = FeatureSnapshot(self.path)
+        saved = Transaction.objects.order_by('pk')
+        self.assertEqual(len(snapshot), 82)
+        self.assertEqual(snapshot.last_id, saved.last().pk)
+        self.assertEqual([len(ids) for _, _, ids in snapshot.segments()], [30, 30, 10, 12])
+
+        features, labels, ids = (np.concatenate(parts) for parts in zip(*snapshot.segments()))
+        self.assertEqual(features.tobytes(), build_feature_matrix(saved).tobytes())
+        self.assertEqual(labels.tolist(), [int(t.is_fraud) for t in saved])
+        self.assertEqual(ids.tolist(), [t.pk for t in saved])
+
+    def test_chunks_are_memory_mapped_views(self):
+        self.save(40, seed=7)
+        export_snapshot(self.path)
+        snapshot = FeatureSnapshot(self.path)
+        features, labels, _ = next(snapshot.iter_chunks(chunk_size=25))
+        self.assertEqual(features.shape, (25, 8, 8, 1))
+        self.assertIsInstance(features.base, np.memmap)
+
+        chunks = snapshot.chunks(chunk_size=25)
+        self.assertEqual(sum(len(y) for _, y in chunks()), 40)
+        scaler, rows = training.fit_scaler(chunks)
+        self.assertEqual(rows, 40)
+
+    def test_score_uses_detector(self):
+        self.save(10, seed=8)
+        export_snapshot(self.path)
+        detector = FraudDetector.__new__(FraudDetector)
+        detector.model = CountingModel(probability=0.3)
+        detector.batcher = None
+        scored = list(FeatureSnapshot(self.path).score(detector, chunk_size=4))
+        self.assertEqual(detector.model.calls, [4, 4, 2])
+        self.assertEqual(np.concatenate([ids for ids, _ in scored]).tolist(),
+                         list(Transaction.objects.order_by('pk').values_list('pk', flat=True)))
+        np.testing.assert_allclose(np.concatenate([p for _, p in scored]), 0.3)
+
+    @override_settings(BEHAVIOUR_FEATURES_ENABLED=True, GRAPH_FEATURES_ENABLED=True)
+    def test_append_replays_exported_history(self):
+        self.save(50, seed=9)
+        export_snapshot(self.path, chunk_size=16)
+        self.save(20, seed=10)
+        export_snapshot(self.path, chunk_size=16)
+
+        saved = list(Transaction.objects.order_by('pk'))
+        replay = FeatureReplay()
+        expected = np.concatenate([
+            build_feature_matrix(part, *replay.inputs(part)) for part in (saved[:50], saved[50:])
+        ]).reshape(-1, 64)
+        snapshot = FeatureSnapshot(self.path)
+        features = np.concatenate([features for features, _, _ in snapshot.segments()])
+        self.assertEqual(features.tobytes(), expected.tobytes())
+        self.assertEqual(snapshot.feature_groups, {'behaviour': True, 'graph': True})
+
+        with override_settings(GRAPH_FEATURES_ENABLED=False):
+            with self.assertRaises(SnapshotError):
+                export_snapshot(self.path)
+            # A model trained on this snapshot would be served inputs it never saw
+            with self.assertRaisesMessage(CommandError, 'do not match the served features'):
+                call_command('train_model', '--source', 'snapshot', '--snapshot', str(self.path))
+
+    def test_rejects_missing_or_incompatible_snapshot(self):
+        with self.assertRaises(SnapshotError):
+            FeatureSnapshot(self.path)
+        self.path.mkdir()
+        (self.path / 'manifest.json').write_text(json.dumps({'format_version': 99}))
+        with self.assertRaises(SnapshotError):
+            export_snapshot(self.path)
+
+
+@unittest.skipUnless(importlib.util.find_spec('tensorflow'), 'TensorFlow is not installed')
+class NumpyRuntimeTests(SimpleTestCase):
+    def test_matches_keras_outputs(self):
+        from .cnn_model import FraudDetectionCNN
+
+        rng = np.random.default_rng(7)
+        cnn = FraudDetectionCNN()
+        cnn.build_model()
+        # Give BatchNormalization non-trivial statistics so folding is exercised
+        for layer in cnn.model.layers:
+            if layer.__class__.__name__ == 'BatchNormalization':
+                gamma, beta, mean, var = layer.get_weights()
+                layer.set_weights([
+                    rng.uniform(-1.5, 1.5, gamma.shape), rng.normal(size=beta.shape),
+                    rng.normal(size=mean.shape), rng.uniform(0.5, 2.0, var.shape),
+                ])
+        X = rng.normal(size=(64, 8, 8, 1)).astype(np.float32) * 3 + 1
+        cnn.scaler.fit(X.reshape(len(X), -1))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'model.npz')
+            export_numpy_model(cnn, path)
+            runtime = NumpyFraudModel.load(path)
+
+        expected = cnn.predict(X)
+        actual = runtime.predict(X)
+        self.assertEqual(actual.shape, expected.shape)
+        np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-5)
+
+    def test_numpy_backend_does_not_import_tensorflow(self):
+        script = (
+            "import sys, django; django.setup(); "
+            "import transactions.views; "
+            "from ml_model.registry import get_detector; get_detector(); "
+            "sys.exit(1 if 'tensorflow' in sys.modules else 0)"
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='upi_fraud_detection.settings',
+                   ML_INFERENCE_BACKEND='numpy')
+        result = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(result.returncode, 0, result.stderr.decode())
@@ -0,0 +1,353 @@
+"""
+Streaming Training - feed FraudDetectionCNN from sources larger than memory
+
+Training data is read as a sequence of (features, labels) chunks, each of
+shape (n, 8, 8, 1) / (n,). A chunk source is a zero-argument callable that
+returns a fresh iterator, because training walks the data once to fit the
+scaler and once per epoch. Sources:
+
+    queryset_chunks   Transactions read by primary-key range from the database
+    npy_shard_chunks  Pairs of features/labels .npy shards, memory-mapped
+    parquet_shard_chunks  Parquet shards of raw transaction columns
+    synthetic_chunks  The synthetic data of create_synthetic_data, generated lazily
+
+Only a bounded number of chunks is held at once, so memory depends on the
+chunk size and prefetch depth, not on the number of rows.
+
+The db and parquet sources fill the behavioural and graph slots when
+BEHAVIOUR_FEATURES_ENABLED / GRAPH_FEATURES_ENABLED are set, replaying the
+rows point-in-time (see replay.py), so a model is trained on the inputs it
+will be served. Rows must then be in time order: the database is read in
+primary-key order and Parquet shards in file name order.
+
+Chunks are read in a fixed order, which split_chunks relies on; make_dataset
+shuffles rows within a bounded buffer instead.
+"""
+import glob
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from .features import FEATURE_COUNT, FEATURE_FIELDS, INPUT_SHAPE, build_feature_matrix
+
+
+LABEL_FIELD = 'is_fraud'
+
+
+def _feature_chunk(columns):
+    labels = np.asarray(columns.pop(LABEL_FIELD), dtype=np.float32)
+    behaviour, graph = columns.pop('behaviour', None), columns.pop('graph', None)
+    return build_feature_matrix(columns, behaviour, graph), labels
+
+
+def with_history(columns, replay=None):
+    """
+    Attach point-in-time behavioural and graph inputs to a stream of column chunks
+
+    The replay is stateful, so it runs here in the reading process, in stream
+    order; the cheap per-row features are still built by the workers.
+
+    Args:
+        columns: Iterable of column dicts in time order
+        replay: FeatureReplay to advance (a fresh one by default)
+
+    Yields:
+        Each chunk, with 'behaviour' and 'graph' arrays when enabled
+    """
+    from .replay import FeatureReplay
+
+    replay = replay if replay is not None else FeatureReplay()
+    for chunk in columns:
+        if replay.enabled:
+            chunk['behaviour'], chunk['graph'] = replay.inputs(chunk)
+        yield chunk
+
+
+def parallel_map(fn, items, workers=1, prefetch=2):
+    """
+    Ordered map that keeps at most workers + prefetch items in flight
+
+    Args:
+        fn: Picklable function applied to each item
+        items: Iterable of inputs, consumed lazily
+        workers: Worker processes; 1 runs fn inline
+        prefetch: Extra items submitted ahead of the one being consumed
+
+    Yields:
+        fn(item) for each item, in input order
+    """
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= workers + prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def queryset_columns_by_pk(queryset, chunk_size, include_pk=False):
+    """
+    Read the feature fields and label of a Transaction queryset in pk order
+
+    Each chunk is one keyset query (pk > last pk), so the cost per chunk does
+    not grow with the offset and no server-side cursor is held open.
+
+    Args:
+        queryset: Transaction queryset
+        chunk_size: Rows per query
+        include_pk: Also return a 'pk' column
+
+    Yields:
+        dict of columns per chunk, including LABEL_FIELD
+    """
+    fields = FEATURE_FIELDS + (LABEL_FIELD,)
+    last_pk = None
+    while True:
+        rows = queryset.order_by('pk')
+        if last_pk is not None:
+            rows = rows.filter(pk__gt=last_pk)
+        rows = list(rows.values_list('pk', *fields)[:chunk_size])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        columns = list(zip(*rows))
+        chunk = dict(zip(fields, map(list, columns[1:])))
+        if include_pk:
+            chunk['pk'] = list(columns[0])
+        yield chunk
+
+
+def queryset_chunks(queryset, chunk_size=10000, workers=1, prefetch=2):
+    """
+    Chunk source over labelled transactions in the database
+
+    Args:
+        queryset: Transaction queryset; is_fraud is used as the label
+        chunk_size: Rows per database query and per chunk
+        workers: Processes building feature matrices in parallel
+        prefetch: Chunks read ahead of the one being trained on
+    """
+    def chunks():
+        columns = with_history(queryset_columns_by_pk(queryset, chunk_size))
+        return parallel_map(_feature_chunk, columns, workers, prefetch)
+    return chunks
+
+
+def shard_pairs(pattern):
+    """
+    Match features shards with their labels shards
+
+    Features shards are named '*features*.npy' and labels shards the same
+    with 'features' replaced by 'labels', e.g. features-00001.npy and
+    labels-00001.npy.
+    """
+    pairs = []
+    for path in sorted(glob.glob(pattern)):
+        pairs.append((path, path.replace('features', 'labels')))
+    if not pairs:
+        raise FileNotFoundError(f"No shards match {pattern}")
+    return pairs
+
+
+def npy_shard_chunks(pattern, chunk_size=10000):
+    """
+    Chunk source over precomputed feature shards
+
+    Shards are memory-mapped, so only the chunk being copied out is read.
+
+    Args:
+        pattern: Glob matching the features shards (see shard_pairs)
+        chunk_size: Rows per chunk
+    """
+    pairs = shard_pairs(pattern)
+
+    def chunks():
+        for features_path, labels_path in pairs:
+            features = np.load(features_path, mmap_mode='r')
+            labels = np.load(labels_path, mmap_mode='r')
+            if len(features) != len(labels):
+                raise ValueError(f"{features_path} and {labels_path} have different row counts")
+            for start in range(0, len(features), chunk_size):
+                X = np.asarray(features[start:start + chunk_size], dtype=np.float32)
+                yield X.reshape((-1,) + INPUT_SHAPE), np.asarray(labels[start:start + chunk_size], dtype=np.float32)
+    return chunks
+
+
+def _parquet_columns(path, chunk_size):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError('Reading Parquet shards requires pyarrow (pip install pyarrow)')
+
+    parquet = pq.ParquetFile(path)
+    for batch in parquet.iter_batches(batch_size=chunk_size, columns=list(FEATURE_FIELDS) + [LABEL_FIELD]):
+        yield batch.to_pydict()
+
+
+def parquet_shard_chunks(pattern, chunk_size=10000, workers=1, prefetch=2):
+    """
+    Chunk source over Parquet shards with the raw transaction columns
+
+    Each shard needs the FEATURE_FIELDS columns and is_fraud. Record batches
+    are streamed from each file, so shards may be larger than memory.
+    """
+    paths = sorted(glob.glob(pattern))
+    if not paths:
+        raise FileNotFoundError(f"No shards match {pattern}")
+
+    def columns():
+        for path in paths:
+            yield from _parquet_columns(path, chunk_size)
+
+    def chunks():
+        return parallel_map(_feature_chunk, with_history(columns()), workers, prefetch)
+    return chunks
+
+
+def synthetic_chunks(n_samples=10000, chunk_size=10000, seed=42):
+    """
+    Chunk source with the same distribution as create_synthetic_data
+    """
+    def chunks():
+        rng = np.random.default_rng(seed)
+        for start in range(0, n_samples, chunk_size):
+            n = min(chunk_size, n_samples - start)
+            X = rng.standard_normal((n, FEATURE_COUNT)).astype(np.float32)
+            y = (rng.random(n) < 0.1).astype(np.float32)
+            fraud = y == 1
+            X[fraud] += rng.standard_normal((int(fraud.sum()), FEATURE_COUNT)).astype(np.float32) * 2
+            yield X.reshape((-1,) + INPUT_SHAPE), y
+    return chunks
+
+
+def split_chunks(chunks, validation_every=10):
+    """
+    Split a chunk source into training and validation sources
+
+    Every validation_every-th row (by position in the stream) goes to
+    validation, so the split is deterministic and needs no shuffling.
+
+    Returns:
+        (train chunks, validation chunks)
+    """
+    def select(validation):
+        def selected():
+            seen = 0
+            for X, y in chunks():
+                mask = (np.arange(seen, seen + len(y)) % validation_every) == 0
+                seen += len(y)
+                if not validation:
+                    mask = ~mask
+                if mask.any():
+                    yield X[mask], y[mask]
+        return selected
+    return select(False), select(True)
+
+
+def fit_scaler(chunks, scaler=None):
+    """
+    Fit a StandardScaler with one pass of partial_fit over a chunk source
+
+    Returns:
+        (fitted scaler, number of rows seen)
+    """
+    scaler = scaler if scaler is not None else StandardScaler()
+    rows = 0
+    for X, _ in chunks():
+        scaler.partial_fit(X.reshape(len(X), -1))
+        rows += len(X)
+    if not rows:
+        raise ValueError('No training rows')
+    return scaler, rows
+
+
+def shuffled(chunks, buffer_rows, rng):
+    """
+    Shuffle the rows of a chunk source within blocks of at least buffer_rows rows
+
+    Chunks are collected until buffer_rows rows are held, then the block is
+    emitted in a random order. Rows never move further than one block, so
+    the buffer should cover the span over which the label mix drifts
+    (memory is about 256 bytes per buffered row).
+
+    Yields:
+        (X, y) blocks
+    """
+    pending, rows = [], 0
+
+    def block():
+        X = np.concatenate([X for X, _ in pending])
+        y = np.concatenate([y for _, y in pending])
+        order = rng.permutation(len(y))
+        return X[order], y[order]
+
+    for X, y in chunks():
+        pending.append((X, y))
+        rows += len(y)
+        if rows >= buffer_rows:
+            yield block()
+            pending, rows = [], 0
+    if pending:
+        yield block()
+
+
+def scaled_batches(chunks, scaler, batch_size, shuffle_buffer=0, seed=None):
+    """
+    Rebatch a chunk source into scaled (X, y) batches of batch_size rows
+
+    Args:
+        shuffle_buffer: Rows shuffled together (see shuffled); 0 keeps stream order
+        seed: Seed of the shuffle
+
+    Yields:
+        float32 (batch_size, 8, 8, 1) features and (batch_size,) labels; the
+        last batch may be smaller
+    """
+    mean = scaler.mean_.astype(np.float32)
+    scale = scaler.scale_.astype(np.float32)
+    blocks = shuffled(chunks, shuffle_buffer, np.random.default_rng(seed)) if shuffle_buffer else chunks()
+    carry_X, carry_y = None, None
+    for X, y in blocks:
+        X = ((X.reshape(len(X), -1) - mean) / scale).reshape(X.shape)
+        if carry_X is not None:
+            X, y = np.concatenate([carry_X, X]), np.concatenate([carry_y, y])
+        full = len(X) - len(X) % batch_size
+        for start in range(0, full, batch_size):
+            yield X[start:start + batch_size], y[start:start + batch_size]
+        carry_X, carry_y = (X[full:], y[full:]) if full < len(X) else (None, None)
+    if carry_X is not None:
+        yield carry_X, carry_y
+
+
+def make_dataset(chunks, scaler, batch_size=256, prefetch=None, shuffle_buffer=0, seed=None):
+    """
+    tf.data pipeline over a chunk source
+
+    The generator runs on a background thread, so reading and scaling the
+    next batches overlaps with the training step.
+
+    Args:
+        prefetch: Batches prepared ahead of the training step (None lets tf.data tune it)
+        shuffle_buffer: Rows shuffled together each epoch (0 keeps stream order)
+        seed: Seed of the first epoch's shuffle; each later epoch uses the next one
+    """
+    import tensorflow as tf
+
+    signature = (
+        tf.TensorSpec(shape=(None,) + INPUT_SHAPE, dtype=tf.float32),
+        tf.TensorSpec(shape=(None,), dtype=tf.float32),
+    )
+    # from_generator calls the lambda once per epoch
+    epochs = itertools.count()
+    first_seed = seed if seed is not None else int(np.random.default_rng().integers(2 ** 31))
+    dataset = tf.data.Dataset.from_generator(
+        lambda: scaled_batches(chunks, scaler, batch_size, shuffle_buffer, first_seed + next(epochs)),
+        output_signature=signature
+    )
+    return dataset.prefetch(tf.data.AUTOTUNE if prefetch is None else prefetch)
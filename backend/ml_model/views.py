@@ -1,8 +1,12 @@
+import hmac
+from django.conf import settings
+from django.http import HttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
-from .fraud_detector import FraudDetector
+from .metrics import render_prometheus
+from .registry import get_detector, get_registry
 from transactions.models import Transaction
 
 
@@ -33,7 +37,7 @@ class TestFraudDetectionView(APIView):
             )
         
         # Run fraud detection
-        detector = FraudDetector()
+        detector = get_detector()
         result = detector.predict(transaction)
         
         return Response(result, status=status.HTTP_200_OK)
@@ -46,10 +50,20 @@ class ModelStatusView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        detector = FraudDetector()
+        model_status = get_registry().status()
+        model_status['status'] = 'operational'
         
-        return Response({
-            'model_loaded': detector.model is not None and detector.model.model is not None,
-            'detection_method': 'cnn_model' if detector.model and detector.model.model else 'rule_based',
-            'status': 'operational'
-        })
+        return Response(model_status)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint with this process's histograms and counters
+
+    When METRICS_TOKEN is set, requests must send it as a bearer token.
+    """
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+            return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,11 +1,43 @@
 from django.contrib import admin
-from .models import Transaction
+from django.db import transaction as db_transaction
+from .models import Transaction, DailyTransactionStats, RescoreCheckpoint, RescoreResult
+from .rollups import record_transactions, remove_transactions
 
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ['transaction_id', 'user', 'amount', 'transaction_type', 'is_fraud', 'fraud_probability', 'created_at']
-    list_filter = ['is_fraud', 'transaction_type', 'created_at']
+    list_filter = ['is_fraud', 'scoring_status', 'transaction_type', 'created_at']
     search_fields = ['transaction_id', 'sender_upi', 'receiver_upi', 'user__username']
     readonly_fields = ['transaction_id', 'fraud_probability', 'fraud_details', 'created_at']
     date_hierarchy = 'created_at'
+
+    def save_model(self, request, obj, form, change):
+        # Admin edits to amount or is_fraud bypass the scoring paths, so move the rollups here
+        with db_transaction.atomic():
+            previous = Transaction.objects.select_for_update().get(pk=obj.pk) if change else None
+            super().save_model(request, obj, form, change)
+            if previous is not None:
+                remove_transactions([previous])
+            record_transactions([obj])
+
+
+@admin.register(DailyTransactionStats)
+class DailyTransactionStatsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'date', 'transaction_count', 'total_amount', 'fraud_count', 'fraud_amount']
+    list_filter = ['date']
+    search_fields = ['user__username']
+    date_hierarchy = 'date'
+
+
+@admin.register(RescoreCheckpoint)
+class RescoreCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['run', 'start_pk', 'end_pk', 'last_pk', 'rows', 'dry_run', 'finished', 'updated_at']
+    list_filter = ['run', 'dry_run', 'finished']
+
+
+@admin.register(RescoreResult)
+class RescoreResultAdmin(admin.ModelAdmin):
+    list_display = ['run', 'transaction', 'previous_probability', 'fraud_probability', 'previous_is_fraud', 'is_fraud']
+    list_filter = ['run', 'is_fraud', 'previous_is_fraud']
+    raw_id_fields = ['transaction']
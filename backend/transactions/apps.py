@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate
 
 
 class TransactionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'transactions'
+
+    def ready(self):
+        from .models import Transaction
+        from .rollups import backfill_daily_stats, transaction_deleted
+
+        # Rollups for deletes, and for installs upgraded from before the rollup table
+        post_delete.connect(transaction_deleted, sender=Transaction, dispatch_uid='rollups_transaction_deleted')
+        post_migrate.connect(backfill_daily_stats, sender=self, dispatch_uid='rollups_backfill')
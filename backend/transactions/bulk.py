@@ -0,0 +1,189 @@
+"""
+Bulk ingestion of transaction batches (JSON, JSON lines or CSV)
+"""
+import csv
+import io
+import itertools
+import json
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from ml_model.feature_store import feature_store
+from .models import Transaction, FraudAlert
+from .rollups import record_transactions
+from .scoring import alert_histogram, apply_fraud_result, build_fraud_alert, write_histogram
+from .serializers import TransactionCreateSerializer
+
+
+FORMATS = ('json', 'jsonl', 'csv')
+
+CONTENT_TYPE_FORMATS = {
+    'application/json': 'json',
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+    'application/x-jsonlines': 'jsonl',
+    'text/csv': 'csv',
+}
+
+
+class BulkIngestError(Exception):
+    """
+    Raised when a batch contains rows that cannot be ingested
+    """
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} invalid row(s)")
+        self.errors = errors
+
+
+def detect_format(content_type=None, filename=None):
+    """
+    Work out the batch format from a content type or file name
+    """
+    if content_type:
+        fmt = CONTENT_TYPE_FORMATS.get(content_type.split(';')[0].strip().lower())
+        if fmt:
+            return fmt
+    if filename:
+        extension = filename.rsplit('.', 1)[-1].lower()
+        if extension in ('jsonl', 'ndjson'):
+            return 'jsonl'
+        if extension in FORMATS:
+            return extension
+    return None
+
+
+def _clean_csv_row(row):
+    # Empty CSV cells mean "not provided" rather than an empty string
+    return {key: value for key, value in row.items() if key and value not in ('', None)}
+
+
+def iter_rows(lines, fmt):
+    """
+    Parse rows lazily from an iterable of text lines
+
+    Args:
+        lines: Iterable of str lines (e.g. an open file)
+        fmt: One of FORMATS
+
+    Yields:
+        (row_number, row) tuples, row_number starting at 1
+    """
+    if fmt == 'json':
+        data = json.loads(''.join(lines))
+        if isinstance(data, dict):
+            data = data.get('transactions', [])
+        if not isinstance(data, list):
+            raise BulkIngestError([{'row': None, 'errors': ['Expected a list of transactions.']}])
+        yield from enumerate(data, start=1)
+    elif fmt == 'jsonl':
+        number = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+    elif fmt == 'csv':
+        yield from enumerate((_clean_csv_row(row) for row in csv.DictReader(lines)), start=1)
+    else:
+        raise BulkIngestError([{'row': None, 'errors': [f"Unsupported format: {fmt}"]}])
+
+
+def parse_rows(text, fmt, limit=None):
+    """
+    Parse a whole batch held in memory
+
+    Args:
+        text: Batch body
+        fmt: One of FORMATS
+        limit: Stop after limit + 1 rows, enough to tell that a batch is too large
+
+    Returns:
+        list of (row_number, row) tuples
+    """
+    try:
+        rows = iter_rows(io.StringIO(text), fmt)
+        return list(rows if limit is None else itertools.islice(rows, limit + 1))
+    except ValueError:
+        raise BulkIngestError([{'row': None, 'errors': ['Malformed JSON document.']}])
+
+
+def validate_rows(numbered_rows):
+    """
+    Validate rows with TransactionCreateSerializer
+
+    Returns:
+        (validated_data list, errors list)
+    """
+    validated = []
+    errors = []
+    for number, row in numbered_rows:
+        if not isinstance(row, dict):
+            errors.append({'row': number, 'errors': ['Row is not a valid JSON object.']})
+            continue
+        serializer = TransactionCreateSerializer(data=row)
+        if serializer.is_valid():
+            validated.append(serializer.validated_data)
+        else:
+            errors.append({'row': number, 'errors': serializer.errors})
+    return validated, errors
+
+
+def ingest_rows(numbered_rows, user, detector, chunk_size=None, skip_invalid=False):
+    """
+    Validate, score and persist a batch of transactions
+
+    All rows are scored with one detector call, then written with bulk_create
+    in chunks of chunk_size, each chunk (transactions and their alerts) in its
+    own database transaction.
+
+    Args:
+        numbered_rows: Iterable of (row_number, row dict) tuples
+        user: Owner of the new transactions
+        detector: FraudDetector used to score the batch
+        chunk_size: Rows per bulk_create/DB transaction
+        skip_invalid: Drop invalid rows instead of rejecting the batch
+
+    Returns:
+        dict with created/fraud_detected counts and any skipped row errors
+    """
+    chunk_size = chunk_size or settings.BULK_INGEST_CHUNK_SIZE
+
+    validated, errors = validate_rows(numbered_rows)
+    if errors and not skip_invalid:
+        raise BulkIngestError(errors)
+
+    # Score before saving; created_at is needed for the time features
+    now = timezone.now()
+    transactions = [Transaction(user=user, created_at=now, **data) for data in validated]
+    results = detector.predict_batch(transactions)
+    for transaction, fraud_result in zip(transactions, results):
+        apply_fraud_result(transaction, fraud_result)
+
+    fraud_detected = 0
+    for start in range(0, len(transactions), chunk_size):
+        chunk = transactions[start:start + chunk_size]
+        chunk_results = results[start:start + chunk_size]
+        with db_transaction.atomic():
+            with write_histogram.time():
+                Transaction.objects.bulk_create(chunk)
+            record_transactions(chunk)
+            feature_store.record(chunk)
+            alerts = [
+                build_fraud_alert(transaction, fraud_result)
+                for transaction, fraud_result in zip(chunk, chunk_results)
+                if fraud_result['is_fraud']
+            ]
+            if alerts:
+                with alert_histogram.time():
+                    FraudAlert.objects.bulk_create(alerts)
+        fraud_detected += len(alerts)
+
+    return {
+        'created': len(transactions),
+        'fraud_detected': fraud_detected,
+        'errors': errors,
+    }
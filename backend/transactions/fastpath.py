@@ -0,0 +1,181 @@
+"""
+Read-only fast path for high-volume list endpoints.
+
+Instead of instantiating a ModelSerializer per row, rows are fetched with
+values() and turned into dicts by converters compiled once per request from
+the serializer's own field definitions. The JSON response is streamed row by
+row and is byte-identical to what the serializer plus JSONRenderer produce.
+"""
+import json
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != 'iso-8601' or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if not timezone.is_aware(value):
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _choice_converter(field):
+    choices = field.choice_strings_to_values
+
+    def convert(value):
+        if value == '':
+            return value
+        return choices.get(str(value), value)
+    return convert
+
+
+def compile_converter(field):
+    """
+    Return a function turning a raw values() column into the field's representation
+    """
+    if isinstance(field, PrimaryKeyRelatedField):
+        # values() already returns the related primary key
+        return None
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, serializers.ChoiceField):
+        return _choice_converter(field)
+    if isinstance(field, serializers.BooleanField):
+        return bool
+    if isinstance(field, serializers.IntegerField):
+        return int
+    if isinstance(field, serializers.FloatField):
+        return float
+    if isinstance(field, serializers.JSONField) and not field.binary:
+        return None
+    if type(field) in (serializers.CharField, serializers.IPAddressField, serializers.EmailField):
+        return str
+    return field.to_representation
+
+
+class ValuesSerializer:
+    """
+    Serializes values() rows the same way serializer_class serializes instances
+    """
+
+    def __init__(self, serializer_class, prefix=''):
+        self.plan = []
+        self.lookups = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ListSerializer):
+                raise ValueError(f"Field {name} cannot be read from values() rows")
+            if isinstance(field, serializers.BaseSerializer):
+                nested = ValuesSerializer(type(field), prefix=f"{prefix}{'__'.join(field.source_attrs)}__")
+                self.plan.append((name, None, nested.to_representation))
+                self.lookups.extend(nested.lookups)
+                continue
+            if isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+                raise ValueError(f"Field {name} cannot be read from values() rows")
+            lookup = prefix + '__'.join(field.source_attrs)
+            self.plan.append((name, lookup, compile_converter(field)))
+            self.lookups.append(lookup)
+        self.lookups = list(dict.fromkeys(self.lookups))
+
+    def to_representation(self, row):
+        data = {}
+        for name, lookup, convert in self.plan:
+            if lookup is None:
+                data[name] = convert(row)
+                continue
+            value = row[lookup]
+            if value is None or convert is None:
+                data[name] = value
+            else:
+                data[name] = convert(value)
+        return data
+
+
+class JSONFragmentRenderer:
+    """
+    Encodes JSON fragments with exactly the settings JSONRenderer uses
+    """
+
+    def __init__(self):
+        renderer = JSONRenderer()
+        self.options = {
+            'cls': renderer.encoder_class,
+            'ensure_ascii': renderer.ensure_ascii,
+            'allow_nan': not renderer.strict,
+            'separators': (',', ':') if renderer.compact else (', ', ': '),
+        }
+
+    def render(self, data):
+        ret = json.dumps(data, **self.options)
+        return ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+    def stream_list(self, rows):
+        """
+        Yield a JSON array one element at a time
+        """
+        yield b'['
+        for position, row in enumerate(rows):
+            yield (b',' if position else b'') + self.render(row)
+        yield b']'
+
+    def stream(self, envelope, results_key, rows):
+        """
+        Yield the JSON object for envelope with envelope[results_key] replaced by rows
+        """
+        yield b'{'
+        for index, (key, value) in enumerate(envelope.items()):
+            yield (b',' if index else b'') + self.render(key) + b':'
+            if key == results_key:
+                yield from self.stream_list(rows)
+            else:
+                yield self.render(value)
+        yield b'}'
+
+
+class FastListMixin:
+    """
+    List views using the values() fast path for JSON responses.
+
+    Enabled by FAST_LIST_SERIALIZATION; the browsable API, ?format=api and
+    indented JSON keep the regular serializer path.
+    """
+
+    def use_fast_list(self, request):
+        return (
+            settings.FAST_LIST_SERIALIZATION
+            and request.accepted_renderer.format == 'json'
+            and 'indent' not in request.accepted_media_type
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_list(request):
+            return super().list(request, *args, **kwargs)
+
+        values_serializer = ValuesSerializer(self.get_serializer_class())
+        queryset = self.filter_queryset(self.get_queryset()).values(*values_serializer.lookups)
+        renderer = JSONFragmentRenderer()
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            envelope = self.get_paginated_response([]).data
+            rows = (values_serializer.to_representation(row) for row in page)
+            content = renderer.stream(envelope, 'results', rows)
+        else:
+            rows = (values_serializer.to_representation(row) for row in queryset.iterator())
+            content = renderer.stream_list(rows)
+
+        return StreamingHttpResponse(content, content_type=request.accepted_renderer.media_type)
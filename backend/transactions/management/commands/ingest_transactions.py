@@ -0,0 +1,69 @@
+import itertools
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from transactions.bulk import FORMATS, BulkIngestError, detect_format, iter_rows, ingest_rows
+from ml_model.registry import get_detector
+
+
+class Command(BaseCommand):
+    help = 'Ingest a JSON, JSON lines or CSV file of transactions with batched fraud scoring'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to ingest')
+        parser.add_argument('--user', required=True, help='Username that will own the transactions')
+        parser.add_argument('--format', choices=FORMATS, help='Input format (defaults to the file extension)')
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Rows validated and scored together')
+        parser.add_argument('--chunk-size', type=int, default=settings.BULK_INGEST_CHUNK_SIZE,
+                            help='Rows per bulk_create/DB transaction')
+        parser.add_argument('--skip-invalid', action='store_true',
+                            help='Skip invalid rows instead of stopping at the first invalid batch')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        fmt = options['format'] or detect_format(filename=options['path'])
+        if fmt is None:
+            raise CommandError('Could not detect the file format; pass --format')
+
+        detector = get_detector()
+        created = fraud_detected = skipped = 0
+
+        with open(options['path'], encoding='utf-8', newline='') as f:
+            rows = iter_rows(f, fmt)
+            while True:
+                try:
+                    # iter_rows parses as it goes, so reading the batch can fail too
+                    batch = list(itertools.islice(rows, options['batch_size']))
+                    if not batch:
+                        break
+                    summary = ingest_rows(
+                        batch, user, detector,
+                        chunk_size=options['chunk_size'],
+                        skip_invalid=options['skip_invalid']
+                    )
+                except ValueError:
+                    raise CommandError(f"Stopped after {created} transactions: malformed JSON document")
+                except BulkIngestError as e:
+                    if e.errors and e.errors[0]['row'] is None:
+                        raise CommandError(f"Stopped after {created} transactions: {e.errors[0]['errors'][0]}")
+                    for error in e.errors[:20]:
+                        self.stderr.write(f"Row {error['row']}: {error['errors']}")
+                    raise CommandError(
+                        f"Stopped after {created} transactions: {len(e.errors)} invalid row(s) in the next batch"
+                    )
+
+                created += summary['created']
+                fraud_detected += summary['fraud_detected']
+                skipped += len(summary['errors'])
+                for error in summary['errors']:
+                    self.stderr.write(f"Skipped row {error['row']}: {error['errors']}")
+                self.stdout.write(f"{created} transactions ingested...")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Ingested {created} transactions ({fraud_detected} flagged as fraud, {skipped} skipped)"
+        ))
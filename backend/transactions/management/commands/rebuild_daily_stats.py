@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from transactions.rollups import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user daily transaction rollups from the transactions table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild rollups for this username')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist")
+
+        count = rebuild_daily_stats(user)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} daily rollup rows"))
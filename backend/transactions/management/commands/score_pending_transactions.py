@@ -0,0 +1,36 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from transactions.models import Transaction
+from transactions.scoring import score_pending
+from ml_model.registry import get_detector
+
+
+class Command(BaseCommand):
+    help = 'Score transactions left pending (e.g. by a worker restart in async scoring mode)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=60,
+                            help='Only pick up rows pending for at least this many seconds')
+        parser.add_argument('--include-failed', action='store_true', help='Retry rows whose scoring failed')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows scored per model call')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running and sweep every this many seconds (0 sweeps once)')
+
+    def handle(self, *args, **options):
+        statuses = [Transaction.SCORING_PENDING]
+        if options['include_failed']:
+            statuses.append(Transaction.SCORING_FAILED)
+        detector = get_detector()
+
+        while True:
+            cutoff = timezone.now() - timedelta(seconds=options['older_than'])
+            scored = score_pending(statuses, cutoff, options['batch_size'], detector)
+            self.stdout.write(self.style.SUCCESS(f"Scored {scored} pending transactions"))
+            if options['interval'] <= 0:
+                return
+            # Long-running sweeper: do not hold a connection past CONN_MAX_AGE between sweeps
+            close_old_connections()
+            time.sleep(options['interval'])
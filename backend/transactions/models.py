@@ -10,6 +10,15 @@ class Transaction(models.Model):
         ('REQUEST', 'Request Money'),
     )
 
+    SCORING_PENDING = 'PENDING'
+    SCORING_SCORED = 'SCORED'
+    SCORING_FAILED = 'FAILED'
+    SCORING_STATUSES = (
+        (SCORING_PENDING, 'Pending'),
+        (SCORING_SCORED, 'Scored'),
+        (SCORING_FAILED, 'Failed'),
+    )
+
     transaction_id = models.CharField(max_length=100, unique=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
     
@@ -29,6 +38,9 @@ class Transaction(models.Model):
     is_fraud = models.BooleanField(default=False)
     fraud_probability = models.FloatField(default=0.0)
     fraud_details = models.JSONField(blank=True, null=True)
+    # Rows from before async scoring existed were scored inline; only code paths
+    # that defer scoring mark a row PENDING explicitly
+    scoring_status = models.CharField(max_length=10, choices=SCORING_STATUSES, default=SCORING_SCORED)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -38,6 +50,17 @@ class Transaction(models.Model):
         ordering = ['-created_at']
         verbose_name = "Transaction"
         verbose_name_plural = "Transactions"
+        indexes = [
+            # Per-user listings ordered newest first (id breaks ties for keyset pagination)
+            models.Index(fields=['user', '-created_at', '-id'], name='txn_user_created_idx'),
+            # Per-user fraud filters over a time window; partial because fraud
+            # rows are rare and SQLite cannot seek on a bare boolean column
+            models.Index(
+                fields=['user', 'created_at'],
+                name='txn_user_fraud_created_idx',
+                condition=models.Q(is_fraud=True),
+            ),
+        ]
 
     def __str__(self):
         return f"Transaction {self.transaction_id} - {self.amount}"
@@ -61,6 +84,83 @@ class FraudAlert(models.Model):
         ordering = ['-created_at']
         verbose_name = "Fraud Alert"
         verbose_name_plural = "Fraud Alerts"
+        indexes = [
+            # Open alerts newest first; resolved alerts are not indexed
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='alert_unresolved_created_idx',
+                condition=models.Q(is_resolved=False),
+            ),
+        ]
 
     def __str__(self):
         return f"Alert for {self.transaction.transaction_id}"
+
+
+class DailyTransactionStats(models.Model):
+    """
+    Per-user daily totals maintained incrementally for the dashboard
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    transaction_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    fraud_count = models.PositiveIntegerField(default=0)
+    fraud_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name = "Daily Transaction Stats"
+        verbose_name_plural = "Daily Transaction Stats"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_daily_stats_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.date}: {self.transaction_count} transactions"
+
+
+class RescoreCheckpoint(models.Model):
+    """
+    Progress of one primary-key partition of a rescore_transactions run
+    """
+    run = models.CharField(max_length=100)
+    start_pk = models.BigIntegerField()
+    end_pk = models.BigIntegerField()
+    last_pk = models.BigIntegerField(null=True, blank=True)
+    rows = models.PositiveIntegerField(default=0)
+    dry_run = models.BooleanField(default=False)
+    finished = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run', 'start_pk']
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'start_pk'], name='unique_rescore_partition'),
+        ]
+
+    def __str__(self):
+        return f"{self.run} [{self.start_pk}, {self.end_pk}]"
+
+
+class RescoreResult(models.Model):
+    """
+    Score from a dry rescore_transactions run, kept next to the stored score for comparison
+    """
+    run = models.CharField(max_length=100)
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='rescore_results')
+    fraud_probability = models.FloatField()
+    is_fraud = models.BooleanField()
+    fraud_details = models.JSONField(blank=True, null=True)
+    previous_probability = models.FloatField()
+    previous_is_fraud = models.BooleanField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['run', 'transaction']
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'transaction'], name='unique_rescore_result'),
+        ]
+
+    def __str__(self):
+        return f"{self.run}: {self.transaction_id} {self.previous_probability:.3f} -> {self.fraud_probability:.3f}"
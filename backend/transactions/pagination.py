@@ -0,0 +1,103 @@
+"""
+Pagination for transaction and alert listings
+"""
+import base64
+from collections import OrderedDict
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only cursor pagination keyed on (created_at, id), newest first.
+
+    Each page is fetched with an index range seek instead of COUNT(*) plus
+    OFFSET, so deep pages cost the same as the first one. The cursor only
+    encodes that order, so any other ?ordering= is rejected with a 400 rather
+    than silently ignored; use page number pagination to sort by other fields.
+    """
+    cursor_query_param = 'cursor'
+    ordering_query_param = api_settings.ORDERING_PARAM
+    # ?ordering= values that match the order the cursor walks
+    cursor_orderings = ('', '-created_at')
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Invalid cursor'
+    invalid_ordering_message = 'Cursor pagination only supports ordering=-created_at'
+
+    def encode_cursor(self, instance):
+        if isinstance(instance, dict):
+            # values() rows from the list fast path
+            created_at, pk = instance['created_at'], instance['id']
+        else:
+            created_at, pk = instance.created_at, instance.pk
+        position = f"{created_at.isoformat()}|{pk}"
+        return base64.urlsafe_b64encode(position.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, cursor):
+        try:
+            created_at, pk = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii').rsplit('|', 1)
+            position = (parse_datetime(created_at), int(pk))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if position[0] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = request.query_params.get(self.ordering_query_param, '').strip()
+        if ordering not in self.cursor_orderings:
+            raise ValidationError({self.ordering_query_param: [self.invalid_ordering_message]})
+        queryset = queryset.order_by('-created_at', '-id')
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            # created_at <= x narrows the index range; the OR only breaks ties
+            queryset = queryset.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(id__lt=pk)
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+
+class OptionalKeysetPagination(PageNumberPagination):
+    """
+    Page number pagination by default; keyset pagination when the request
+    carries a ?cursor= parameter (empty for the first page).
+    """
+    keyset_class = KeysetPagination
+
+    def __init__(self):
+        self.keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
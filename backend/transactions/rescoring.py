@@ -0,0 +1,203 @@
+"""
+Rescoring of stored transactions with the current model, e.g. after a model rollout
+
+A run splits the primary-key range into partitions, each recorded as a
+RescoreCheckpoint. Partitions are scored independently (in a process pool
+when workers > 1), one keyset chunk at a time, and each chunk commits its
+results together with the partition's last_pk, so an interrupted run
+resumes from the last committed chunk.
+
+Normal runs overwrite the stored scores (with rollups and alerts kept in
+step, see scoring.save_scored). Dry runs leave transactions untouched and
+write the new scores to RescoreResult for comparison.
+
+Behavioural and graph features are rebuilt point-in-time rather than read
+from the feature store and the process graph, which already hold every later
+transaction. Each partition replays the history before its first row (or
+its checkpoint) into a private FeatureReplay, then advances it chunk by chunk
+while scoring, so a rescored transaction gets the inputs it had when it was
+created. The warm-up reads every earlier transaction once per partition, so
+with these features enabled prefer fewer, larger partitions.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.db import close_old_connections, connections, transaction as db_transaction
+from django.db.models import Avg, Count, F, Max, Min, Q
+from django.db.models.functions import Abs
+from ml_model.registry import get_detector
+from ml_model.replay import FeatureReplay
+from ml_model.training import queryset_columns_by_pk
+from .models import Transaction, RescoreCheckpoint, RescoreResult
+from .scoring import save_scored
+
+
+def _empty_stats():
+    return {'rows': 0, 'flagged': 0, 'cleared': 0, 'probability_change': 0.0}
+
+
+def plan_partitions(run, partitions, dry_run=False):
+    """
+    Split the primary-key range into contiguous partitions and checkpoint them
+
+    A run that already has checkpoints keeps its original plan.
+
+    Args:
+        run: Run name
+        partitions: Number of partitions for a new run
+        dry_run: Write results to RescoreResult instead of the transactions
+
+    Returns:
+        list of RescoreCheckpoint, finished ones included
+    """
+    existing = list(RescoreCheckpoint.objects.filter(run=run))
+    if existing:
+        return existing
+
+    bounds = Transaction.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return []
+
+    low, high = bounds['low'], bounds['high']
+    size = max((high - low + 1) // max(partitions, 1), 1)
+    checkpoints = []
+    start = low
+    while start <= high:
+        end = high if len(checkpoints) == partitions - 1 else min(start + size - 1, high)
+        checkpoints.append(RescoreCheckpoint(run=run, start_pk=start, end_pk=end, dry_run=dry_run))
+        start = end + 1
+    return RescoreCheckpoint.objects.bulk_create(checkpoints)
+
+
+def _save_dry_run(run, transactions, results):
+    RescoreResult.objects.bulk_create(
+        [
+            RescoreResult(
+                run=run, transaction=transaction,
+                fraud_probability=fraud_result['fraud_probability'],
+                is_fraud=fraud_result['is_fraud'],
+                fraud_details=fraud_result,
+                previous_probability=transaction.fraud_probability,
+                previous_is_fraud=transaction.is_fraud,
+            )
+            for transaction, fraud_result in zip(transactions, results)
+        ],
+        update_conflicts=True,
+        unique_fields=['run', 'transaction'],
+        update_fields=['fraud_probability', 'is_fraud', 'fraud_details'],
+    )
+
+
+def rescore_partition(checkpoint_id, chunk_size=1000):
+    """
+    Score one partition from its checkpoint onwards
+
+    Safe to call in a worker process: it opens its own database connection
+    and loads the detector through the process-wide registry.
+
+    Returns:
+        dict with rows, flagged (newly fraud), cleared (no longer fraud) and
+        the summed absolute probability change
+    """
+    close_old_connections()
+    try:
+        checkpoint = RescoreCheckpoint.objects.get(pk=checkpoint_id)
+        detector = get_detector()
+        stats = _empty_stats()
+        rows = Transaction.objects.filter(pk__lte=checkpoint.end_pk).order_by('pk')
+
+        replay = FeatureReplay()
+        if replay.enabled:
+            warm_up = checkpoint.start_pk - 1 if checkpoint.last_pk is None else checkpoint.last_pk
+            for columns in queryset_columns_by_pk(Transaction.objects.filter(pk__lte=warm_up), chunk_size):
+                replay.observe(columns)
+
+        while not checkpoint.finished:
+            after = checkpoint.start_pk - 1 if checkpoint.last_pk is None else checkpoint.last_pk
+            chunk = list(rows.filter(pk__gt=after)[:chunk_size])
+            if not chunk:
+                checkpoint.finished = True
+                checkpoint.save(update_fields=['finished', 'updated_at'])
+                break
+
+            previous = [(t.fraud_probability, t.is_fraud) for t in chunk]
+            results = detector.predict_batch(chunk, replay=replay)
+            with db_transaction.atomic():
+                if checkpoint.dry_run:
+                    _save_dry_run(checkpoint.run, chunk, results)
+                else:
+                    save_scored(chunk, results)
+                checkpoint.last_pk = chunk[-1].pk
+                checkpoint.rows += len(chunk)
+                checkpoint.save(update_fields=['last_pk', 'rows', 'updated_at'])
+
+            for (probability, was_fraud), fraud_result in zip(previous, results):
+                stats['rows'] += 1
+                stats['flagged'] += fraud_result['is_fraud'] and not was_fraud
+                stats['cleared'] += was_fraud and not fraud_result['is_fraud']
+                stats['probability_change'] += abs(fraud_result['fraud_probability'] - probability)
+        return stats
+    finally:
+        close_old_connections()
+
+
+def rescore(run, partitions=None, workers=1, chunk_size=1000, dry_run=False, progress=None):
+    """
+    Rescore transactions, resuming the run if it was interrupted
+
+    Args:
+        run: Run name; reusing it resumes unfinished partitions
+        partitions: Number of pk partitions for a new run (defaults to workers * 4)
+        workers: Worker processes; 1 scores in this process
+        chunk_size: Rows per model call and per commit
+        dry_run: Write results to RescoreResult instead of the transactions
+        progress: Optional callable(done partitions, total partitions, stats, seconds)
+
+    Returns:
+        dict with the totals of this invocation and the elapsed seconds
+    """
+    checkpoints = plan_partitions(run, partitions or workers * 4, dry_run)
+    if any(checkpoint.dry_run != dry_run for checkpoint in checkpoints):
+        raise ValueError(f"Run {run} was started with dry_run={not dry_run}")
+    pending = [checkpoint.pk for checkpoint in checkpoints if not checkpoint.finished]
+
+    totals = _empty_stats()
+    started = time.perf_counter()
+    done = len(checkpoints) - len(pending)
+
+    def collect(stats):
+        nonlocal done
+        done += 1
+        for key, value in stats.items():
+            totals[key] += value
+        if progress is not None:
+            progress(done, len(checkpoints), totals, time.perf_counter() - started)
+
+    if workers <= 1:
+        for checkpoint_id in pending:
+            collect(rescore_partition(checkpoint_id, chunk_size))
+    else:
+        # Forked workers must not share this process's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(rescore_partition, checkpoint_id, chunk_size) for checkpoint_id in pending]
+            for future in as_completed(futures):
+                collect(future.result())
+
+    totals['seconds'] = time.perf_counter() - started
+    return totals
+
+
+def compare_dry_run(run):
+    """
+    Summarise a dry run against the stored scores
+
+    Returns:
+        dict with row count, transactions that would become fraud or stop
+        being fraud, and the mean absolute probability change
+    """
+    return RescoreResult.objects.filter(run=run).aggregate(
+        rows=Count('id'),
+        flagged=Count('id', filter=Q(is_fraud=True, previous_is_fraud=False)),
+        cleared=Count('id', filter=Q(is_fraud=False, previous_is_fraud=True)),
+        mean_probability_change=Avg(Abs(F('fraud_probability') - F('previous_probability'))),
+    )
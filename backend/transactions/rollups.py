@@ -0,0 +1,154 @@
+"""
+Incremental maintenance of the DailyTransactionStats rollup table
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Transaction, DailyTransactionStats
+
+
+def _new_delta():
+    return [0, Decimal('0'), 0, Decimal('0')]
+
+
+def _apply(deltas, create=True):
+    for (user_id, date), (count, amount, fraud_count, fraud_amount) in deltas.items():
+        changes = {
+            'transaction_count': F('transaction_count') + count,
+            'total_amount': F('total_amount') + amount,
+            'fraud_count': F('fraud_count') + fraud_count,
+            'fraud_amount': F('fraud_amount') + fraud_amount,
+        }
+        rows = DailyTransactionStats.objects.filter(user_id=user_id, date=date)
+        if rows.update(**changes) or not create:
+            continue
+        try:
+            with db_transaction.atomic():
+                DailyTransactionStats.objects.create(
+                    user_id=user_id, date=date,
+                    transaction_count=count, total_amount=amount,
+                    fraud_count=fraud_count, fraud_amount=fraud_amount
+                )
+        except IntegrityError:
+            # Another worker created the row first
+            rows.update(**changes)
+
+
+def record_transactions(transactions):
+    """
+    Add newly saved transactions, with their current fraud flags, to the rollups
+    """
+    deltas = defaultdict(_new_delta)
+    for transaction in transactions:
+        delta = deltas[(transaction.user_id, timezone.localdate(transaction.created_at))]
+        amount = Decimal(transaction.amount)
+        delta[0] += 1
+        delta[1] += amount
+        if transaction.is_fraud:
+            delta[2] += 1
+            delta[3] += amount
+    _apply(deltas)
+
+
+def remove_transactions(transactions):
+    """
+    Take deleted transactions, or the old state of edited ones, out of the rollups
+
+    Rollup rows that no longer exist (e.g. removed with their user) are left
+    alone rather than recreated with negative totals.
+    """
+    deltas = defaultdict(_new_delta)
+    for transaction in transactions:
+        delta = deltas[(transaction.user_id, timezone.localdate(transaction.created_at))]
+        amount = Decimal(transaction.amount)
+        delta[0] -= 1
+        delta[1] -= amount
+        if transaction.is_fraud:
+            delta[2] -= 1
+            delta[3] -= amount
+    _apply(deltas, create=False)
+
+
+def record_fraud_changes(changes):
+    """
+    Move rescored transactions between the fraud and non-fraud totals
+
+    Args:
+        changes: Iterable of (transaction, was_fraud) pairs
+    """
+    deltas = defaultdict(_new_delta)
+    for transaction, was_fraud in changes:
+        if bool(was_fraud) == bool(transaction.is_fraud):
+            continue
+        sign = 1 if transaction.is_fraud else -1
+        delta = deltas[(transaction.user_id, timezone.localdate(transaction.created_at))]
+        delta[2] += sign
+        delta[3] += sign * Decimal(transaction.amount)
+    _apply(deltas)
+
+
+def rebuild_daily_stats(user=None):
+    """
+    Recompute the rollups from the raw transactions
+
+    Args:
+        user: Limit the rebuild to one user
+
+    Returns:
+        Number of rollup rows written
+    """
+    transactions = Transaction.objects.all()
+    rollups = DailyTransactionStats.objects.all()
+    if user is not None:
+        transactions = transactions.filter(user=user)
+        rollups = rollups.filter(user=user)
+
+    fraud = Q(is_fraud=True)
+    rows = (
+        transactions.order_by()
+        .annotate(day=TruncDate('created_at'))
+        .values('user_id', 'day')
+        .annotate(
+            transaction_count=Count('id'),
+            total_amount=Sum('amount'),
+            fraud_count=Count('id', filter=fraud),
+            fraud_amount=Sum('amount', filter=fraud),
+        )
+    )
+    stats = [
+        DailyTransactionStats(
+            user_id=row['user_id'], date=row['day'],
+            transaction_count=row['transaction_count'],
+            total_amount=row['total_amount'] or 0,
+            fraud_count=row['fraud_count'],
+            fraud_amount=row['fraud_amount'] or 0,
+        )
+        for row in rows
+    ]
+
+    with db_transaction.atomic():
+        rollups.delete()
+        DailyTransactionStats.objects.bulk_create(stats, batch_size=1000)
+    return len(stats)
+
+
+def transaction_deleted(sender, instance, **kwargs):
+    """
+    post_delete receiver that keeps the rollups in step with deleted transactions
+    """
+    remove_transactions([instance])
+
+
+def backfill_daily_stats(**kwargs):
+    """
+    post_migrate receiver that builds the rollups on installs that predate them
+
+    Runs the full rebuild only when the rollup table is empty while
+    transactions exist, so later migrations leave maintained rollups alone.
+    """
+    if DailyTransactionStats.objects.exists() or not Transaction.objects.exists():
+        return
+    rebuild_daily_stats()
@@ -2,6 +2,10 @@ from rest_framework import serializers
 from .models import Transaction, FraudAlert
 
 
+TRANSACTION_COLUMNS = [field.name for field in Transaction._meta.concrete_fields]
+ALERT_COLUMNS = [field.name for field in FraudAlert._meta.concrete_fields]
+
+
 class TransactionSerializer(serializers.ModelSerializer):
     user_username = serializers.CharField(source='user.username', read_only=True)
 
@@ -11,28 +15,60 @@ class TransactionSerializer(serializers.ModelSerializer):
             'id', 'transaction_id', 'user', 'user_username',
             'sender_upi', 'receiver_upi', 'amount', 'transaction_type',
             'description', 'device_id', 'ip_address', 'location',
-            'is_fraud', 'fraud_probability', 'fraud_details',
+            'is_fraud', 'fraud_probability', 'fraud_details', 'scoring_status',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['transaction_id', 'user', 'is_fraud', 'fraud_probability', 'fraud_details', 'created_at', 'updated_at']
+        read_only_fields = ['transaction_id', 'user', 'is_fraud', 'fraud_probability', 'fraud_details', 'scoring_status', 'created_at', 'updated_at']
+
+    @staticmethod
+    def setup_eager_loading(queryset, prefix=''):
+        """
+        Join the owner in the same query, loading only its username
+        """
+        return queryset.select_related(prefix + 'user').only(
+            *[prefix + name for name in TRANSACTION_COLUMNS], prefix + 'user__username'
+        )
 
 
 class FraudAlertSerializer(serializers.ModelSerializer):
-    transaction_details = TransactionSerializer(source='transaction', read_only=True)
+    """
+    Alert with the related transaction as a primary key only
+    """
 
     class Meta:
         model = FraudAlert
-        fields = ['id', 'transaction', 'transaction_details', 'alert_type', 'severity', 'message', 'is_resolved', 'resolved_at', 'created_at']
+        fields = ['id', 'transaction', 'alert_type', 'severity', 'message', 'is_resolved', 'resolved_at', 'created_at']
         read_only_fields = ['created_at']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.only(*ALERT_COLUMNS)
+
+
+class FraudAlertExpandedSerializer(FraudAlertSerializer):
+    """
+    Alert with the full related transaction nested under transaction_details
+    """
+    transaction_details = TransactionSerializer(source='transaction', read_only=True)
+
+    class Meta(FraudAlertSerializer.Meta):
+        fields = ['id', 'transaction', 'transaction_details', 'alert_type', 'severity', 'message', 'is_resolved', 'resolved_at', 'created_at']
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('transaction__user').only(*ALERT_COLUMNS, *[
+            'transaction__' + name for name in TRANSACTION_COLUMNS
+        ], 'transaction__user__username')
+
 
 class TransactionCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
         fields = [
             'sender_upi', 'receiver_upi', 'amount', 'transaction_type',
-            'description', 'device_id', 'ip_address', 'location'
+            'description', 'device_id', 'ip_address', 'location', 'scoring_status'
         ]
+        read_only_fields = ['scoring_status']
 
     def validate_amount(self, value):
         if value <= 0:
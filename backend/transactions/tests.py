@@ -0,0 +1,613 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from ml_model.graph import CounterpartyGraph
+from ml_model.models import SenderBehaviour
+from ml_model.replay import FeatureReplay
+from .models import Transaction, FraudAlert, DailyTransactionStats, RescoreCheckpoint, RescoreResult
+from .rescoring import compare_dry_run, plan_partitions, rescore
+from .rollups import backfill_daily_stats
+from .scoring import save_scored, score_pending, scoring_queue
+
+
+class BulkIngestTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_json_batch_is_scored_and_saved(self):
+        rows = [
+            {'sender_upi': 'alice@upi', 'receiver_upi': 'bob@upi', 'amount': '250.00',
+             'device_id': 'dev-1', 'location': 'Pune'},
+            {'sender_upi': 'alice@upi', 'receiver_upi': 'alice@upi', 'amount': '60000.00'},
+        ]
+        response = self.client.post('/api/transactions/bulk/', rows, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+        flagged = Transaction.objects.get(receiver_upi='alice@upi')
+        self.assertTrue(flagged.is_fraud)
+        self.assertIsNotNone(flagged.fraud_details)
+        self.assertEqual(FraudAlert.objects.count(), response.data['fraud_detected'])
+
+    def test_csv_and_jsonl_batches(self):
+        csv_body = 'sender_upi,receiver_upi,amount,location\na@upi,b@upi,10.50,\na@upi,c@upi,20,Delhi\n'
+        response = self.client.generic('POST', '/api/transactions/bulk/', csv_body, content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+
+        jsonl_body = '\n'.join(json.dumps({'sender_upi': 'a@upi', 'receiver_upi': 'd@upi', 'amount': 5}) for _ in range(3))
+        response = self.client.generic('POST', '/api/transactions/bulk/', jsonl_body,
+                                       content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Transaction.objects.count(), 5)
+
+    def test_invalid_row_rejects_batch(self):
+        rows = [
+            {'sender_upi': 'a@upi', 'receiver_upi': 'b@upi', 'amount': '10'},
+            {'sender_upi': 'a@upi', 'receiver_upi': 'b@upi', 'amount': '-1'},
+        ]
+        response = self.client.post('/api/transactions/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_oversized_batches_are_refused_before_parsing(self):
+        rows = [{'sender_upi': 'a@upi', 'receiver_upi': 'b@upi', 'amount': '10'}] * 5
+        with override_settings(BULK_INGEST_MAX_BYTES=100):
+            response = self.client.post('/api/transactions/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 413)
+
+        with override_settings(BULK_INGEST_MAX_ROWS=3), \
+                mock.patch('transactions.views.ingest_rows') as ingest:
+            response = self.client.post('/api/transactions/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 413)
+        ingest.assert_not_called()
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_management_command(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / 'feed.jsonl'
+            path.write_text('\n'.join(
+                json.dumps({'sender_upi': 'a@upi', 'receiver_upi': f'r{i}@upi', 'amount': i + 1})
+                for i in range(25)
+            ))
+            call_command('ingest_transactions', str(path), user='alice', batch_size=10, chunk_size=4,
+                         stdout=io.StringIO())
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 25)
+
+    def test_management_command_rejects_malformed_files(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for body, message in (('[{"sender_upi": ', 'malformed JSON document'),
+                                  ('{"transactions": 5}', 'Expected a list of transactions.')):
+                path = Path(tmpdir) / 'feed.json'
+                path.write_text(body)
+                with self.subTest(body=body), self.assertRaisesMessage(CommandError, message):
+                    call_command('ingest_transactions', str(path), user='alice', format='json',
+                                 stdout=io.StringIO())
+        self.assertFalse(Transaction.objects.exists())
+
+
+@override_settings(FRAUD_SCORING_MODE='async')
+class AsyncScoringTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='bob', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.payload = {'sender_upi': 'bob@upi', 'receiver_upi': 'bob@upi', 'amount': '75000.00'}
+
+    def tearDown(self):
+        scoring_queue.shutdown()
+
+    def test_returns_pending_and_scores_in_background(self):
+        response = self.client.post('/api/transactions/?wait_ms=0', self.payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['scoring_status'], Transaction.SCORING_PENDING)
+        self.assertFalse(response.data['is_fraud'])
+
+        scoring_queue.shutdown(wait=True)
+        transaction = Transaction.objects.get()
+        self.assertEqual(transaction.scoring_status, Transaction.SCORING_SCORED)
+        self.assertTrue(transaction.is_fraud)
+        self.assertTrue(FraudAlert.objects.filter(transaction=transaction).exists())
+
+    def test_wait_budget_returns_scored_result(self):
+        response = self.client.post('/api/transactions/?wait_ms=2000', self.payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['scoring_status'], Transaction.SCORING_SCORED)
+        transaction = Transaction.objects.get()
+        self.assertEqual(response.data['id'], transaction.pk)
+        self.assertTrue(response.data['is_fraud'])
+        self.assertEqual(response.data['fraud_probability'], transaction.fraud_probability)
+        self.assertEqual(response.data['fraud_details']['detection_method'], 'rule_based')
+
+    def test_sweep_scores_pending_rows(self):
+        pending = Transaction.objects.create(
+            user=self.user, sender_upi='a@upi', receiver_upi='b@upi', amount=10,
+            scoring_status=Transaction.SCORING_PENDING
+        )
+        # Rows saved without an explicit status (e.g. before async scoring) are not rescored
+        legacy = Transaction.objects.create(user=self.user, sender_upi='a@upi', receiver_upi='c@upi', amount=10)
+        out = io.StringIO()
+        call_command('score_pending_transactions', older_than=0, stdout=out)
+        self.assertIn('Scored 1 pending transactions', out.getvalue())
+        pending.refresh_from_db()
+        legacy.refresh_from_db()
+        self.assertEqual(pending.scoring_status, Transaction.SCORING_SCORED)
+        self.assertIsNotNone(pending.fraud_details)
+        self.assertIsNone(legacy.fraud_details)
+
+    @override_settings(BEHAVIOUR_FEATURES_ENABLED=True, GRAPH_FEATURES_ENABLED=True)
+    def test_sweep_scores_with_point_in_time_features(self):
+        start = timezone.now() - timedelta(days=2)
+        for i in range(12):
+            transaction = Transaction.objects.create(
+                user=self.user, sender_upi=f'u{i % 3}@upi', receiver_upi=f'shop{i % 4}@upi', amount=100 + i,
+                device_id=f'dev-{i % 2}', location='Pune'
+            )
+            Transaction.objects.filter(pk=transaction.pk).update(
+                created_at=start + timedelta(minutes=30 * i),
+                scoring_status=Transaction.SCORING_PENDING if i in (3, 4, 8) else Transaction.SCORING_SCORED
+            )
+        replayed = []
+        features = FeatureReplay.features
+
+        def record(replay, transactions):
+            result = features(replay, transactions)
+            replayed.append(result)
+            return result
+
+        with mock.patch.object(FeatureReplay, 'features', autospec=True, side_effect=record), \
+                mock.patch.object(CounterpartyGraph, 'batch_features', side_effect=AssertionError('live graph')):
+            self.assertEqual(score_pending([Transaction.SCORING_PENDING], timezone.now(), batch_size=4), 3)
+
+        # Each pending row sees the history before it and none of the rows after it
+        rows = list(Transaction.objects.order_by('pk'))
+        behaviour, graph = FeatureReplay().features(rows)
+        np.testing.assert_array_equal(np.concatenate([b for b, _ in replayed]), behaviour[[3, 4, 8]])
+        np.testing.assert_array_equal(np.concatenate([g for _, g in replayed]), graph[[3, 4, 8]])
+        self.assertFalse(Transaction.objects.exclude(scoring_status=Transaction.SCORING_SCORED).exists())
+
+
+class CreateTransactionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dave', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.payload = {'sender_upi': 'dave@upi', 'receiver_upi': 'dave@upi', 'amount': '75000.00'}
+
+    def test_scored_transaction_is_inserted_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/transactions/', self.payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['scoring_status'], Transaction.SCORING_SCORED)
+
+        statements = [q['sql'] for q in queries.captured_queries if 'transactions_transaction' in q['sql']]
+        self.assertEqual(sum(sql.startswith('INSERT') for sql in statements), 1)
+        self.assertFalse([sql for sql in statements if sql.startswith('UPDATE')])
+
+        transaction = Transaction.objects.get()
+        self.assertTrue(transaction.is_fraud)
+        self.assertEqual(transaction.scoring_status, Transaction.SCORING_SCORED)
+        self.assertEqual(transaction.fraud_details['detection_method'], 'rule_based')
+        self.assertEqual(FraudAlert.objects.get().transaction, transaction)
+        self.assertEqual(DailyTransactionStats.objects.get(user=self.user).fraud_count, 1)
+
+    def test_detector_failure_saves_pending(self):
+        with mock.patch('transactions.views.get_detector', side_effect=RuntimeError('boom')), \
+                self.assertLogs('transactions.views', 'ERROR'):
+            response = self.client.post('/api/transactions/', self.payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        transaction = Transaction.objects.get()
+        self.assertEqual(transaction.scoring_status, Transaction.SCORING_PENDING)
+        self.assertFalse(FraudAlert.objects.exists())
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='carol', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, days_ago, amount, is_fraud=False):
+        transaction = Transaction.objects.create(
+            user=self.user, sender_upi='carol@upi', receiver_upi='shop@upi',
+            amount=amount, is_fraud=is_fraud
+        )
+        Transaction.objects.filter(pk=transaction.pk).update(
+            created_at=timezone.now() - timedelta(days=days_ago)
+        )
+        call_command('rebuild_daily_stats', stdout=io.StringIO())
+        return transaction
+
+    def test_totals_and_trend(self):
+        self.create(0, 100)
+        self.create(0, 900, is_fraud=True)
+        self.create(2, 50)
+        self.create(40, 5000, is_fraud=True)
+
+        response = self.client.get('/api/transactions/stats/?days=7')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_transactions'], 3)
+        self.assertEqual(response.data['total_amount'], 1050.0)
+        self.assertEqual(response.data['fraud_transactions'], 1)
+        self.assertEqual(response.data['fraud_amount'], 900.0)
+
+        trend = response.data['fraud_trend']
+        self.assertEqual(len(trend), 7)
+        self.assertEqual(trend[-1], {'date': timezone.localdate().isoformat(), 'total': 2, 'fraud': 1})
+        self.assertEqual(sum(day['total'] for day in trend), 3)
+        self.assertEqual([day['date'] for day in trend], sorted(day['date'] for day in trend))
+
+    def test_query_count_is_constant(self):
+        for i in range(30):
+            self.create(i % 20, 10 + i, is_fraud=i % 3 == 0)
+
+        with self.assertNumQueries(3):
+            self.client.get('/api/transactions/stats/?days=30')
+        with self.assertNumQueries(3):
+            self.client.get('/api/transactions/stats/?days=365')
+
+    def test_rollups_follow_creates_and_rescoring(self):
+        self.client.post('/api/transactions/', {
+            'sender_upi': 'carol@upi', 'receiver_upi': 'carol@upi', 'amount': '60000.00'
+        }, format='json')
+        self.client.post('/api/transactions/bulk/', [
+            {'sender_upi': 'carol@upi', 'receiver_upi': 'shop@upi', 'amount': '40.00',
+             'device_id': 'dev-1', 'location': 'Goa'},
+        ], format='json')
+
+        stats = DailyTransactionStats.objects.get(user=self.user)
+        self.assertEqual(stats.transaction_count, 2)
+        self.assertEqual(stats.total_amount, Decimal('60040.00'))
+        self.assertEqual(stats.fraud_count, 1)
+        self.assertEqual(stats.fraud_amount, Decimal('60000.00'))
+
+        # Rescoring the fraud transaction as legitimate moves it out of the fraud totals
+        transaction = Transaction.objects.get(is_fraud=True)
+        save_scored([transaction], [{'is_fraud': False, 'fraud_probability': 0.1}])
+        stats.refresh_from_db()
+        self.assertEqual((stats.fraud_count, stats.fraud_amount), (0, Decimal('0')))
+
+        rebuilt = {(r.date, r.transaction_count, r.total_amount, r.fraud_count)
+                   for r in DailyTransactionStats.objects.all()}
+        call_command('rebuild_daily_stats', stdout=io.StringIO())
+        self.assertEqual(rebuilt, {(r.date, r.transaction_count, r.total_amount, r.fraud_count)
+                                   for r in DailyTransactionStats.objects.all()})
+
+    def rollup_totals(self):
+        return list(DailyTransactionStats.objects.order_by('date').values_list(
+            'date', 'transaction_count', 'total_amount', 'fraud_count', 'fraud_amount'
+        ))
+
+    def test_deletes_and_admin_edits_follow_the_rollups(self):
+        kept = self.create(1, 100)
+        deleted = self.create(1, 300, is_fraud=True)
+        Transaction.objects.filter(pk=deleted.pk).delete()
+
+        admin_user = User.objects.create_superuser(username='root', password='secret-pass-123')
+        client = APIClient()
+        client.force_login(admin_user)
+        response = client.post(f'/admin/transactions/transaction/{kept.pk}/change/', {
+            'user': self.user.pk, 'sender_upi': 'carol@upi', 'receiver_upi': 'shop@upi',
+            'amount': '250.00', 'transaction_type': kept.transaction_type,
+            'scoring_status': kept.scoring_status, 'is_fraud': 'on',
+        })
+        self.assertEqual(response.status_code, 302)
+
+        maintained = self.rollup_totals()
+        self.assertEqual(maintained[0][1:], (1, Decimal('250.00'), 1, Decimal('250.00')))
+        call_command('rebuild_daily_stats', stdout=io.StringIO())
+        self.assertEqual(maintained, self.rollup_totals())
+
+    def test_migrate_backfills_missing_rollups(self):
+        self.create(3, 100)
+        self.create(0, 200, is_fraud=True)
+        expected = self.rollup_totals()
+
+        DailyTransactionStats.objects.all().delete()
+        emit_post_migrate_signal(0, False, 'default')
+        self.assertEqual(self.rollup_totals(), expected)
+
+        # Maintained rollups are not rebuilt by later migrations
+        DailyTransactionStats.objects.filter(date=timezone.localdate()).delete()
+        backfill_daily_stats()
+        self.assertEqual(len(self.rollup_totals()), 1)
+
+    def test_days_is_validated(self):
+        for value in ('0', '-3', 'abc', '100000'):
+            response = self.client.get(f'/api/transactions/stats/?days={value}')
+            self.assertEqual(response.status_code, 400)
+
+
+class IndexUsageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        users = [User.objects.create_user(username=f'user{i}') for i in range(20)]
+        transactions = Transaction.objects.bulk_create([
+            Transaction(user=users[i % 20], sender_upi=f's{i}@upi', receiver_upi=f'r{i}@upi',
+                        amount=100 + i, is_fraud=i % 7 == 0)
+            for i in range(2000)
+        ])
+        FraudAlert.objects.bulk_create([
+            FraudAlert(transaction=t, alert_type='FRAUD_DETECTED', severity='HIGH', message='',
+                       is_resolved=n % 2 == 0)
+            for n, t in enumerate(t for t in transactions if t.is_fraud)
+        ])
+        cls.user = users[0]
+        # users[1]'s fraud transactions all have open alerts
+        cls.alert_user = users[1]
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_user_listing_uses_user_created_index(self):
+        plan = Transaction.objects.filter(user=self.user).order_by('-created_at').explain()
+        self.assertIn('txn_user_created_idx', plan)
+
+    def test_fraud_window_uses_user_fraud_index(self):
+        since = timezone.now() - timedelta(days=30)
+        plan = Transaction.objects.filter(user=self.user, is_fraud=True, created_at__gte=since).order_by().explain()
+        self.assertIn('txn_user_fraud_created_idx', plan)
+
+    def alert_list_plans(self, url):
+        """
+        Query plans of the alert rows queries the alerts endpoint runs for url
+        """
+        client = APIClient()
+        client.force_authenticate(self.alert_user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+            response.getvalue()
+        self.assertEqual(response.status_code, 200)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                if query['sql'].startswith('SELECT "transactions_fraudalert"') and 'ORDER BY' in query['sql']:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                    plans.append(' '.join(row[-1] for row in cursor.fetchall()))
+        return plans
+
+    def test_unresolved_alerts_use_partial_index(self):
+        # The user's open alerts, newest first, as the view queries them: walked
+        # in index order with no sort step, each joined to its transaction by key
+        for url in ('/api/transactions/alerts/', '/api/transactions/alerts/?cursor=',
+                    '/api/transactions/alerts/?expand=transaction'):
+            plans = self.alert_list_plans(url)
+            self.assertEqual(len(plans), 1, url)
+            self.assertIn('alert_unresolved_created_idx', plans[0])
+            self.assertNotIn('TEMP B-TREE', plans[0])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dave', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, sender_upi='dave@upi', receiver_upi=f'r{i}@upi', amount=i + 1)
+            for i in range(45)
+        ])
+        # Force ties on created_at so the id tie-breaker is exercised
+        Transaction.objects.filter(amount__lte=10).update(created_at=timezone.now())
+
+    def test_cursor_walk_returns_every_row_once(self):
+        url = '/api/transactions/?cursor='
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+
+        expected = list(Transaction.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_page_number_pagination_is_default(self):
+        response = self.client.get('/api/transactions/')
+        self.assertEqual(response.data['count'], 45)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/transactions/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_rejects_other_orderings(self):
+        response = self.client.get('/api/transactions/?cursor=&ordering=amount')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ordering', response.data)
+
+        response = self.client.get('/api/transactions/?cursor=&ordering=-created_at')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/transactions/?ordering=amount')
+        self.assertEqual(response.data['results'][0]['amount'], '1.00')
+
+    def test_alert_listing_supports_cursor(self):
+        for transaction in Transaction.objects.all()[:25]:
+            FraudAlert.objects.create(transaction=transaction, alert_type='FRAUD_DETECTED',
+                                      severity='HIGH', message='')
+        first = self.client.get('/api/transactions/alerts/?cursor=')
+        second = self.client.get(first.data['next'])
+        self.assertEqual(len(first.data['results']) + len(second.data['results']), 25)
+        self.assertIsNone(second.data['next'])
+
+
+class ListQueryCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='erin', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        transactions = Transaction.objects.bulk_create([
+            Transaction(user=self.user, sender_upi='erin@upi', receiver_upi=f'r{i}@upi', amount=i + 1,
+                        fraud_details={'reasons': ['test']})
+            for i in range(30)
+        ])
+        FraudAlert.objects.bulk_create([
+            FraudAlert(transaction=t, alert_type='FRAUD_DETECTED', severity='HIGH', message='')
+            for t in transactions
+        ])
+
+    def test_transaction_list_and_detail(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/transactions/')
+        self.assertEqual(response.data['results'][0]['user_username'], 'erin')
+
+        pk = response.data['results'][0]['id']
+        with self.assertNumQueries(1):
+            self.client.get(f'/api/transactions/{pk}/')
+
+    def test_alert_list_is_slim_by_default(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/transactions/alerts/')
+        self.assertNotIn('transaction_details', response.data['results'][0])
+
+    def test_alert_list_expand_transaction(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/transactions/alerts/?expand=transaction')
+        details = response.data['results'][0]['transaction_details']
+        self.assertEqual(details['user_username'], 'erin')
+        self.assertEqual(details['fraud_details'], {'reasons': ['test']})
+
+
+class FastListSerializationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='frank', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        transactions = Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user, sender_upi='frank@upi', receiver_upi=f'r{i}@upi',
+                amount=Decimal('1234.50') + i, transaction_type=['SEND', 'RECEIVE', 'REQUEST'][i % 3],
+                description=None if i % 2 else 'rent \u2028 ₹ "split"',
+                ip_address='10.0.0.1' if i % 3 else None,
+                is_fraud=i % 4 == 0, fraud_probability=i / 30,
+                fraud_details=None if i % 5 else {'reasons': ['Large amount', 'été'], 'score': 0.5},
+            )
+            for i in range(30)
+        ])
+        FraudAlert.objects.bulk_create([
+            FraudAlert(transaction=t, alert_type='FRAUD_DETECTED', severity='HIGH', message=f'Alert\u2029{i}',
+                       resolved_at=timezone.now() if i % 2 else None)
+            for i, t in enumerate(transactions)
+        ])
+
+    def fetch(self, url, fast):
+        with override_settings(FAST_LIST_SERIALIZATION=fast):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.streaming, fast)
+        content = b''.join(response.streaming_content) if fast else response.content
+        return response['Content-Type'], content
+
+    def test_responses_are_byte_identical(self):
+        urls = [
+            '/api/transactions/',
+            '/api/transactions/?page=2',
+            '/api/transactions/?ordering=amount&search=r1',
+            '/api/transactions/?cursor=',
+            '/api/transactions/alerts/',
+            '/api/transactions/alerts/?expand=transaction',
+            '/api/transactions/alerts/?cursor=&expand=transaction',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.fetch(url, fast=True), self.fetch(url, fast=False))
+
+    def test_cursor_pages_follow_from_values_rows(self):
+        _, content = self.fetch('/api/transactions/?cursor=', fast=True)
+        next_url = json.loads(content)['next']
+        self.assertEqual(self.fetch(next_url, fast=True), self.fetch(next_url, fast=False))
+
+    def test_indented_json_keeps_serializer_path(self):
+        with override_settings(FAST_LIST_SERIALIZATION=True):
+            response = self.client.get('/api/transactions/', HTTP_ACCEPT='application/json; indent=2')
+        self.assertFalse(response.streaming)
+
+
+class RescoreTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='rescore')
+        for i in range(25):
+            # Every fifth row is a self-transfer of a large amount, which the rules flag
+            fraud = i % 5 == 0
+            Transaction.objects.create(
+                user=self.user, sender_upi=f'u{i}@upi', receiver_upi=f'u{i}@upi' if fraud else 'shop@upi',
+                amount=Decimal('75000.00') if fraud else Decimal('120.00'),
+                device_id='d1', location='Pune', fraud_probability=0.4, is_fraud=False,
+                scoring_status=Transaction.SCORING_PENDING,
+            )
+
+    def test_dry_run_writes_side_table(self):
+        totals = rescore('dry', partitions=3, chunk_size=4, dry_run=True)
+        self.assertEqual(totals['rows'], 25)
+        self.assertEqual(totals['flagged'], 5)
+        self.assertEqual(RescoreResult.objects.filter(run='dry').count(), 25)
+        self.assertFalse(Transaction.objects.filter(is_fraud=True).exists())
+        self.assertEqual(Transaction.objects.filter(scoring_status=Transaction.SCORING_SCORED).count(), 0)
+        self.assertEqual(compare_dry_run('dry')['flagged'], 5)
+        self.assertTrue(all(RescoreCheckpoint.objects.filter(run='dry').values_list('finished', flat=True)))
+
+    def test_overwrites_scores_and_creates_alerts(self):
+        rescore('live', partitions=2, chunk_size=10)
+        self.assertEqual(Transaction.objects.filter(is_fraud=True).count(), 5)
+        self.assertEqual(Transaction.objects.filter(scoring_status=Transaction.SCORING_SCORED).count(), 25)
+        self.assertEqual(FraudAlert.objects.count(), 5)
+        self.assertFalse(RescoreResult.objects.exists())
+
+    def test_resumes_from_checkpoints(self):
+        checkpoints = plan_partitions('resume', 2)
+        first, second = checkpoints
+        RescoreCheckpoint.objects.filter(pk=first.pk).update(finished=True, last_pk=first.end_pk)
+        RescoreCheckpoint.objects.filter(pk=second.pk).update(last_pk=second.start_pk + 2)
+
+        totals = rescore('resume', chunk_size=4)
+        self.assertEqual(totals['rows'], second.end_pk - second.start_pk - 2)
+        self.assertEqual(Transaction.objects.filter(pk__gt=second.start_pk + 2).exclude(
+            scoring_status=Transaction.SCORING_SCORED).count(), 0)
+        self.assertEqual(Transaction.objects.filter(pk__lte=second.start_pk + 2).exclude(
+            scoring_status=Transaction.SCORING_PENDING).count(), 0)
+
+        self.assertEqual(rescore('resume')['rows'], 0)
+        with self.assertRaises(ValueError):
+            rescore('resume', dry_run=True)
+
+    @override_settings(BEHAVIOUR_FEATURES_ENABLED=True, GRAPH_FEATURES_ENABLED=True)
+    def test_features_are_replayed_point_in_time(self):
+        replayed = []
+        features = FeatureReplay.features
+
+        def record(replay, transactions):
+            result = features(replay, transactions)
+            replayed.append(result)
+            return result
+
+        with mock.patch.object(FeatureReplay, 'features', autospec=True, side_effect=record), \
+                mock.patch.object(CounterpartyGraph, 'batch_features', side_effect=AssertionError('live graph')):
+            rescore('pit', partitions=3, chunk_size=4, dry_run=True)
+
+        # Partitions warm up on the rows before them, so the result matches one pass over history
+        behaviour, graph = FeatureReplay().features(list(Transaction.objects.order_by('pk')))
+        np.testing.assert_array_equal(np.concatenate([b for b, _ in replayed]), behaviour)
+        np.testing.assert_array_equal(np.concatenate([g for _, g in replayed]), graph)
+        self.assertFalse(SenderBehaviour.objects.exists())
+
+    def test_management_command(self):
+        out = io.StringIO()
+        call_command('rescore_transactions', '--run', 'cmd', '--dry-run', '--chunk-size', '7', stdout=out)
+        self.assertIn('Rescored 25 transactions', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+        self.assertIn('5 would be flagged', out.getvalue())
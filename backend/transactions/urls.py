@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import (
     TransactionListCreateView,
+    BulkTransactionCreateView,
     TransactionDetailView,
     FraudAlertListView,
     DashboardStatsView
@@ -8,6 +9,7 @@ from .views import (
 
 urlpatterns = [
     path('', TransactionListCreateView.as_view(), name='transaction-list-create'),
+    path('bulk/', BulkTransactionCreateView.as_view(), name='transaction-bulk-create'),
     path('<int:pk>/', TransactionDetailView.as_view(), name='transaction-detail'),
     path('alerts/', FraudAlertListView.as_view(), name='fraud-alerts'),
     path('stats/', DashboardStatsView.as_view(), name='dashboard-stats'),
@@ -1,20 +1,39 @@
+import logging
 from rest_framework import generics, status, filters
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
-from django.db.models import Count, Sum, Q
+from django.conf import settings
+from django.db import transaction as db_transaction
 from django.utils import timezone
-from datetime import timedelta
-from .models import Transaction, FraudAlert
-from .serializers import TransactionSerializer, TransactionCreateSerializer, FraudAlertSerializer
-from ml_model.fraud_detector import FraudDetector
+from datetime import datetime, timedelta
+from .models import Transaction, FraudAlert, DailyTransactionStats
+from .serializers import (
+    TransactionSerializer,
+    TransactionCreateSerializer,
+    FraudAlertSerializer,
+    FraudAlertExpandedSerializer
+)
+from .scoring import (
+    alert_histogram, apply_fraud_result, build_fraud_alert, enqueue_after_commit, write_histogram
+)
+from .rollups import record_transactions
+from .pagination import OptionalKeysetPagination
+from .fastpath import FastListMixin
+from .bulk import BulkIngestError, detect_format, parse_rows, ingest_rows
+from ml_model.feature_store import feature_store
+from ml_model.registry import get_detector
 
 
-class TransactionListCreateView(generics.ListCreateAPIView):
+logger = logging.getLogger(__name__)
+
+
+class TransactionListCreateView(FastListMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['transaction_id', 'sender_upi', 'receiver_upi']
     ordering_fields = ['created_at', 'amount', 'fraud_probability']
+    pagination_class = OptionalKeysetPagination
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -22,34 +41,119 @@ class TransactionListCreateView(generics.ListCreateAPIView):
         return TransactionSerializer
 
     def get_queryset(self):
-        return Transaction.objects.filter(user=self.request.user)
+        return TransactionSerializer.setup_eager_loading(Transaction.objects.filter(user=self.request.user))
+
+    def create(self, request, *args, **kwargs):
+        """
+        Create a transaction and respond with its full representation
+
+        The fraud fields are included, so callers that block with ?wait_ms= in
+        async mode get the score in the response.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        data = TransactionSerializer(serializer.instance, context=self.get_serializer_context()).data
+        return Response(data, status=status.HTTP_201_CREATED, headers=self.get_success_headers(data))
 
     def perform_create(self, serializer):
-        # Save transaction
-        transaction = serializer.save(user=self.request.user)
+        if settings.FRAUD_SCORING_MODE == 'async':
+            # Save transaction and count it in the daily rollups and sender profile
+            with db_transaction.atomic():
+                with write_histogram.time():
+                    transaction = serializer.save(user=self.request.user, scoring_status=Transaction.SCORING_PENDING)
+                record_transactions([transaction])
+                feature_store.record([transaction])
+            self.enqueue_scoring(transaction)
+            return
+        
+        # Score before saving so the row is inserted once, with its fraud fields;
+        # created_at is needed for the time features
+        transaction = Transaction(
+            user=self.request.user, created_at=timezone.now(), scoring_status=Transaction.SCORING_PENDING,
+            **serializer.validated_data
+        )
+        fraud_result = None
+        try:
+            fraud_result = get_detector().predict(transaction)
+            apply_fraud_result(transaction, fraud_result)
+        except Exception:
+            # Saved as pending; score_pending_transactions picks it up later
+            logger.exception("Error in fraud detection for transaction %s", transaction.transaction_id)
+        
+        # Insert the transaction, its rollups, sender profile and alert together
+        with db_transaction.atomic():
+            with write_histogram.time():
+                transaction.save(force_insert=True)
+            record_transactions([transaction])
+            feature_store.record([transaction])
+            if fraud_result is not None and fraud_result['is_fraud']:
+                with alert_histogram.time():
+                    build_fraud_alert(transaction, fraud_result).save(force_insert=True)
+        serializer.instance = transaction
+
+    def enqueue_scoring(self, transaction):
+        """
+        Score on the background pool; wait up to ?wait_ms= for callers that must block
+        """
+        futures = enqueue_after_commit(transaction)
+        
+        try:
+            wait_ms = int(self.request.query_params.get('wait_ms', settings.FRAUD_SCORING_WAIT_MS))
+        except ValueError:
+            wait_ms = settings.FRAUD_SCORING_WAIT_MS
+        wait_ms = min(max(wait_ms, 0), settings.FRAUD_SCORING_MAX_WAIT_MS)
+        
+        if wait_ms and futures:
+            try:
+                apply_fraud_result(transaction, futures[0].result(timeout=wait_ms / 1000.0))
+            except Exception:
+                # Still pending (or failed); the client can poll the transaction
+                pass
+
+
+class BulkTransactionCreateView(APIView):
+    """
+    Create many transactions at once from a JSON, JSON lines or CSV body
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        fmt = detect_format(content_type=request.content_type)
+        if fmt is None:
+            return Response(
+                {'error': 'Send application/json, application/x-ndjson or text/csv'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        
+        # Refuse oversized uploads before reading them; the stream is read directly
+        # so DATA_UPLOAD_MAX_MEMORY_SIZE does not apply on top of this limit
+        max_bytes = settings.BULK_INGEST_MAX_BYTES
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        body = b'' if length > max_bytes else request.read(max_bytes + 1)
+        if length > max_bytes or len(body) > max_bytes:
+            return Response(
+                {'error': f"Batch exceeds the limit of {max_bytes} bytes"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
         
-        # Run fraud detection
         try:
-            detector = FraudDetector()
-            fraud_result = detector.predict(transaction)
-            
-            transaction.is_fraud = fraud_result['is_fraud']
-            transaction.fraud_probability = fraud_result['fraud_probability']
-            transaction.fraud_details = fraud_result
-            transaction.save()
-            
-            # Create fraud alert if detected
-            if fraud_result['is_fraud']:
-                severity = 'CRITICAL' if fraud_result['fraud_probability'] > 0.9 else 'HIGH'
-                FraudAlert.objects.create(
-                    transaction=transaction,
-                    alert_type='FRAUD_DETECTED',
-                    severity=severity,
-                    message=f"Fraudulent transaction detected with {fraud_result['fraud_probability']*100:.2f}% probability"
+            rows = parse_rows(body.decode('utf-8'), fmt, limit=settings.BULK_INGEST_MAX_ROWS)
+            if len(rows) > settings.BULK_INGEST_MAX_ROWS:
+                return Response(
+                    {'error': f"Batch exceeds the limit of {settings.BULK_INGEST_MAX_ROWS} transactions"},
+                    status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
                 )
-        except Exception as e:
-            print(f"Error in fraud detection: {str(e)}")
-            # Continue even if fraud detection fails
+            summary = ingest_rows(rows, request.user, get_detector())
+        except BulkIngestError as e:
+            return Response({'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        except UnicodeDecodeError:
+            return Response({'error': 'Body must be UTF-8 encoded'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(summary, status=status.HTTP_201_CREATED)
 
 
 class TransactionDetailView(generics.RetrieveAPIView):
@@ -57,18 +161,26 @@ class TransactionDetailView(generics.RetrieveAPIView):
     serializer_class = TransactionSerializer
 
     def get_queryset(self):
-        return Transaction.objects.filter(user=self.request.user)
+        return TransactionSerializer.setup_eager_loading(Transaction.objects.filter(user=self.request.user))
 
 
-class FraudAlertListView(generics.ListAPIView):
+class FraudAlertListView(FastListMixin, generics.ListAPIView):
+    """
+    Unresolved alerts; add ?expand=transaction to nest each alert's transaction
+    """
     permission_classes = [IsAuthenticated]
-    serializer_class = FraudAlertSerializer
+    pagination_class = OptionalKeysetPagination
+
+    def get_serializer_class(self):
+        if 'transaction' in self.request.query_params.get('expand', '').split(','):
+            return FraudAlertExpandedSerializer
+        return FraudAlertSerializer
 
     def get_queryset(self):
-        return FraudAlert.objects.filter(
+        return self.get_serializer_class().setup_eager_loading(FraudAlert.objects.filter(
             transaction__user=self.request.user,
             is_resolved=False
-        )
+        ))
 
 
 class DashboardStatsView(APIView):
@@ -78,32 +190,46 @@ class DashboardStatsView(APIView):
         user = request.user
         
         # Get time filter
-        days = int(request.query_params.get('days', 30))
-        start_date = timezone.now() - timedelta(days=days)
-        
-        transactions = Transaction.objects.filter(user=user, created_at__gte=start_date)
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            days = 0
+        if not 1 <= days <= settings.DASHBOARD_MAX_DAYS:
+            return Response(
+                {'error': f"days must be an integer between 1 and {settings.DASHBOARD_MAX_DAYS}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        today = timezone.localdate()
+        start_date = today - timedelta(days=days - 1)
+        window_start = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
         
-        # Calculate statistics
-        total_transactions = transactions.count()
-        total_amount = transactions.aggregate(total=Sum('amount'))['total'] or 0
-        fraud_transactions = transactions.filter(is_fraud=True).count()
-        fraud_amount = transactions.filter(is_fraud=True).aggregate(total=Sum('amount'))['total'] or 0
+        # Read the pre-aggregated daily rollups (at most `days` rows) and derive
+        # both the totals and the trend from them
+        daily = {
+            row.date: row
+            for row in DailyTransactionStats.objects.filter(user=user, date__gte=start_date)
+        }
+        total_transactions = sum(row.transaction_count for row in daily.values())
+        total_amount = sum(row.total_amount for row in daily.values())
+        fraud_transactions = sum(row.fraud_count for row in daily.values())
+        fraud_amount = sum(row.fraud_amount for row in daily.values())
         
-        # Get fraud rate by day
+        # Get fraud rate by day, filling days without activity with zeros
         fraud_trend = []
-        for i in range(days):
-            date = timezone.now() - timedelta(days=i)
-            day_transactions = transactions.filter(created_at__date=date.date())
-            day_fraud = day_transactions.filter(is_fraud=True).count()
+        for i in range(days - 1, -1, -1):
+            date = today - timedelta(days=i)
+            row = daily.get(date)
             fraud_trend.append({
-                'date': date.date().isoformat(),
-                'total': day_transactions.count(),
-                'fraud': day_fraud
+                'date': date.isoformat(),
+                'total': row.transaction_count if row else 0,
+                'fraud': row.fraud_count if row else 0
             })
         
         # Recent transactions
         recent_transactions = TransactionSerializer(
-            transactions.order_by('-created_at')[:10],
+            TransactionSerializer.setup_eager_loading(
+                Transaction.objects.filter(user=user, created_at__gte=window_start)
+            ).order_by('-created_at')[:10],
             many=True
         ).data
         
@@ -120,6 +246,6 @@ class DashboardStatsView(APIView):
             'fraud_amount': float(fraud_amount),
             'fraud_rate': (fraud_transactions / total_transactions * 100) if total_transactions > 0 else 0,
             'unresolved_alerts': unresolved_alerts,
-            'fraud_trend': fraud_trend[::-1],  # Reverse to get chronological order
+            'fraud_trend': fraud_trend,
             'recent_transactions': recent_transactions,
         })
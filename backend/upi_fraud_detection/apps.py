@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class ProjectConfig(AppConfig):
+    """
+    Project-wide wiring that does not belong to any one app
+    """
+    name = 'upi_fraud_detection'
+    verbose_name = 'UPI Fraud Detection'
+
+    def ready(self):
+        from .database import configure_connection
+
+        # WAL and fsync tuning for SQLite deployments
+        connection_created.connect(configure_connection, dispatch_uid='configure_connection')
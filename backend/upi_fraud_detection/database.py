@@ -0,0 +1,20 @@
+"""
+Database connection tuning, applied to every new connection
+"""
+from django.conf import settings
+
+
+def configure_connection(sender, connection, **kwargs):
+    """
+    connection_created receiver that switches SQLite databases to WAL
+
+    In WAL mode readers no longer block the writer (or the other way round),
+    and synchronous=NORMAL only risks the last commits on power loss, not on
+    a process crash. How long writers wait for the lock is set by
+    OPTIONS['timeout'] in settings.DATABASES.
+    """
+    if connection.vendor != 'sqlite' or not settings.SQLITE_WAL or connection.is_in_memory_db():
+        return
+    # Straight on the DB-API connection, so the pragmas are not logged as queries
+    connection.connection.execute('PRAGMA journal_mode=WAL')
+    connection.connection.execute('PRAGMA synchronous=NORMAL')
@@ -0,0 +1,248 @@
+"""
+Request profiling - opt-in, sampled per-request profiles written to disk
+
+With PROFILING_ENABLED, ProfilingMiddleware profiles a PROFILING_SAMPLE_RATE
+fraction of requests, plus any request from a staff user that sends the
+PROFILING_HEADER header (e.g. `X-Profile: 1`). Each profiled request writes
+to PROFILING_DIR:
+
+    <id>.json        Summary: path, status, duration, SQL query count and
+                     time, slowest queries and hottest functions
+    <id>.collapsed   Collapsed stacks ('frame;frame;frame count' per line)
+                     for flamegraph.pl or speedscope (PROFILING_MODE='sample')
+    <id>.prof        cProfile statistics for pstats/snakeviz (PROFILING_MODE='cprofile')
+
+The profile id is returned in the X-Profile-Id response header.
+"""
+import cProfile
+import io
+import json
+import logging
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+SLOWEST_QUERIES = 10
+
+TOP_FUNCTIONS = 25
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper that counts and times every query
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            self.queries.append((elapsed, sql))
+
+    def slowest(self, limit=SLOWEST_QUERIES):
+        return [
+            {'ms': round(seconds * 1000, 3), 'sql': sql}
+            for seconds, sql in sorted(self.queries, key=lambda query: query[0], reverse=True)[:limit]
+        ]
+
+
+def _frame_label(code):
+    path = Path(code.co_filename)
+    if path.is_relative_to(settings.BASE_DIR):
+        path = path.relative_to(settings.BASE_DIR)
+    elif 'site-packages' in path.parts:
+        path = Path(*path.parts[path.parts.index('site-packages') + 1:])
+    else:
+        path = Path(*path.parts[-2:])
+    return f'{code.co_name} ({path}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """
+    Samples the call stack of one thread at a fixed interval from a background thread
+    """
+
+    def __init__(self, thread_id, interval):
+        """
+        Args:
+            thread_id: Identifier of the thread to sample (threading.get_ident())
+            interval: Seconds between samples
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+
+    def _run(self):
+        labels = {}
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                if code not in labels:
+                    labels[code] = _frame_label(code)
+                stack.append(labels[code])
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        """
+        Leaf frames by share of samples (self time)
+        """
+        total = sum(self.stacks.values()) or 1
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return [
+            {'function': function, 'samples': count, 'share': round(count / total, 4)}
+            for function, count in leaves.most_common(limit)
+        ]
+
+
+def _cprofile_top_functions(profile, limit=TOP_FUNCTIONS):
+    stats = pstats.Stats(profile, stream=io.StringIO())
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            'function': f'{name} ({filename}:{line})',
+            'calls': calls,
+            'self_seconds': round(self_time, 6),
+            'cumulative_seconds': round(cumulative, 6),
+        }
+        for (filename, line, name), (_, calls, self_time, cumulative, _) in rows
+    ]
+
+
+def _is_staff(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    # API clients authenticate with JWT in the views, after the middleware runs
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    try:
+        authenticated = JWTAuthentication().authenticate(request)
+    except Exception:
+        return False
+    return authenticated is not None and authenticated[0].is_staff
+
+
+class ProfilingMiddleware:
+    """
+    Profile sampled or explicitly requested requests (see the module docstring)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        if not settings.PROFILING_ENABLED:
+            return False
+        if settings.PROFILING_HEADER in request.headers and _is_staff(request):
+            return True
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        return self.profile(request)
+
+    def profile(self, request):
+        profile_id = f"{datetime.now(dt_timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        recorder = QueryRecorder()
+        sampler = profiler = None
+        if settings.PROFILING_MODE == 'cprofile':
+            profiler = cProfile.Profile()
+        else:
+            sampler = StackSampler(threading.get_ident(), settings.PROFILING_INTERVAL_MS / 1000)
+
+        wrappers = ExitStack()
+        for alias in connections:
+            wrappers.enter_context(connections[alias].execute_wrapper(recorder))
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one cProfile per process; keep the SQL figures
+                profiler = None
+        else:
+            sampler.start()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            if sampler is not None:
+                sampler.stop()
+            duration = time.perf_counter() - start
+            wrappers.close()
+
+        summary = {
+            'id': profile_id,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+            'mode': settings.PROFILING_MODE,
+            'sql': {
+                'count': recorder.count,
+                'ms': round(recorder.seconds * 1000, 3),
+                'slowest': recorder.slowest(),
+            },
+        }
+        try:
+            self.write(profile_id, summary, sampler, profiler)
+        except OSError:
+            logger.exception("Could not write request profile %s", profile_id)
+        else:
+            response['X-Profile-Id'] = profile_id
+        return response
+
+    def write(self, profile_id, summary, sampler, profiler):
+        directory = Path(settings.PROFILING_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        if profiler is not None:
+            summary['functions'] = _cprofile_top_functions(profiler)
+            profiler.dump_stats(directory / f'{profile_id}.prof')
+        elif sampler is not None:
+            summary['samples'] = sum(sampler.stacks.values())
+            summary['functions'] = sampler.top_functions()
+            (directory / f'{profile_id}.collapsed').write_text(sampler.collapsed())
+        (directory / f'{profile_id}.json').write_text(json.dumps(summary, indent=2))
+        logger.info(
+            "Profiled %s %s in %.1f ms (%d queries): %s",
+            summary['method'], summary['path'], summary['duration_ms'], summary['sql']['count'], profile_id
+        )
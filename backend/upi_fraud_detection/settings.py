@@ -4,6 +4,7 @@ Django settings for UPI Fraud Detection project.
 from pathlib import Path
 from datetime import timedelta
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -24,6 +25,7 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
+    'upi_fraud_detection',
     'accounts',
     'transactions',
     'ml_model',
@@ -36,6 +38,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'upi_fraud_detection.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -60,13 +63,49 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'upi_fraud_detection.wsgi.application'
 
-# Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Database: 'sqlite' for a single node, 'postgres' for concurrent writers
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+# Seconds a connection is reused across requests (0 closes it after each request)
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=60, cast=int)
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='upi_fraud_db'),
+            'USER': config('DB_USER', default='postgres'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            # Ping reused connections before a request so a restarted server or pooler is survived
+            'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+            # Compatibility flag for an external PgBouncer in transaction pooling mode, which
+            # cannot hold server-side cursors open; it does not pool connections itself
+            'DISABLE_SERVER_SIDE_CURSORS': config('DB_PGBOUNCER', default=False, cast=bool),
+            'OPTIONS': {
+                'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+            },
+        }
     }
-}
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'OPTIONS': {
+                # Seconds a writer waits for the lock before failing with "database is locked"
+                'timeout': config('SQLITE_BUSY_TIMEOUT', default=20, cast=float),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"DB_ENGINE must be 'sqlite' or 'postgres', not {DB_ENGINE!r}")
+
+# Write-ahead logging lets readers run alongside the single SQLite writer
+# (see upi_fraud_detection/database.py)
+SQLITE_WAL = config('SQLITE_WAL', default=True, cast=bool)
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -123,3 +162,104 @@ CORS_ALLOW_CREDENTIALS = True
 # ML Model Settings
 ML_MODEL_PATH = BASE_DIR / 'ml_model' / 'trained_models' / 'fraud_detection_cnn.h5'
 SCALER_PATH = BASE_DIR / 'ml_model' / 'trained_models' / 'scaler.pkl'
+ML_NUMPY_MODEL_PATH = BASE_DIR / 'ml_model' / 'trained_models' / 'fraud_detection_cnn.npz'
+
+# 'keras' loads the .h5 model with TensorFlow; 'numpy' runs the exported .npz
+# model with NumPy only (see `manage.py export_numpy_model`)
+ML_INFERENCE_BACKEND = config('ML_INFERENCE_BACKEND', default='keras')
+
+# Seconds between checks of the model files for changes (0 checks on every request)
+ML_MODEL_RELOAD_INTERVAL = config('ML_MODEL_RELOAD_INTERVAL', default=30, cast=int)
+
+# Load the model when a worker boots instead of on the first request
+ML_MODEL_WARM_START = config('ML_MODEL_WARM_START', default=True, cast=bool)
+
+# Micro-batch concurrent predictions into one forward pass
+ML_BATCHING_ENABLED = config('ML_BATCHING_ENABLED', default=False, cast=bool)
+ML_BATCH_MAX_SIZE = config('ML_BATCH_MAX_SIZE', default=32, cast=int)
+ML_BATCH_MAX_WAIT_MS = config('ML_BATCH_MAX_WAIT_MS', default=3.0, cast=float)
+
+# Reuse CNN probabilities for identical feature vectors (retries, re-scoring,
+# replayed feeds). Entries are keyed by model version and dropped on reload.
+# Set ML_PREDICTION_CACHE_BACKEND to a CACHES alias to share them between workers
+ML_PREDICTION_CACHE_ENABLED = config('ML_PREDICTION_CACHE_ENABLED', default=False, cast=bool)
+ML_PREDICTION_CACHE_SIZE = config('ML_PREDICTION_CACHE_SIZE', default=50000, cast=int)
+ML_PREDICTION_CACHE_TTL = config('ML_PREDICTION_CACHE_TTL', default=600, cast=int)
+ML_PREDICTION_CACHE_BACKEND = config('ML_PREDICTION_CACHE_BACKEND', default='')
+
+# Bulk transaction ingestion
+BULK_INGEST_MAX_ROWS = config('BULK_INGEST_MAX_ROWS', default=10000, cast=int)
+BULK_INGEST_CHUNK_SIZE = config('BULK_INGEST_CHUNK_SIZE', default=1000, cast=int)
+BULK_INGEST_MAX_BYTES = config('BULK_INGEST_MAX_BYTES', default=5 * 1024 * 1024, cast=int)
+
+# Fraud scoring for new transactions: 'sync' scores inside the request,
+# 'async' commits the transaction and scores it on a background worker pool
+FRAUD_SCORING_MODE = config('FRAUD_SCORING_MODE', default='sync')
+FRAUD_SCORING_WORKERS = config('FRAUD_SCORING_WORKERS', default=4, cast=int)
+# How long an async create waits for its score by default (overridable with ?wait_ms=)
+FRAUD_SCORING_WAIT_MS = config('FRAUD_SCORING_WAIT_MS', default=0, cast=int)
+FRAUD_SCORING_MAX_WAIT_MS = config('FRAUD_SCORING_MAX_WAIT_MS', default=2000, cast=int)
+
+# Longest period (in days) the dashboard statistics endpoint accepts
+DASHBOARD_MAX_DAYS = config('DASHBOARD_MAX_DAYS', default=365, cast=int)
+
+# Serve JSON transaction and alert lists from values() rows, streamed, instead
+# of the model serializers (same response bytes, less CPU per row)
+FAST_LIST_SERIALIZATION = config('FAST_LIST_SERIALIZATION', default=False, cast=bool)
+
+# Per-sender 1h/24h/7d behavioural features (feature store); models must be
+# trained with them enabled (train_model and export_feature_snapshot replay
+# them point-in-time). Rebuild from history with `manage.py rebuild_feature_store`
+BEHAVIOUR_FEATURES_ENABLED = config('BEHAVIOUR_FEATURES_ENABLED', default=False, cast=bool)
+# Sender profiles kept in memory per process, and seconds before a cached one is reloaded
+BEHAVIOUR_CACHE_SIZE = config('BEHAVIOUR_CACHE_SIZE', default=10000, cast=int)
+BEHAVIOUR_CACHE_TTL = config('BEHAVIOUR_CACHE_TTL', default=60, cast=int)
+
+# In-memory sender→receiver graph over the last GRAPH_WINDOW_HOURS of
+# transactions, used as CNN inputs and by the graph rules in the rule set;
+# like the behavioural features, train the model with it enabled
+GRAPH_FEATURES_ENABLED = config('GRAPH_FEATURES_ENABLED', default=False, cast=bool)
+GRAPH_WINDOW_HOURS = config('GRAPH_WINDOW_HOURS', default=24, cast=float)
+# Seconds between pulls of transactions saved by other processes
+GRAPH_SYNC_INTERVAL = config('GRAPH_SYNC_INTERVAL', default=1.0, cast=float)
+
+# JSON rule set for rule-based detection, re-read when it changes
+FRAUD_RULES_PATH = config('FRAUD_RULES_PATH', default=str(BASE_DIR / 'ml_model' / 'rulesets' / 'default.json'))
+FRAUD_RULES_RELOAD_INTERVAL = config('FRAUD_RULES_RELOAD_INTERVAL', default=5, cast=int)
+
+# Cascade scoring: when a model is loaded, rule scores below CLEAR_BELOW are
+# cleared and scores of at least FLAG_AT flagged without running the CNN.
+# Tune with `manage.py evaluate_cascade`
+FRAUD_CASCADE_ENABLED = config('FRAUD_CASCADE_ENABLED', default=False, cast=bool)
+FRAUD_CASCADE_CLEAR_BELOW = config('FRAUD_CASCADE_CLEAR_BELOW', default=0.2, cast=float)
+FRAUD_CASCADE_FLAG_AT = config('FRAUD_CASCADE_FLAG_AT', default=0.75, cast=float)
+
+# Bearer token required by the Prometheus /metrics endpoint (empty serves it openly)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Request profiling (see upi_fraud_detection/profiling.py): profile a
+# PROFILING_SAMPLE_RATE fraction of requests, and staff requests sending the
+# PROFILING_HEADER header. 'sample' writes collapsed stacks, 'cprofile' .prof files
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+PROFILING_SAMPLE_RATE = config('PROFILING_SAMPLE_RATE', default=0.0, cast=float)
+PROFILING_HEADER = config('PROFILING_HEADER', default='X-Profile')
+PROFILING_MODE = config('PROFILING_MODE', default='sample')
+PROFILING_INTERVAL_MS = config('PROFILING_INTERVAL_MS', default=5.0, cast=float)
+PROFILING_DIR = config('PROFILING_DIR', default=str(BASE_DIR / 'profiles'))
+
+# Log to the console; LOG_LEVEL applies to the project apps
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        app: {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False}
+        for app in ('accounts', 'transactions', 'ml_model')
+    },
+}
@@ -0,0 +1,81 @@
+import json
+import tempfile
+from pathlib import Path
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from transactions.models import Transaction
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.user = User.objects.create_user(username='erin', password='secret-pass-123')
+        self.staff = User.objects.create_user(username='sam', password='secret-pass-123', is_staff=True)
+        for user in (self.user, self.staff):
+            Transaction.objects.create(user=user, sender_upi='a@upi', receiver_upi='b@upi', amount=10)
+
+    def get(self, user, **headers):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return client.get('/api/transactions/stats/?days=30', **headers)
+
+    def profiles(self, pattern='*.json'):
+        return sorted(Path(self.tmpdir.name).glob(pattern))
+
+    def test_disabled_by_default(self):
+        response = self.get(self.staff, HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_header_profiles_staff_requests_only(self):
+        with override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0.0, PROFILING_DIR=self.tmpdir.name,
+                               PROFILING_INTERVAL_MS=0.5):
+            self.assertNotIn('X-Profile-Id', self.get(self.user, HTTP_X_PROFILE='1'))
+            self.assertNotIn('X-Profile-Id', self.get(self.staff))
+            response = self.get(self.staff, HTTP_X_PROFILE='1')
+
+        self.assertEqual(response.status_code, 200)
+        summary_path, = self.profiles()
+        summary = json.loads(summary_path.read_text())
+        self.assertEqual(summary['id'], response['X-Profile-Id'])
+        self.assertEqual((summary['path'], summary['status']), ('/api/transactions/stats/?days=30', 200))
+        self.assertGreater(summary['sql']['count'], 0)
+        self.assertLessEqual(len(summary['sql']['slowest']), summary['sql']['count'])
+        collapsed = Path(self.tmpdir.name) / f"{summary['id']}.collapsed"
+        for line in collapsed.read_text().splitlines():
+            stack, count = line.rsplit(' ', 1)
+            self.assertTrue(stack and int(count) > 0)
+
+    def test_sampled_cprofile(self):
+        with override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1.0, PROFILING_DIR=self.tmpdir.name,
+                               PROFILING_MODE='cprofile'):
+            response = self.get(self.user)
+        self.assertIn('X-Profile-Id', response)
+        self.assertEqual(len(self.profiles('*.prof')), 1)
+        summary = json.loads(self.profiles()[0].read_text())
+        self.assertTrue(summary['functions'])
+
+
+class DatabaseTuningTests(SimpleTestCase):
+    def open(self, **overrides):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        settings_dict = {**connection.settings_dict, 'NAME': str(Path(tmpdir.name) / 'tuning.sqlite3'), **overrides}
+        wrapper = connections['default'].__class__(settings_dict, alias='tuning')
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper.connection
+
+    def test_sqlite_connections_use_wal(self):
+        raw = self.open(OPTIONS={'timeout': 3})
+        self.assertEqual(raw.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.assertEqual(raw.execute('PRAGMA synchronous').fetchone()[0], 1)
+        self.assertEqual(raw.execute('PRAGMA busy_timeout').fetchone()[0], 3000)
+
+    @override_settings(SQLITE_WAL=False)
+    def test_wal_can_be_disabled(self):
+        self.assertEqual(self.open().execute('PRAGMA journal_mode').fetchone()[0], 'delete')
@@ -6,3 +6,7 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'upi_fraud_detection.settings')
 application = get_wsgi_application()
+
+# Load the fraud detection model before the first request is served
+from ml_model.registry import warm_up  # noqa: E402
+warm_up()
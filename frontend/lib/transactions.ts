@@ -34,7 +34,7 @@ export interface TransactionCreate {
 export interface FraudAlert {
   id: number;
   transaction: number;
-  transaction_details: Transaction;
+  transaction_details?: Transaction;
   alert_type: string;
   severity: "LOW" | "MEDIUM" | "HIGH" | "CRITICAL";
   message: string;
@@ -75,7 +75,9 @@ export const transactionService = {
   },
 
   async getFraudAlerts(): Promise<FraudAlert[]> {
-    const response = await api.get("/api/transactions/alerts/");
+    const response = await api.get("/api/transactions/alerts/", {
+      params: { expand: "transaction" },
+    });
     return response.data.results || response.data;
   },
 